@@ -0,0 +1,371 @@
+"""
+AI Client Pool - model Gemini dùng chung cho mọi phiên Streamlit, theo từng API key.
+
+Trước đây mỗi phiên tạo GeminiQMDGHelper riêng và _get_best_model() gửi một hoặc nhiều
+lệnh "ping" generate_content: mỗi người dùng mới mất vài giây và tốn quota. Pool giữ:
+
+- Mỗi API key một KeyPool: model đã ping thành công (warm), dùng chung giữa các phiên.
+  Chỉ một luồng ping cho mỗi key; các phiên khác chờ kết quả thay vì ping thêm.
+- Model hết quota (429) bị đánh dấu cho cả tiến trình trong EXHAUSTED_COOLDOWN giây,
+  phiên nào gặp trước thì các phiên sau tự chuyển model, không phải thử lại.
+- Health check: model không có lượt gọi thành công trong HEALTH_TTL giây được ping lại
+  khi mượn; gọi thành công tính như một lần kiểm tra.
+- Giới hạn số lệnh đồng thời cho mỗi key (semaphore), mượn quá POOL_TIMEOUT -> PoolBusy.
+- Key không được dùng trong IDLE_TTL giây bị loại khỏi pool.
+
+    from ai_client_pool import get_client_pool
+    with get_client_pool().lease(api_key) as model:
+        response = model.generate_content(prompt)
+"""
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import google.generativeai as genai
+    GENAI_AVAILABLE = True
+except ImportError:
+    genai = None
+    GENAI_AVAILABLE = False
+
+# Ưu tiên model tốt nhất trước (giống thứ tự cũ trong GeminiQMDGHelper._get_best_model)
+MODEL_PREFERENCE = (
+    'gemini-2.0-flash-exp',
+    'gemini-1.5-pro-latest',
+    'gemini-1.5-pro',
+    'gemini-1.5-flash-latest',
+    'gemini-1.5-flash',
+    'gemini-pro',
+    'gemini-1.0-pro',
+)
+DEFAULT_MODEL = 'gemini-1.5-flash'
+MAX_CONCURRENCY = int(os.environ.get("QMDG_AI_MAX_CONCURRENCY", "4"))
+POOL_TIMEOUT = 60.0          # giây chờ tối đa để mượn một lượt gọi
+HEALTH_TTL = 15 * 60         # ping lại model không có lượt gọi thành công sau chừng này giây
+EXHAUSTED_COOLDOWN = 10 * 60
+IDLE_TTL = 30 * 60
+SWEEP_INTERVAL = 60
+
+
+class PoolBusy(RuntimeError):
+    """Hết lượt gọi đồng thời cho API key trong thời gian chờ."""
+
+
+def is_quota_error(error):
+    message = str(error)
+    return "429" in message or "quota" in message.lower()
+
+
+def _key_id(api_key):
+    """Định danh ngắn của API key cho log / stats (không lộ key)."""
+    return hashlib.sha256((api_key or "").encode()).hexdigest()[:8]
+
+
+# genai.configure() là cấu hình toàn cục: chỉ dùng khi không có client riêng theo key
+_CONFIGURE_LOCK = threading.Lock()
+
+
+def _genai_factory(api_key):
+    """(make_model(name), list_model_names()) cho một API key.
+
+    Client riêng theo key (GenerativeServiceClient / ModelServiceClient) được gắn vào
+    GenerativeModel._client - thuộc tính riêng của google-generativeai 0.8.x (được ghim
+    trong requirements.txt). Nếu không có, quay về genai.configure() trong khóa: khi đó
+    các key khác nhau vẫn dùng chung client toàn cục của genai.
+    """
+    try:
+        # Client riêng theo key: các key khác nhau không giẫm lên genai.configure() toàn cục
+        from google.ai import generativelanguage as glm
+        options = {"api_key": api_key}
+        client = glm.GenerativeServiceClient(client_options=options)
+        model_client = glm.ModelServiceClient(client_options=options)
+        if not hasattr(genai.GenerativeModel(DEFAULT_MODEL), "_client"):
+            raise AttributeError("GenerativeModel._client")
+    except Exception:
+        client = model_client = None
+
+    def make_model(name):
+        if client is None:
+            with _CONFIGURE_LOCK:
+                genai.configure(api_key=api_key)
+                return genai.GenerativeModel(name)
+        model = genai.GenerativeModel(name)
+        model._client = client
+        return model
+
+    def list_model_names():
+        if model_client is not None:
+            models = model_client.list_models(request={})
+        else:
+            with _CONFIGURE_LOCK:
+                genai.configure(api_key=api_key)
+                models = list(genai.list_models())
+        return [m.name.split('/')[-1] for m in models
+                if 'generateContent' in m.supported_generation_methods]
+
+    return make_model, list_model_names
+
+
+def _ping(model):
+    model.generate_content("ping", generation_config={"max_output_tokens": 1})
+
+
+class KeyPool:
+    """Model đã warm + giới hạn đồng thời cho một API key."""
+
+    def __init__(self, api_key, factory, max_concurrency):
+        self.key_id = _key_id(api_key)
+        self._make_model, self._list_model_names = factory(api_key)
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self._lock = threading.Lock()     # chỉ một luồng warm / ping cho mỗi key
+        self._models = {}                 # tên -> model
+        self._checked = {}                # tên -> thời điểm ping / gọi thành công gần nhất
+        self._exhausted = {}              # tên -> hết cooldown lúc
+        self.current = None
+        self.last_used = time.monotonic()
+        self.last_error = None
+        self.pings = self.leases = self.in_flight = 0
+
+    def _usable(self, name, now):
+        until = self._exhausted.get(name)
+        if until is not None and until > now:
+            return False
+        self._exhausted.pop(name, None)
+        return True
+
+    def _try(self, name, now):
+        model = self._models.get(name)
+        if model is None:
+            model = self._models[name] = self._make_model(name)
+        self.pings += 1
+        try:
+            _ping(model)
+        except Exception as e:
+            self.last_error = str(e)
+            if is_quota_error(e):
+                self._exhausted[name] = now + EXHAUSTED_COOLDOWN
+            return None
+        self._checked[name] = now
+        return model
+
+    def _select(self, now, skip=None):
+        for name in MODEL_PREFERENCE:
+            if name != skip and self._usable(name, now) and self._try(name, now) is not None:
+                return name
+        # Model ngoài danh sách cố định
+        try:
+            listed = self._list_model_names()
+        except Exception:
+            listed = []
+        for name in listed:
+            if (name != skip and name not in MODEL_PREFERENCE and self._usable(name, now)
+                    and self._try(name, now) is not None):
+                return name
+        # Không model nào trả lời: dùng mặc định, lần gọi thật sẽ báo lỗi cụ thể
+        if DEFAULT_MODEL not in self._models:
+            self._models[DEFAULT_MODEL] = self._make_model(DEFAULT_MODEL)
+        self._checked[DEFAULT_MODEL] = now
+        return DEFAULT_MODEL
+
+    def model(self, preferred=None):
+        """(tên, model) khỏe mạnh; ping chỉ khi model chưa / lâu chưa được kiểm tra."""
+        with self._lock:
+            now = time.monotonic()
+            self.last_used = now
+            # Phiên chọn model riêng (còn quota) thì dùng model đó, nếu không thì model chung
+            name = preferred if preferred and self._usable(preferred, now) else self.current
+            if name is not None and not self._usable(name, now):
+                name = None
+            if name is not None and now - self._checked.get(name, float("-inf")) > HEALTH_TTL:
+                failed = name
+                name = self._try(name, now) and name
+            else:
+                failed = None
+            if name is None:
+                name = self.current = self._select(now, skip=failed)
+            return name, self._models[name]
+
+    def mark_ok(self, name):
+        with self._lock:
+            self._checked[name] = time.monotonic()
+
+    def mark_exhausted(self, name):
+        with self._lock:
+            self._exhausted[name] = time.monotonic() + EXHAUSTED_COOLDOWN
+            if self.current == name:
+                self.current = None
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            return {
+                'key': self.key_id, 'model': self.current,
+                'warm_models': sorted(self._checked),
+                'exhausted': sorted(n for n, t in self._exhausted.items() if t > now),
+                'pings': self.pings, 'leases': self.leases, 'in_flight': self.in_flight,
+                'idle_s': round(now - self.last_used, 1),
+                'last_error': self.last_error,
+            }
+
+
+class AIClientPool:
+    """Pool {API key: KeyPool} dùng chung cho cả tiến trình."""
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, factory=None, max_concurrency=MAX_CONCURRENCY, idle_ttl=IDLE_TTL):
+        self._factory = factory or _genai_factory
+        self.max_concurrency = max_concurrency
+        self.idle_ttl = idle_ttl
+        self._pools = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self.evictions = 0
+
+    @classmethod
+    def get_instance(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                if not GENAI_AVAILABLE:
+                    raise ImportError("google.generativeai chưa được cài đặt")
+                cls._instance = cls()
+            return cls._instance
+
+    def _sweep(self, now):
+        if now - self._last_sweep < SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        for api_key, pool in list(self._pools.items()):
+            # Key đang có lượt gọi dở thì giữ lại
+            if now - pool.last_used > self.idle_ttl and not pool.in_flight:
+                del self._pools[api_key]
+                self.evictions += 1
+
+    def key_pool(self, api_key):
+        with self._lock:
+            self._sweep(time.monotonic())
+            pool = self._pools.get(api_key)
+            if pool is None:
+                pool = self._pools[api_key] = KeyPool(api_key, self._factory, self.max_concurrency)
+            return pool
+
+    def get_model(self, api_key, preferred=None):
+        """(tên, model) đã warm cho api_key, không giữ lượt gọi."""
+        return self.key_pool(api_key).model(preferred)
+
+    def mark_exhausted(self, api_key, name):
+        self.key_pool(api_key).mark_exhausted(name)
+
+    @contextmanager
+    def lease(self, api_key, preferred=None, timeout=POOL_TIMEOUT):
+        """
+        Mượn một lượt gọi: yield model đã warm. Lỗi quota đánh dấu model cho mọi phiên
+        rồi được ném lại cho nơi gọi (để tự thử lại).
+        """
+        pool = self.key_pool(api_key)
+        if not pool.semaphore.acquire(timeout=timeout):
+            raise PoolBusy(f"API key {pool.key_id}: quá {pool.max_concurrency} lệnh đồng thời")
+        with pool._lock:
+            pool.in_flight += 1
+        try:
+            name, model = pool.model(preferred)
+            pool.leases += 1
+            try:
+                yield model
+            except Exception as e:
+                if is_quota_error(e):
+                    pool.mark_exhausted(name)
+                raise
+            pool.mark_ok(name)
+        finally:
+            pool.last_used = time.monotonic()
+            with pool._lock:
+                pool.in_flight -= 1
+            pool.semaphore.release()
+
+    def stats(self):
+        with self._lock:
+            pools = list(self._pools.values())
+        return {'keys': len(pools), 'evictions': self.evictions, 'pools': [p.stats() for p in pools]}
+
+
+def get_client_pool():
+    """Pool dùng chung của tiến trình (ImportError nếu thiếu google.generativeai)."""
+    return AIClientPool.get_instance()
+
+
+if __name__ == "__main__":
+    # Kiểm tra với model giả (không cần mạng / google.generativeai)
+    from concurrent.futures import ThreadPoolExecutor
+
+    class FakeModel:
+        calls = 0
+        active = peak = 0
+        lock = threading.Lock()
+
+        def __init__(self, name, quota_left):
+            self.model_name = f"models/{name}"
+            self.quota_left = quota_left
+
+        def generate_content(self, prompt, generation_config=None):
+            with FakeModel.lock:
+                FakeModel.calls += 1
+                FakeModel.active += 1
+                FakeModel.peak = max(FakeModel.peak, FakeModel.active)
+            try:
+                time.sleep(0.05 if prompt == "ping" else 0.01)
+                left = self.quota_left.get(self.model_name, float("inf"))
+                if left <= 0:
+                    raise RuntimeError("429 Resource has been exhausted (e.g. check quota).")
+                self.quota_left[self.model_name] = left - (prompt != "ping")
+                return prompt
+            finally:
+                with FakeModel.lock:
+                    FakeModel.active -= 1
+
+    # 2.0 hết quota ngay, 1.5-pro-latest hết sau 20 câu hỏi, các model khác không giới hạn
+    quota = {"models/gemini-2.0-flash-exp": 0, "models/gemini-1.5-pro-latest": 20}
+
+    def fake_factory(api_key):
+        return (lambda name: FakeModel(name, quota)), (lambda: [])
+
+    pool = AIClientPool(factory=fake_factory, max_concurrency=3)
+
+    def session(i):
+        for _attempt in range(3):
+            try:
+                with pool.lease("key-A") as model:
+                    return model.generate_content(f"q{i}")
+            except RuntimeError as e:
+                if not is_quota_error(e):
+                    raise
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=12) as ex:
+        results = list(ex.map(session, range(30)))
+    elapsed = time.perf_counter() - start
+    stats = pool.stats()['pools'][0]
+    assert results == [f"q{i}" for i in range(30)]
+    assert FakeModel.peak <= 3, FakeModel.peak
+    assert stats['model'] == 'gemini-1.5-pro', stats
+    assert 'gemini-1.5-pro-latest' in stats['exhausted'] and 'gemini-2.0-flash-exp' in stats['exhausted']
+    print(f"✅ 30 phiên x 1 câu hỏi: {stats['pings']} ping (thay vì >= 30), "
+          f"đồng thời tối đa {FakeModel.peak}, {elapsed * 1000:.0f} ms")
+    print(f"   {stats}")
+
+    pings = stats['pings']
+    for _ in range(3):
+        with pool.lease("key-A", preferred="gemini-1.0-pro") as model:
+            assert model.model_name == "models/gemini-1.0-pro"
+    assert pool.stats()['pools'][0]['pings'] == pings + 1
+    assert pool.stats()['pools'][0]['model'] == 'gemini-1.5-pro'
+    print("✅ Model riêng của phiên chỉ ping một lần, không đổi model chung")
+
+    pool.idle_ttl = 0
+    pool._last_sweep = 0
+    pool.key_pool("key-B")
+    assert pool.stats()['keys'] == 1 and pool.evictions == 1
+    print("✅ Key nhàn rỗi bị loại khỏi pool")
@@ -9,6 +9,26 @@ BASE_HUB_DIR = "data_hub"
 INDEX_FILE = os.path.join(BASE_HUB_DIR, "hub_index.json")
 MAX_ENTRIES_PER_SHARD = 100 # Adjust based on performance needs
 
+# Change listeners: func(action, index_entry) with action "add" / "delete",
+# called after the index has been written (see topic_registry)
+_listeners = []
+
+def add_listener(func):
+    """Register a callback for index changes made by add_entry / delete_entry."""
+    if func not in _listeners:
+        _listeners.append(func)
+
+def remove_listener(func):
+    if func in _listeners:
+        _listeners.remove(func)
+
+def _notify(action, index_entry):
+    for func in list(_listeners):
+        try:
+            func(action, index_entry)
+        except Exception as e:
+            print(f"⚠️ [shard_manager] Listener lỗi ({action}): {e}")
+
 def initialize_hub():
     """Initialize the directory and index if they don't exist."""
     if not os.path.exists(BASE_HUB_DIR):
@@ -55,14 +75,15 @@ def add_entry(title, content, category="Kiến Thức", source="AI Miner", tags=
         json.dump(shard_data, f, indent=2, ensure_ascii=False)
         
     # 3. Update Index (Lightweight Info)
-    index_data["index"].append({
+    index_entry = {
         "id": entry_id,
         "shard": shard_filename,
         "title": title,
         "category": category,
         "tags": tags,
         "created_at": timestamp
-    })
+    }
+    index_data["index"].append(index_entry)
     
     # Update Stats
     index_data["stats"]["total"] += 1
@@ -70,7 +91,8 @@ def add_entry(title, content, category="Kiến Thức", source="AI Miner", tags=
     
     with open(INDEX_FILE, 'w', encoding='utf-8') as f:
         json.dump(index_data, f, indent=2, ensure_ascii=False)
-        
+    
+    _notify("add", index_entry)
     return entry_id
 
 def search_index(query="", category="Tất cả"):
@@ -135,6 +157,7 @@ def delete_entry(entry_id):
     with open(INDEX_FILE, 'w', encoding='utf-8') as f:
         json.dump(index_data, f, indent=2, ensure_ascii=False)
     
+    _notify("delete", entry_ref)
     return True
 
 def get_hub_stats():
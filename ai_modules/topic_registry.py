@@ -0,0 +1,168 @@
+"""
+Topic Registry - danh sách chủ đề (TOPIC_INTERPRETATIONS + tiêu đề trong Data Hub)
+dựng một lần cho cả tiến trình và dùng chung giữa các phiên Streamlit.
+
+- Cập nhật tăng dần qua listener của shard_manager (add_entry / delete_entry).
+- Hub bị ghi từ nơi khác (tiến trình khác, bản import "shard_manager" không qua package)
+  được phát hiện bằng mtime/size của hub_index.json và khi đó mới đọc lại toàn bộ.
+- topics() chỉ stat() một file rồi trả về list đã sắp xếp sẵn: chi phí mỗi lần rerun
+  không phụ thuộc kích thước hub.
+- search() tìm không dấu qua chỉ mục trigram (topic_search), dựng ở lần tìm đầu tiên và
+  cập nhật cùng lúc với danh sách.
+"""
+import os
+import threading
+from bisect import bisect_left
+
+try:
+    from ai_modules import shard_manager
+    from ai_modules.topic_search import TopicSearchIndex
+except ImportError:
+    import shard_manager
+    from topic_search import TopicSearchIndex
+
+
+def _index_signature():
+    try:
+        st = os.stat(shard_manager.INDEX_FILE)
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return None
+
+
+class TopicRegistry:
+    """Danh sách chủ đề đã sắp xếp, không trùng lặp, an toàn đa luồng."""
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, core_topics=()):
+        self._lock = threading.RLock()
+        self._core = set(core_topics)
+        self._hub_counts = {}       # tiêu đề -> số mục trong hub (cùng tiêu đề có thể lặp)
+        self._sorted = []
+        self._search_index = None   # dựng khi search() lần đầu
+        self._signature = False     # chưa nạp
+        self.reloads = 0
+        shard_manager.add_listener(self._on_change)
+
+    @classmethod
+    def get_instance(cls, core_topics=()):
+        """Registry dùng chung; core_topics chỉ được dùng ở lần tạo đầu tiên."""
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(core_topics)
+            return cls._instance
+
+    def _reload(self):
+        counts = {}
+        for entry in shard_manager.search_index():
+            title = entry.get("title")
+            if title:
+                counts[title] = counts.get(title, 0) + 1
+        self._hub_counts = counts
+        self._sorted = sorted(self._core.union(counts))
+        self._search_index = None
+        self.reloads += 1
+
+    def _ensure_current(self):
+        signature = _index_signature()
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    self._reload()
+                    self._signature = signature
+
+    def _on_change(self, action, index_entry):
+        title = index_entry.get("title")
+        with self._lock:
+            if self._signature is False or not title:
+                return  # chưa nạp: lần topics() đầu tiên sẽ đọc hub
+            count = self._hub_counts.get(title, 0)
+            if action == "add":
+                self._hub_counts[title] = count + 1
+                if count == 0 and title not in self._core:
+                    # Tạo list mới: list cũ có thể đang được phiên khác duyệt
+                    i = bisect_left(self._sorted, title)
+                    self._sorted = self._sorted[:i] + [title] + self._sorted[i:]
+                    if self._search_index is not None:
+                        self._search_index.add(title)
+            elif action == "delete" and count:
+                if count == 1:
+                    del self._hub_counts[title]
+                    if title not in self._core:
+                        i = bisect_left(self._sorted, title)
+                        if i < len(self._sorted) and self._sorted[i] == title:
+                            self._sorted = self._sorted[:i] + self._sorted[i + 1:]
+                        if self._search_index is not None:
+                            self._search_index.remove(title)
+                else:
+                    self._hub_counts[title] = count - 1
+            self._signature = _index_signature()  # thay đổi của chính mình: không cần nạp lại
+
+    def topics(self):
+        """List chủ đề đã sắp xếp (dùng chung - không sửa tại chỗ)."""
+        self._ensure_current()
+        return self._sorted
+
+    def search(self, query, limit=None):
+        """Chủ đề khớp query không phân biệt dấu, đã xếp hạng; query rỗng -> mọi chủ đề."""
+        topics = self.topics()
+        if not query or not query.strip():
+            return topics if limit is None else topics[:limit]
+        with self._lock:
+            if self._search_index is None:
+                self._search_index = TopicSearchIndex(self._sorted)
+            return self._search_index.search(query, limit)
+
+    def __len__(self):
+        return len(self.topics())
+
+    def __contains__(self, title):
+        self._ensure_current()
+        return title in self._core or title in self._hub_counts
+
+
+def get_topic_registry(core_topics=()):
+    return TopicRegistry.get_instance(core_topics)
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    # Hub tạm: 5000 mục, kiểm tra cập nhật tăng dần khớp với dựng lại từ đầu
+    tmp = tempfile.mkdtemp()
+    shard_manager.BASE_HUB_DIR = tmp
+    shard_manager.INDEX_FILE = os.path.join(tmp, "hub_index.json")
+    shard_manager.initialize_hub()
+    import json
+    with open(shard_manager.INDEX_FILE, 'w', encoding='utf-8') as f:
+        json.dump({"index": [{"id": str(i), "shard": "shard_1.json", "title": f"Chủ đề {i % 4000}",
+                              "category": "Kiến Thức", "tags": [], "created_at": f"2024-01-01T00:{i % 60:02d}"}
+                             for i in range(5000)],
+                   "stats": {"total": 5000, "categories": {"Kiến Thức": 5000}}}, f)
+
+    registry = TopicRegistry(["Tổng Quát", "Kinh Doanh"])
+    start = time.perf_counter()
+    registry.topics()
+    print(f"Nạp lần đầu: {(time.perf_counter() - start) * 1000:.1f} ms, {len(registry)} chủ đề")
+
+    new_id = shard_manager.add_entry("Chủ đề mới", "nội dung")
+    shard_manager.add_entry("Tổng Quát", "trùng chủ đề gốc")
+    shard_manager.delete_entry("1")          # "Chủ đề 1" vẫn còn ở mục 4001
+    shard_manager.delete_entry("3999")       # "Chủ đề 3999" chỉ có một mục
+    incremental = list(registry.topics())
+    assert registry.reloads == 1, registry.reloads
+    expected = sorted({"Tổng Quát", "Kinh Doanh"} | {e["title"] for e in shard_manager.search_index()})
+    assert incremental == expected
+    assert "Chủ đề mới" in registry and "Chủ đề 3999" not in registry and "Chủ đề 1" in registry
+    assert registry.search("chu de moi") == ["Chủ đề mới"]
+    shard_manager.add_entry("Đầu tư vàng", "nội dung")
+    assert registry.search("dau tu vang") == ["Đầu tư vàng"] and registry.reloads == 1
+
+    n = 10000
+    start = time.perf_counter()
+    for _ in range(n):
+        registry.topics()
+    print(f"✅ Cập nhật tăng dần khớp dựng lại; topics() {(time.perf_counter() - start) / n * 1e6:.1f} µs/lần")
+    shard_manager.remove_listener(registry._on_change)
@@ -0,0 +1,195 @@
+"""
+Tìm chủ đề không phân biệt dấu tiếng Việt ("kinh doanh" khớp "Kinh Doanh", "suc khoe"
+khớp "Sức Khỏe") bằng chỉ mục trigram.
+
+- fold(): chữ thường, đ -> d, bỏ dấu (NFD, bỏ ký tự kết hợp), gộp khoảng trắng.
+- Postings: trigram của " <chuỗi đã fold> " -> array('i') id tiêu đề (tăng dần), thêm
+  bigram đầu từ (" k") cho truy vấn 1 ký tự. Truy vấn >= 3 ký tự lấy posting hiếm nhất
+  rồi kiểm tra chuỗi con; truy vấn 1-2 ký tự khớp theo đầu từ.
+- Nhiều trigram: giao các posting hiếm nhất bằng NumPy (nếu có) trước khi kiểm tra.
+- Kết quả được cache theo (truy vấn, limit) tới lần thêm / xóa kế tiếp - sidebar chạy lại
+  cùng truy vấn ở mỗi lần rerun.
+- Xếp hạng: trùng khớp > bắt đầu tiêu đề > bắt đầu một từ > chuỗi con; cùng hạng thì
+  tiêu đề khớp cả dấu đứng trước, rồi tiêu đề ngắn hơn, rồi theo thứ tự chữ cái.
+
+Không tự khóa: TopicRegistry gọi add / remove / search trong khóa của nó.
+"""
+import heapq
+import re
+import unicodedata
+from array import array
+from collections import OrderedDict
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+_SPACE_RE = re.compile(r"\s+")
+REBUILD_RATIO = 0.5      # dựng lại postings khi quá nửa id đã bị xóa
+INTERSECT_MIN = 256      # posting hiếm nhất dài hơn thì giao thêm với các posting khác
+CACHE_SIZE = 256
+
+
+def fold(text):
+    """Chuỗi không dấu, chữ thường, khoảng trắng đơn."""
+    text = text.lower().replace("đ", "d")
+    text = "".join(c for c in unicodedata.normalize("NFD", text) if not unicodedata.combining(c))
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def _keys(folded):
+    padded = f" {folded} "
+    keys = {padded[i:i + 3] for i in range(len(padded) - 2)}
+    keys.update(" " + word[0] for word in folded.split(" ") if word)
+    return keys
+
+
+class TopicSearchIndex:
+    """Chỉ mục trigram trên danh sách tiêu đề; hỗ trợ thêm / xóa tăng dần."""
+
+    def __init__(self, titles=()):
+        self._titles = []        # id -> tiêu đề (None = đã xóa)
+        self._folded = []        # id -> tiêu đề đã fold
+        self._ids = {}           # tiêu đề -> id
+        self._postings = {}
+        self._deleted = 0
+        self._cache = OrderedDict()
+        for title in titles:
+            self.add(title)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, title):
+        return title in self._ids
+
+    def add(self, title):
+        if title in self._ids:
+            return
+        self._cache.clear()
+        doc_id = len(self._titles)
+        folded = fold(title)
+        self._titles.append(title)
+        self._folded.append(folded)
+        self._ids[title] = doc_id
+        postings = self._postings
+        for key in _keys(folded):
+            posting = postings.get(key)
+            if posting is None:
+                posting = postings[key] = array('i')
+            posting.append(doc_id)
+
+    def remove(self, title):
+        doc_id = self._ids.pop(title, None)
+        if doc_id is None:
+            return
+        self._cache.clear()
+        self._titles[doc_id] = None  # postings giữ id cũ, bị bỏ qua khi tìm
+        self._deleted += 1
+        if self._deleted > REBUILD_RATIO * len(self._titles):
+            self.__init__(t for t in self._titles if t is not None)
+
+    def _candidates(self, query):
+        if len(query) < 3:
+            return self._postings.get(" " + query, ())
+        postings = []
+        for i in range(len(query) - 2):
+            posting = self._postings.get(query[i:i + 3])
+            if posting is None:
+                return ()
+            postings.append(posting)
+        postings.sort(key=len)
+        candidates = postings[0]
+        if not HAS_NUMPY or len(candidates) <= INTERSECT_MIN or len(postings) == 1:
+            return candidates
+        dtype = f"i{candidates.itemsize}"
+        result = np.frombuffer(candidates, dtype=dtype)
+        for posting in postings[1:]:
+            before = len(result)
+            result = np.intersect1d(result, np.frombuffer(posting, dtype=dtype), assume_unique=True)
+            if len(result) <= INTERSECT_MIN or len(result) > 0.9 * before:
+                break  # đủ nhỏ, hoặc các posting còn lại gần như trùng nhau
+        return result.tolist()
+
+    def search(self, query, limit=None):
+        """Tiêu đề khớp query (đã xếp hạng); query rỗng -> []."""
+        q = fold(query)
+        if not q:
+            return []
+        cache_key = (query, limit)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            self._cache.move_to_end(cache_key)
+            return list(cached)
+        raw = query.lower().strip()
+        titles, folded = self._titles, self._folded
+        word_q = " " + q
+        ranked = []
+        for doc_id in self._candidates(q):
+            title = titles[doc_id]
+            if title is None:
+                continue
+            text = folded[doc_id]
+            if text == q:
+                rank = 0
+            elif text.startswith(q):
+                rank = 1
+            elif word_q in text:
+                rank = 2
+            elif len(q) >= 3 and q in text:
+                rank = 3
+            else:
+                continue
+            ranked.append((rank, raw not in title.lower(), len(title), title))
+        if limit is not None and limit < len(ranked):
+            ranked = heapq.nsmallest(limit, ranked)
+        else:
+            ranked.sort()
+        result = [item[3] for item in ranked]
+        self._cache[cache_key] = tuple(result)
+        if len(self._cache) > CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return result
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    words = ["Kinh Doanh", "Sức Khỏe", "Tình Duyên", "Đầu Tư", "Vàng", "Nhà Đất", "Thi Cử", "Xuất Hành",
+             "Kiện Tụng", "Hôn Nhân", "Con Cái", "Công Việc", "Du Lịch", "Mua Xe", "Chứng Khoán"]
+    rng = random.Random(1)
+    titles = sorted({f"{rng.choice(words)} {rng.choice(words)} {i}" for i in range(100000)})
+    titles += ["Kinh Doanh", "Kinh Doanh Tổng Quát", "Đi Xa"]
+
+    start = time.perf_counter()
+    index = TopicSearchIndex(titles)
+    print(f"Dựng chỉ mục {len(index):,} tiêu đề: {time.perf_counter() - start:.2f} s")
+
+    assert index.search("kinh doanh", limit=2)[0] == "Kinh Doanh"
+    assert index.search("di xa") == ["Đi Xa"]
+    assert index.search("suc khoe 12", limit=5) == index.search("Sức Khỏe 12", limit=5)
+    for query in ("kinh", "tu", "khoe 99", "x", "hành 777"):
+        expected = {t for t in titles if fold(query) in fold(t)}
+        found = set(index.search(query))
+        assert found <= expected, query
+        if len(fold(query)) >= 3:
+            assert found == expected, query
+    index.remove("Đi Xa")
+    assert index.search("di xa") == []
+    index.add("Đi Xa Nước Ngoài")
+    assert index.search("đi xa") == ["Đi Xa Nước Ngoài"]
+
+    for query in ("di xa", "xuat hanh 5", "khoan 12345", "chứng khoán"):
+        start = time.perf_counter()
+        result = index.search(query, limit=20)
+        first_us = (time.perf_counter() - start) * 1e6
+        n = 2000
+        start = time.perf_counter()
+        for _ in range(n):
+            index.search(query, limit=20)
+        print(f"   {query!r:<16} {len(result):>3} kết quả, lần đầu {first_us:8.1f} µs, "
+              f"lặp lại {(time.perf_counter() - start) / n * 1e6:5.1f} µs")
+    print("✅ Tìm không dấu khớp tìm tuần tự")
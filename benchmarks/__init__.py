@@ -0,0 +1,26 @@
+"""
+Benchmark các engine tính toán (Kỳ Môn, Mai Hoa, Lục Hào).
+
+    python -m benchmarks                     # chạy và so với baseline (exit 1 nếu chậm hơn ngưỡng)
+    python -m benchmarks --save-baseline     # ghi kết quả hiện tại làm baseline
+    python -m benchmarks --engine qmdg_calc --corpus random --threshold 0.3
+
+Mỗi engine chạy trên các tập datetime cố định (xem corpora.py); kết quả gồm
+số lần gọi/giây, độ trễ p50/p99 và bộ nhớ cấp phát mỗi lần gọi (tracemalloc).
+"""
+from benchmarks.corpora import CORPORA, build_corpus
+from benchmarks.engines import ENGINES
+from benchmarks.runner import (
+    DEFAULT_BASELINE_FILE,
+    DEFAULT_THRESHOLD,
+    compare_to_baseline,
+    load_baseline,
+    run_benchmark,
+    run_suite,
+    save_baseline,
+)
+
+__all__ = [
+    'CORPORA', 'ENGINES', 'DEFAULT_BASELINE_FILE', 'DEFAULT_THRESHOLD',
+    'build_corpus', 'compare_to_baseline', 'load_baseline', 'run_benchmark', 'run_suite', 'save_baseline',
+]
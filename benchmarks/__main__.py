@@ -0,0 +1,55 @@
+"""python -m benchmarks [--engine E ...] [--corpus C ...] [--threshold 0.2] [--save-baseline] [--baseline FILE]"""
+import argparse
+import sys
+
+from benchmarks.corpora import CORPORA
+from benchmarks.engines import ENGINES
+from benchmarks.runner import (
+    DEFAULT_BASELINE_FILE,
+    DEFAULT_THRESHOLD,
+    compare_to_baseline,
+    load_baseline,
+    run_suite,
+    save_baseline,
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description="Benchmark các engine tính toán")
+    parser.add_argument('--engine', action='append', choices=list(ENGINES), help="chỉ chạy engine này (lặp lại được)")
+    parser.add_argument('--corpus', action='append', choices=list(CORPORA), help="chỉ chạy corpus này (lặp lại được)")
+    parser.add_argument('--repeat', type=int, default=5, help="số lượt đo mỗi corpus, lấy lượt tốt nhất (mặc định 5)")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"tỉ lệ hồi quy cho phép (mặc định {DEFAULT_THRESHOLD})")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_FILE, help="file baseline JSON")
+    parser.add_argument('--save-baseline', action='store_true', help="ghi kết quả làm baseline thay vì so sánh")
+    args = parser.parse_args(argv)
+
+    print(f"{'engine/corpus':<28}{'calls/s':>12}{'p50 µs':>10}{'p99 µs':>10}{'alloc B':>10}")
+
+    def report(name, r):
+        print(f"{name:<28}{r['calls_per_sec']:>12,.0f}{r['p50_us']:>10.2f}{r['p99_us']:>10.2f}"
+              f"{r['alloc_bytes_per_call']:>10,}")
+
+    results = run_suite(args.engine, args.corpus, args.repeat, progress=report)
+
+    if args.save_baseline:
+        print(f"✅ Đã ghi baseline: {save_baseline(results, args.baseline)}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"⚠️ Chưa có baseline ({args.baseline}) - chạy lại với --save-baseline")
+        return 0
+    regressions = compare_to_baseline(results, baseline, args.threshold)
+    if regressions:
+        print(f"❌ {len(regressions)} hồi quy vượt ngưỡng {args.threshold:.0%}:")
+        for name, metric, base, current, change in regressions:
+            print(f"   {name} {metric}: {base} -> {current} ({change:+.0%})")
+        return 1
+    print(f"✅ Không có hồi quy vượt ngưỡng {args.threshold:.0%} so với baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
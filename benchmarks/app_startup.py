@@ -0,0 +1,80 @@
+"""
+Đo thời gian khởi động app.py (Streamlit AppTest, không cần trình duyệt).
+
+    python -m benchmarks.app_startup [--reruns 5] [--view "📖 Mai Hoa 64 Quẻ" ...]
+
+cold = lần chạy script đầu tiên trong một tiến trình mới (view mặc định, gồm mọi import),
+switch = lần chạy đầu tiên sau khi chọn view (gồm import riêng của view),
+rerun = trung vị các lần chạy lại sau đó (cùng phiên, cùng view),
+modules = số module đã nạp sau cùng.
+Mỗi view được đo trong một tiến trình con riêng để cold start không bị cache import.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VIEWS = ["🔮 Kỳ Môn Độn Giáp", "📖 Mai Hoa 64 Quẻ", "☯️ Lục Hào Kinh Dịch", "🤖 Hỏi Gemini AI", "🏭 Nhà Máy AI"]
+
+
+def measure_view(view, reruns):
+    """Chạy trong tiến trình con: {"view", "cold_ms", "switch_ms", "rerun_ms", "modules", "errors"}."""
+    from streamlit.testing.v1 import AppTest
+
+    start = time.perf_counter()
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+    at.session_state["password_correct"] = True
+    at.secrets["GEMINI_API_KEY"] = ""  # không gọi mạng: dùng Free AI
+    at.run()
+    cold_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    if view != VIEWS[0]:
+        at.sidebar.radio[0].set_value(view)
+    at.run()
+    switch_ms = (time.perf_counter() - start) * 1000
+    times = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        times.append((time.perf_counter() - start) * 1000)
+    return {
+        "view": view,
+        "cold_ms": round(cold_ms, 1),
+        "switch_ms": round(switch_ms, 1),
+        "rerun_ms": round(statistics.median(times), 1) if times else None,
+        "modules": len(sys.modules),
+        "errors": [e.value for e in at.exception][:3],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.app_startup")
+    parser.add_argument("--reruns", type=int, default=5)
+    parser.add_argument("--view", action="append", choices=VIEWS)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(measure_view(args.child, args.reruns), ensure_ascii=False))
+        return 0
+
+    print(f"{'view':<26}{'cold ms':>10}{'switch ms':>11}{'rerun ms':>10}{'modules':>9}")
+    for view in args.view or VIEWS:
+        out = subprocess.run([sys.executable, "-m", "benchmarks.app_startup", "--child", view,
+                              "--reruns", str(args.reruns)], cwd=ROOT, capture_output=True, text=True)
+        try:
+            r = json.loads(out.stdout.strip().splitlines()[-1])
+        except (ValueError, IndexError):
+            print(f"{view:<26} ❌ {out.stderr.strip().splitlines()[-1:] or out.stdout[-200:]}")
+            continue
+        print(f"{view:<26}{r['cold_ms']:>10.0f}{r['switch_ms']:>11.0f}{r['rerun_ms']:>10.0f}{r['modules']:>9}"
+              + (f"  ⚠️ {r['errors']}" if r['errors'] else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
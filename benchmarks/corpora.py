@@ -0,0 +1,34 @@
+"""Tập datetime cố định cho benchmark - cùng tên luôn cho cùng danh sách thời điểm."""
+import random
+from datetime import datetime, timedelta
+
+# tên -> (mô tả, hàm dựng)
+CORPORA = {}
+
+
+def corpus(name, description):
+    def register(func):
+        CORPORA[name] = (description, func)
+        return func
+    return register
+
+
+@corpus('hourly_2024', "Mỗi khung 2 giờ của năm 2024 (4392 thời điểm)")
+def _hourly_2024():
+    start = datetime(2024, 1, 1)
+    return [start + timedelta(hours=2 * i) for i in range(366 * 12)]
+
+
+@corpus('random', "5000 thời điểm ngẫu nhiên 1900-2100 (seed cố định)")
+def _random_1900_2100():
+    rng = random.Random(20240101)
+    start = datetime(1900, 1, 1)
+    span_minutes = int((datetime(2100, 12, 31, 23, 59) - start).total_seconds() // 60)
+    return [start + timedelta(minutes=rng.randrange(span_minutes)) for _ in range(5000)]
+
+
+def build_corpus(name):
+    """Danh sách datetime của một corpus."""
+    if name not in CORPORA:
+        raise KeyError(f"Corpus không tồn tại: {name} (có: {', '.join(CORPORA)})")
+    return CORPORA[name][1]()
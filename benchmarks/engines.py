@@ -0,0 +1,48 @@
+"""
+Engine cần đo. Mỗi engine là một hàm prepare(datetimes) -> (func, args_list):
+phần chuẩn bị (tính trước tham số đầu vào) không nằm trong thời gian đo.
+"""
+
+# tên -> (mô tả, prepare)
+ENGINES = {}
+
+
+def engine(name, description):
+    def register(func):
+        ENGINES[name] = (description, func)
+        return func
+    return register
+
+
+@engine('qmdg_calc', "qmdg_calc.calculate_qmdg_params(dt)")
+def _qmdg_calc(datetimes):
+    from qmdg_calc import calculate_qmdg_params
+    return calculate_qmdg_params, [(dt,) for dt in datetimes]
+
+
+@engine('lap_ban_qmdg', "qmdg_data.lap_ban_qmdg (bàn gốc, không tra bảng)")
+def _lap_ban_qmdg(datetimes):
+    from qmdg_calc import calculate_qmdg_params
+    from qmdg_data import lap_ban_qmdg
+    args = []
+    for dt in datetimes:
+        p = calculate_qmdg_params(dt)
+        args.append((p['cuc'], p['truc_phu'], p['truc_su'], p['can_gio'], p['chi_gio'], p['is_duong_don']))
+    return lap_ban_qmdg, args
+
+
+@engine('mai_hoa', "mai_hoa_dich_so.tinh_qua_theo_thoi_gian(y, m, d, h)")
+def _mai_hoa(datetimes):
+    from mai_hoa_dich_so import tinh_qua_theo_thoi_gian
+    return tinh_qua_theo_thoi_gian, [(dt.year, dt.month, dt.day, dt.hour) for dt in datetimes]
+
+
+@engine('luc_hao', "luc_hao_kinh_dich.lap_qua_luc_hao(y, m, d, h, can_ngay, chi_ngay)")
+def _luc_hao(datetimes):
+    from luc_hao_kinh_dich import lap_qua_luc_hao
+    from qmdg_calc import get_can_chi_day
+    args = []
+    for dt in datetimes:
+        can_ngay, chi_ngay = get_can_chi_day(dt)
+        args.append((dt.year, dt.month, dt.day, dt.hour, "Chung", can_ngay, chi_ngay))
+    return lap_qua_luc_hao, args
@@ -0,0 +1,145 @@
+"""Đo engine, lưu baseline JSON và phát hiện hồi quy hiệu năng."""
+import gc
+import json
+import os
+import platform
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.corpora import build_corpus
+from benchmarks.engines import ENGINES
+
+DEFAULT_BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_THRESHOLD = 0.20      # chậm hơn / cấp phát nhiều hơn 20% so với baseline => hồi quy
+ALLOC_SAMPLE = 500            # số lần gọi đo bộ nhớ (tracemalloc làm chậm nên đo riêng)
+ALLOC_SLACK_BYTES = 64        # bỏ qua dao động nhỏ của bộ cấp phát
+
+
+def _percentile(sorted_values, q):
+    idx = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def run_benchmark(engine_name, corpus_name, repeat=5):
+    """
+    Đo một engine trên một corpus.
+    Returns:
+        dict: calls, calls_per_sec, p50_us, p99_us, alloc_bytes_per_call
+    """
+    func, args_list = ENGINES[engine_name][1](build_corpus(corpus_name))
+    for args in args_list:  # warm-up: nạp bảng tra, cache tiết khí...
+        func(*args)
+
+    # Mỗi lượt đo cả corpus; lấy lượt tốt nhất cho calls/s và p50 (ít nhiễu như timeit),
+    # p99 tính trên toàn bộ lần gọi.
+    perf = time.perf_counter_ns
+    latencies = []
+    best_round_ns = best_p50 = None
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            round_latencies = []
+            round_start = perf()
+            for args in args_list:
+                t0 = perf()
+                func(*args)
+                round_latencies.append(perf() - t0)
+            round_ns = perf() - round_start
+            round_latencies.sort()
+            round_p50 = _percentile(round_latencies, 0.50)
+            best_round_ns = round_ns if best_round_ns is None else min(best_round_ns, round_ns)
+            best_p50 = round_p50 if best_p50 is None else min(best_p50, round_p50)
+            latencies.extend(round_latencies)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    # Bộ nhớ: đỉnh cấp phát (tracemalloc) trong mỗi lần gọi
+    sample = args_list[:ALLOC_SAMPLE]
+    alloc_bytes = 0
+    tracemalloc.start()
+    try:
+        for args in sample:
+            before_bytes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            result = func(*args)
+            alloc_bytes += tracemalloc.get_traced_memory()[1] - before_bytes
+            del result
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'calls': len(latencies),
+        'calls_per_sec': round(len(args_list) / (best_round_ns / 1e9), 1),
+        'p50_us': round(best_p50 / 1000, 2),
+        'p99_us': round(_percentile(latencies, 0.99) / 1000, 2),
+        'alloc_bytes_per_call': round(alloc_bytes / len(sample)),
+    }
+
+
+def run_suite(engines=None, corpora=None, repeat=5, progress=None):
+    """Chạy mọi cặp (engine, corpus). Returns: {"engine/corpus": kết quả}."""
+    from benchmarks.corpora import CORPORA
+    results = {}
+    for engine_name in engines or ENGINES:
+        for corpus_name in corpora or CORPORA:
+            results[f"{engine_name}/{corpus_name}"] = run_benchmark(engine_name, corpus_name, repeat)
+            if progress:
+                progress(f"{engine_name}/{corpus_name}", results[f"{engine_name}/{corpus_name}"])
+    return results
+
+
+def _machine_info():
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'machine': platform.machine()}
+
+
+def save_baseline(results, path=None):
+    """Ghi (gộp) kết quả vào file baseline JSON."""
+    path = path or DEFAULT_BASELINE_FILE
+    baseline = load_baseline(path) or {'results': {}}
+    baseline['results'].update(results)
+    baseline['machine'] = _machine_info()
+    baseline['updated'] = datetime.now().isoformat(timespec='seconds')
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_baseline(path=None):
+    """Nạp baseline JSON. Trả về None nếu chưa có."""
+    path = path or DEFAULT_BASELINE_FILE
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_to_baseline(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    So sánh với baseline.
+    Returns:
+        list: (tên, chỉ số, baseline, hiện tại, tỉ lệ thay đổi) cho mỗi hồi quy vượt ngưỡng.
+    """
+    regressions = []
+    base_results = (baseline or {}).get('results', {})
+    for name, current in results.items():
+        base = base_results.get(name)
+        if not base:
+            continue
+        # Chỉ số càng thấp càng tốt (p99 chỉ để báo cáo - quá nhiễu để làm ngưỡng)
+        if base['p50_us'] and current['p50_us'] > base['p50_us'] * (1 + threshold):
+            regressions.append((name, 'p50_us', base['p50_us'], current['p50_us'], current['p50_us'] / base['p50_us'] - 1))
+        if current['alloc_bytes_per_call'] > base['alloc_bytes_per_call'] * (1 + threshold) + ALLOC_SLACK_BYTES:
+            regressions.append((name, 'alloc_bytes_per_call', base['alloc_bytes_per_call'],
+                                current['alloc_bytes_per_call'],
+                                current['alloc_bytes_per_call'] / max(1, base['alloc_bytes_per_call']) - 1))
+        # Càng cao càng tốt
+        if base['calls_per_sec'] and current['calls_per_sec'] < base['calls_per_sec'] * (1 - threshold):
+            regressions.append((name, 'calls_per_sec', base['calls_per_sec'], current['calls_per_sec'],
+                                current['calls_per_sec'] / base['calls_per_sec'] - 1))
+    return regressions
@@ -1,6 +1,7 @@
 
 import random
-from qmdg_data import KY_MON_DATA, QUAI_TUONG, CUNG_NGU_HANH, BAT_MON_CO_DINH_DISPLAY
+from qmdg_data import KY_MON_DATA, QUAI_TUONG, CUNG_NGU_HANH, BAT_MON_CO_DINH_DISPLAY, tra_cach_cuc
+from qmdg_analysis import analyze_chart, door_key
 
 class FreeAIHelper:
     """
@@ -23,11 +24,10 @@ class FreeAIHelper:
         
         # Get data from QMDG_DATA
         star_info = KY_MON_DATA['DU_LIEU_DUNG_THAN_PHU_TRO']['CUU_TINH'].get(star, {})
-        door_info = KY_MON_DATA['DU_LIEU_DUNG_THAN_PHU_TRO']['BAT_MON'].get(door + " Môn", {})
+        door_info = KY_MON_DATA['DU_LIEU_DUNG_THAN_PHU_TRO']['BAT_MON'].get(door_key(door), {})
         deity_info = KY_MON_DATA['DU_LIEU_DUNG_THAN_PHU_TRO']['BAT_THAN'].get(deity, {})
         
-        stem_key = f"{stem_top}{stem_bottom}"
-        stem_info = KY_MON_DATA['TRUCTU_TRANH'].get(stem_key, {})
+        stem_info = tra_cach_cuc(stem_top, stem_bottom) or {}
         
         # Assemble response
         response = f"""
@@ -81,9 +81,8 @@ Lưu ý đặc biệt về **{door}** và cách cục **{stem_info.get('Tên_Cá
             
         return f"**Giải thích {category}: {element_name}**\n\n{info}"
 
-    def comprehensive_analysis(self, chart_data, topic, dung_than_list=None):
-        """Generate a full chart report"""
-        
+    def comprehensive_analysis(self, chart_data, topic, dung_than_list=None, topic_hints="", **kwargs):
+        """Generate a full chart report (extra Gemini-only arguments such as subj_stem are ignored)"""
         report = [f"### 🛡️ BÁO CÁO TỔNG QUAN (OFFLINE MODE)\n**Chủ đề:** {topic}\n"]
         
         if dung_than_list:
@@ -92,21 +91,10 @@ Lưu ý đặc biệt về **{door}** và cách cục **{stem_info.get('Tên_Cá
         # Analyze Dụng Thần palaces first if possible, otherwise just summary
         report.append("#### 1. Đánh giá sơ bộ các cung:")
         
-        good_palaces = []
-        bad_palaces = []
-        
-        for p_num in range(1, 10):
-            if p_num == 5: continue
-            
-            door = chart_data['nhan_ban'].get(p_num)
-            door_full = door + " Môn" if door else ""
-            door_info = KY_MON_DATA['DU_LIEU_DUNG_THAN_PHU_TRO']['BAT_MON'].get(door_full, {})
-            cat_hung = door_info.get('Cát_Hung', 'Bình')
-            
-            if cat_hung in ['Đại Cát', 'Cát']:
-                good_palaces.append(f"Cung {p_num} ({door})")
-            elif cat_hung in ['Đại Hung', 'Hung']:
-                bad_palaces.append(f"Cung {p_num} ({door})")
+        # Cát/Hung of each door comes from the shared analysis stage
+        analyzed = analyze_chart(chart_data, topic)
+        good_palaces = [f"Cung {p.num} ({p.door})" for p in analyzed.palaces_by_cat_hung('Đại Cát', 'Cát')]
+        bad_palaces = [f"Cung {p.num} ({p.door})" for p in analyzed.palaces_by_cat_hung('Đại Hung', 'Hung')]
                 
         report.append(f"- **Các cung Cát lợi:** {', '.join(good_palaces) if good_palaces else 'Không rõ rệt'}")
         report.append(f"- **Các cung Bất lợi:** {', '.join(bad_palaces) if bad_palaces else 'Không rõ rệt'}")
@@ -3,11 +3,12 @@ Enhanced Gemini Helper with Context Awareness
 Gemini sẽ tự động biết ngữ cảnh: cung nào, chủ đề gì, đang xem phần nào
 """
 
-import google.generativeai as genai
 import os
 import requests
 import json
 
+from ai_client_pool import PoolBusy, get_client_pool, is_quota_error
+
 CUNG_NGU_HANH = {
     1: "Thủy",
     2: "Thổ",
@@ -35,11 +36,15 @@ CUNG_TEN = {
 class GeminiQMDGHelper:
     """Helper class with context awareness for QMDG analysis"""
     
-    def __init__(self, api_key):
-        """Initialize Gemini with API key"""
+    def __init__(self, api_key, model_name=None, pool=None):
+        """
+        Initialize Gemini with API key.
+        Model handles come from the shared AI client pool (warmed once per API key,
+        shared across sessions); model_name pins a specific model for this helper.
+        """
         self.api_key = api_key
-        genai.configure(api_key=api_key)
-        self._failed_models = set() # Track exhausted models
+        self.model_name = model_name
+        self._pool = pool or get_client_pool()
         
         # Context tracking
         self.current_context = {
@@ -49,9 +54,6 @@ class GeminiQMDGHelper:
             'last_action': None,
             'dung_than': []
         }
-        
-        # Adaptive model selection
-        self.model = self._get_best_model()
 
         # n8n endpoint (optional)
         self.n8n_url = None
@@ -60,62 +62,34 @@ class GeminiQMDGHelper:
         """Set n8n webhook URL for processing"""
         self.n8n_url = url
 
+    @property
+    def model(self):
+        """Current warmed model for this API key (selected lazily by the pool)"""
+        return self._get_best_model()
+
     def _get_best_model(self):
-        """Find the best available model for the current API key"""
-        # Prioritize 1.5 Pro because "gemini tốt nhất"
-        models_to_try = [
-            'gemini-2.0-flash-exp', # Try latest 2.0 flash
-            'gemini-1.5-pro-latest', 
-            'gemini-1.5-pro',
-            'gemini-1.5-flash-latest', 
-            'gemini-1.5-flash',
-            'gemini-pro', 
-            'gemini-1.0-pro'
-        ]
-        
-        last_error = "Unknown error"
-        for model_name in models_to_try:
-            if model_name in self._failed_models: continue # Skip known broken models
-            try:
-                model = genai.GenerativeModel(model_name)
-                # Quick test with low tokens
-                model.generate_content("ping", generation_config={"max_output_tokens": 1})
-                return model
-            except Exception as e:
-                last_error = str(e)
-                if "429" in last_error or "quota" in last_error.lower():
-                    self._failed_models.add(model_name)
-                continue
-        
-        # Fallback to list models if configured ones fail
-        try:
-            for m in genai.list_models():
-                if 'generateContent' in m.supported_generation_methods:
-                    name = m.name.split('/')[-1]
-                    if name in self._failed_models: continue
-                    try:
-                        model = genai.GenerativeModel(name)
-                        model.generate_content("ping", generation_config={"max_output_tokens": 1})
-                        return model
-                    except: continue
-        except Exception: pass
-        
-        # Ultimate fallback but store error info
-        self.last_startup_error = last_error
-        return genai.GenerativeModel('gemini-1.5-flash') # Default to flash as it's more widely available
+        """Find the best available model for the current API key (cached in the pool)"""
+        return self._pool.get_model(self.api_key, self.model_name)[1]
+
+    @property
+    def last_startup_error(self):
+        return self._pool.key_pool(self.api_key).last_error
 
     def test_connection(self):
         """Quickly test if the API key and model are working"""
         try:
-            response = self.model.generate_content("Xin chào?", generation_config={"max_output_tokens": 5})
+            with self._pool.lease(self.api_key, self.model_name) as model:
+                response = model.generate_content("Xin chào?", generation_config={"max_output_tokens": 5})
             if response.text:
                 return True, "Kết nối thành công!"
             return False, "Không nhận được phản hồi từ AI."
+        except PoolBusy:
+            return False, "Máy chủ AI đang bận, thử lại sau."
         except Exception as e:
             error_msg = str(e)
             if "API_KEY_INVALID" in error_msg:
                 return False, "API Key không chính xác."
-            elif "429" in error_msg or "quota" in error_msg.lower():
+            elif is_quota_error(e):
                 return False, "Đã hết hạn mức sử dụng (Quota) cho model này."
             return False, f"Lỗi: {error_msg}"
 
@@ -173,22 +147,23 @@ class GeminiQMDGHelper:
             except Exception as e:
                 print(f"n8n Exception: {e}")
         
-        # Option 2: Direct Gemini API with Swapping
+        # Option 2: Direct Gemini API with Swapping (shared pool: an exhausted model is
+        # marked for every session, the next lease gets the next best model)
         import time
         for attempt in range(3):
             try:
-                response = self.model.generate_content(prompt)
+                with self._pool.lease(self.api_key, self.model_name) as model:
+                    response = model.generate_content(prompt)
                 if not response.text:
                     return "⚠️ AI trả về kết quả trống."
                 return response.text
+            except PoolBusy:
+                return "⏳ Máy chủ AI đang bận, vui lòng thử lại sau ít giây."
             except Exception as e:
                 error_msg = str(e)
-                model_name = getattr(self.model, 'model_name', 'unknown').split('/')[-1]
                 
-                if "429" in error_msg or "quota" in error_msg.lower():
-                    self._failed_models.add(model_name)
-                    print(f"Model {model_name} exhausted. Switching...")
-                    self.model = self._get_best_model()
+                if is_quota_error(e):
+                    print("Model exhausted. Switching...")
                     time.sleep(1)
                     continue
                 
@@ -0,0 +1,453 @@
+# qmdg_almanac.py - Inverted almanac index (chỉ mục lịch Kỳ Môn theo năm)
+"""
+Chỉ mục đảo cho câu hỏi kiểu "giờ nào Sinh Môn cùng Lục Hợp, không Không Vong?".
+
+Mỗi năm được chia thành các khung giờ (qmdg_calc.iter_chart_timeline: khung 2 giờ,
+tách thêm ở nửa đêm và ranh giới Tiết Khí). Với mỗi đặc điểm (loại, giá trị, cung)
+- Môn / Sao / Thần / Can Thiên / Can Địa / cặp Can / Không Vong / Dịch Mã trong cung -
+chỉ mục lưu một bitset (Python int, bit i = khung i) các khung có đặc điểm đó.
+Truy vấn AND / OR / NOT là phép toán bit, đánh giá trên từng cung, không lập lại bàn nào.
+
+    from qmdg_almanac import door, deity, khong_vong, search
+    for start, end, palaces in search(door("Sinh Môn") & deity("Lục Hợp") & ~khong_vong(), t0, t1):
+        ...
+    search(parse_query("Sinh Môn AND Lục Hợp AND NOT Không Vong"), t0, t1)
+
+Cách Cục (cat_cach / hung_cach) được suy ra từ các bitset cặp Can lúc truy vấn theo
+ma trận qmdg_data.get_cach_cuc_matrix(), nên cách cục tùy chỉnh có hiệu lực ngay.
+
+Khi QMDG_ALMANAC_DIR trỏ tới một export của qmdg_columnar, các năm có trong export được
+dựng từ các cột đã tính sẵn thay vì lập lại bàn.
+"""
+import os
+import re
+import sys
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from qmdg_calc import CAN, iter_chart_timeline
+from qmdg_solar_terms import MAX_YEAR, MIN_YEAR, minute_key, minute_key_to_datetime
+
+PALACES = tuple(range(1, 10))
+ALMANAC_CACHE_SIZE = 32
+GOOD_CAT_HUNG = ("Cát", "Đại Cát")
+BAD_CAT_HUNG = ("Hung", "Đại Hung")
+
+_PLATE_KINDS = (('thien_ban', 'star'), ('nhan_ban', 'door'), ('than_ban', 'deity'),
+                ('can_thien_ban', 'can_thien'), ('dia_can', 'can_dia'))
+
+
+def _chart_features(chart):
+    """[(loại, giá trị, cung)] của một bàn (dict của qmdg_calc.timeline_chart)."""
+    features = []
+    for plate, kind in _PLATE_KINDS:
+        for palace, value in chart[plate].items():
+            features.append((kind, value, palace))
+    for palace in PALACES:
+        can_thien, can_dia = chart['can_thien_ban'].get(palace), chart['dia_can'].get(palace)
+        if can_thien and can_dia:
+            features.append(('pair', (can_thien, can_dia), palace))
+    for palace in chart['khong_vong']:
+        features.append(('khong_vong', True, palace))
+    if chart['dich_ma']:
+        features.append(('dich_ma', True, chart['dich_ma']))
+    return features
+
+
+def _bits_to_int(positions, size):
+    """Bitset (int) từ danh sách vị trí."""
+    bitmap = bytearray((size + 7) // 8)
+    for i in positions:
+        bitmap[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(bitmap, 'little')
+
+
+class AlmanacYear:
+    """Chỉ mục một năm: các khung giờ (minute key bắt đầu/kết thúc) + bitset theo đặc điểm."""
+    __slots__ = ('year', 'starts', 'end_key', 'postings', 'size', 'all_bits')
+
+    def __init__(self, year, starts, end_key, postings):
+        self.year = year
+        self.starts = starts
+        self.end_key = end_key
+        self.postings = postings
+        self.size = len(starts)
+        self.all_bits = (1 << self.size) - 1
+
+    @classmethod
+    def build(cls, year):
+        if not MIN_YEAR <= year <= MAX_YEAR:
+            raise ValueError(f"Năm {year} nằm ngoài phạm vi hỗ trợ ({MIN_YEAR}-{MAX_YEAR})")
+        starts = array('q')
+        slots_by_chart = {}
+        charts = {}
+        for start, _, chart in iter_chart_timeline(datetime(year, 1, 1), datetime(year + 1, 1, 1)):
+            slots_by_chart.setdefault(id(chart), []).append(len(starts))
+            charts[id(chart)] = chart
+            starts.append(minute_key(start))
+        size = len(starts)
+
+        postings = {}
+        for chart_id, positions in slots_by_chart.items():
+            bits = _bits_to_int(positions, size)
+            for feature in _chart_features(charts[chart_id]):
+                postings[feature] = postings.get(feature, 0) | bits
+        return cls(year, starts, minute_key(datetime(year + 1, 1, 1)), postings)
+
+    @classmethod
+    def from_columns(cls, columns, year):
+        """Dựng chỉ mục từ export dạng cột (qmdg_columnar.AlmanacColumns) thay vì lập bàn."""
+        import numpy as np
+        from qmdg_columnar import PLATE_COLUMNS
+
+        i, j = columns.year_range(year)
+        keys = columns['chart_key'][i:j]
+        rows = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) + i  # gộp khung cùng bàn như timeline
+        size = len(rows)
+
+        def bits(mask):
+            return int.from_bytes(np.packbits(mask, bitorder='little').tobytes(), 'little')
+
+        kinds = {'stars': 'star', 'doors': 'door', 'deities': 'deity',
+                 'heaven_stems': 'can_thien', 'earth_stems': 'can_dia'}
+        postings = {}
+        plates = {}
+        for name, _, names, _ in PLATE_COLUMNS:
+            plates[name] = np.asarray(columns[name][rows])
+            for palace in PALACES:
+                codes = plates[name][:, palace - 1]
+                for code in np.unique(codes).tolist():
+                    if code < len(names):
+                        postings[(kinds[name], names[code], palace)] = bits(codes == code)
+        pairs = plates['heaven_stems'].astype(np.int32) * 256 + plates['earth_stems']
+        for palace in PALACES:
+            codes = pairs[:, palace - 1]
+            for code in np.unique(codes).tolist():
+                thien, dia = divmod(code, 256)
+                if thien < len(CAN) and dia < len(CAN):
+                    postings[('pair', (CAN[thien], CAN[dia]), palace)] = bits(codes == code)
+        for name, kind in (('khong_vong_mask', 'khong_vong'), ('dich_ma_mask', 'dich_ma')):
+            masks = np.asarray(columns[name][rows])
+            for palace in PALACES:
+                present = (masks >> palace & 1).astype(bool)
+                if present.any():
+                    postings[(kind, True, palace)] = bits(present)
+        starts = array('q', np.asarray(columns['start_key'][rows]).tolist())
+        return cls(year, starts, minute_key(datetime(year + 1, 1, 1)), postings)
+
+    def posting(self, kind, value, palace):
+        return self.postings.get((kind, value, palace), 0)
+
+    def window_mask(self, start_key, end_key):
+        """Bitset các khung giao với [start_key, end_key)."""
+        first = max(0, bisect_right(self.starts, start_key) - 1)
+        last = bisect_left(self.starts, end_key)
+        if last <= first:
+            return 0
+        return ((1 << (last - first)) - 1) << first
+
+    def slot_range(self, i):
+        end = self.starts[i + 1] if i + 1 < self.size else self.end_key
+        return self.starts[i], end
+
+
+@lru_cache(maxsize=ALMANAC_CACHE_SIZE)
+def get_almanac_year(year):
+    """Chỉ mục của một năm (dựng lần đầu, sau đó lấy từ cache; đọc export dạng cột nếu có)."""
+    if os.environ.get("QMDG_ALMANAC_DIR"):
+        from qmdg_columnar import default_columns
+        columns = default_columns()
+        if columns is not None and columns.covers(year):
+            return AlmanacYear.from_columns(columns, year)
+    return AlmanacYear.build(year)
+
+
+# ======================================================================
+# BIỂU THỨC TRUY VẤN
+# ======================================================================
+
+class Query(ABC):
+    """Biểu thức truy vấn: kết hợp bằng &, |, ~ (AND, OR, NOT)."""
+    __slots__ = ()
+
+    def __and__(self, other):
+        return And(self, other)
+
+    def __or__(self, other):
+        return Or(self, other)
+
+    def __invert__(self):
+        return Not(self)
+
+    @abstractmethod
+    def evaluate(self, index, palace):
+        """Bitmask các khung giờ trong năm của index thỏa truy vấn tại cung palace."""
+
+
+class Term(Query):
+    __slots__ = ('kind', 'value')
+
+    def __init__(self, kind, value=True):
+        self.kind = kind
+        self.value = value
+
+    def evaluate(self, index, palace):
+        return index.posting(self.kind, self.value, palace)
+
+    def __repr__(self):
+        return f"{self.kind}={self.value!r}"
+
+
+class CachCucTerm(Query):
+    """Cặp Can Thiên/Địa trong cung có cách cục thuộc nhóm Cát_Hung cho trước."""
+    __slots__ = ('classes',)
+
+    def __init__(self, classes):
+        self.classes = tuple(classes)
+
+    def evaluate(self, index, palace):
+        from qmdg_data import CAN_10, get_cach_cuc_matrix
+        bits = 0
+        for t, row in enumerate(get_cach_cuc_matrix()):
+            for d, record in enumerate(row):
+                if record and record.get("Cát_Hung") in self.classes:
+                    bits |= index.posting('pair', (CAN_10[t], CAN_10[d]), palace)
+        return bits
+
+    def __repr__(self):
+        return f"cach_cuc in {self.classes!r}"
+
+
+class And(Query):
+    __slots__ = ('left', 'right')
+
+    def __init__(self, left, right):
+        self.left, self.right = left, right
+
+    def evaluate(self, index, palace):
+        bits = self.left.evaluate(index, palace)
+        return bits and bits & self.right.evaluate(index, palace)
+
+    def __repr__(self):
+        return f"({self.left!r} AND {self.right!r})"
+
+
+class Or(Query):
+    __slots__ = ('left', 'right')
+
+    def __init__(self, left, right):
+        self.left, self.right = left, right
+
+    def evaluate(self, index, palace):
+        return self.left.evaluate(index, palace) | self.right.evaluate(index, palace)
+
+    def __repr__(self):
+        return f"({self.left!r} OR {self.right!r})"
+
+
+class Not(Query):
+    __slots__ = ('inner',)
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    def evaluate(self, index, palace):
+        return index.all_bits & ~self.inner.evaluate(index, palace)
+
+    def __repr__(self):
+        return f"NOT {self.inner!r}"
+
+
+def door(name):
+    return Term('door', name if name.endswith(" Môn") else name + " Môn")
+
+
+def star(name):
+    return Term('star', name)
+
+
+def deity(name):
+    return Term('deity', name)
+
+
+def can_thien(name):
+    return Term('can_thien', name)
+
+
+def can_dia(name):
+    return Term('can_dia', name)
+
+
+def stem_pair(thien, dia):
+    return Term('pair', (thien, dia))
+
+
+def khong_vong():
+    return Term('khong_vong')
+
+
+def dich_ma():
+    return Term('dich_ma')
+
+
+def cat_cach():
+    return CachCucTerm(GOOD_CAT_HUNG)
+
+
+def hung_cach():
+    return CachCucTerm(BAD_CAT_HUNG)
+
+
+# ======================================================================
+# TÌM KIẾM
+# ======================================================================
+
+def iter_matches(query, start, end, palaces=PALACES):
+    """
+    Các khung giờ trong [start, end) thỏa truy vấn tại ít nhất một cung.
+    Yields:
+        (slot_start, slot_end, [cung thỏa mãn]) theo thứ tự thời gian.
+    """
+    start_key, end_key = minute_key(start), minute_key(end)
+    if end_key <= start_key:
+        return
+    # end là mốc loại trừ: năm cuối là năm của phút cuối cùng (end 2101-01-01 00:00 -> 2100)
+    last_year = (end - timedelta(minutes=1)).year
+    for year in range(start.year, last_year + 1):
+        index = get_almanac_year(year)
+        window = index.window_mask(start_key, end_key)
+        if not window:
+            continue
+        per_palace = [(p, query.evaluate(index, p) & window) for p in palaces]
+        per_palace = [(p, bits) for p, bits in per_palace if bits]
+        remaining = 0
+        for _, bits in per_palace:
+            remaining |= bits
+        while remaining:
+            low = remaining & -remaining
+            i = low.bit_length() - 1
+            remaining ^= low
+            slot_start, slot_end = index.slot_range(i)
+            yield (minute_key_to_datetime(max(slot_start, start_key)),
+                   minute_key_to_datetime(min(slot_end, end_key)),
+                   [p for p, bits in per_palace if bits & low])
+
+
+def search(query, start, end, palaces=PALACES, limit=None):
+    """Danh sách kết quả của iter_matches (tối đa limit phần tử)."""
+    results = []
+    for match in iter_matches(query, start, end, palaces):
+        results.append(match)
+        if limit and len(results) >= limit:
+            break
+    return results
+
+
+_TOKEN_RE = re.compile(r"(\(|\)|\bAND\b|\bOR\b|\bNOT\b)")
+
+
+def _atom(text):
+    """Một điều kiện đơn theo tên: Môn, Sao, Thần, 'Ất/Bính', 'Ất/*', '*/Bính', Không Vong..."""
+    from qmdg_chart import DEITY_NAMES, DOOR_NAMES, STAR_NAMES
+    name = " ".join(text.split())
+    lowered = name.lower()
+    if lowered == "không vong":
+        return khong_vong()
+    if lowered == "dịch mã":
+        return dich_ma()
+    if lowered in ("cát cách", "cách cục cát"):
+        return cat_cach()
+    if lowered in ("hung cách", "cách cục hung"):
+        return hung_cach()
+    if "/" in name:
+        thien, dia = (part.strip() for part in name.split("/", 1))
+        if thien in CAN and dia in CAN:
+            return stem_pair(thien, dia)
+        if thien in CAN and dia == "*":
+            return can_thien(thien)
+        if thien == "*" and dia in CAN:
+            return can_dia(dia)
+    if name in DOOR_NAMES or name + " Môn" in DOOR_NAMES:
+        return door(name)
+    if name in STAR_NAMES:
+        return star(name)
+    if name in DEITY_NAMES:
+        return deity(name)
+    raise ValueError(f"Không nhận ra điều kiện: {text!r}")
+
+
+def parse_query(text):
+    """
+    Phân tích truy vấn dạng chữ: AND / OR / NOT và ngoặc đơn, NOT ưu tiên cao nhất rồi đến AND.
+    Vd: "Sinh Môn AND (Lục Hợp OR Cửu Thiên) AND NOT Không Vong AND Cát Cách"
+    """
+    tokens = [t.strip() for t in _TOKEN_RE.split(text) if t.strip()]
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else None
+
+    def take():
+        nonlocal pos
+        pos += 1
+        return tokens[pos - 1]
+
+    def parse_or():
+        node = parse_and()
+        while peek() == "OR":
+            take()
+            node = node | parse_and()
+        return node
+
+    def parse_and():
+        node = parse_not()
+        while peek() == "AND":
+            take()
+            node = node & parse_not()
+        return node
+
+    def parse_not():
+        if peek() == "NOT":
+            take()
+            return ~parse_not()
+        if peek() == "(":
+            take()
+            node = parse_or()
+            if peek() != ")":
+                raise ValueError(f"Thiếu ')' trong truy vấn: {text!r}")
+            take()
+            return node
+        if peek() is None or peek() in ("AND", "OR", ")"):
+            raise ValueError(f"Truy vấn không hợp lệ: {text!r}")
+        return _atom(take())
+
+    node = parse_or()
+    if peek() is not None:
+        raise ValueError(f"Thừa '{peek()}' trong truy vấn: {text!r}")
+    return node
+
+
+if __name__ == "__main__":
+    # python qmdg_almanac.py "Sinh Môn AND Lục Hợp AND NOT Không Vong" [số ngày] [cung]
+    import time
+
+    text = sys.argv[1] if len(sys.argv) > 1 else "Sinh Môn AND Lục Hợp AND NOT Không Vong"
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+    palaces = (int(sys.argv[3]),) if len(sys.argv) > 3 else PALACES
+    query = parse_query(text)
+    now = datetime.now().replace(second=0, microsecond=0)
+
+    start_t = time.perf_counter()
+    get_almanac_year(now.year)
+    build_ms = (time.perf_counter() - start_t) * 1000
+    start_t = time.perf_counter()
+    matches = search(query, now, now + timedelta(days=days), palaces)
+    query_ms = (time.perf_counter() - start_t) * 1000
+
+    print(f"Truy vấn: {query!r}")
+    for slot_start, slot_end, hits in matches:
+        print(f"  {slot_start:%Y-%m-%d %H:%M} → {slot_end:%H:%M}  cung {', '.join(map(str, hits))}")
+    print(f"{len(matches)} khung giờ trong {days} ngày - dựng chỉ mục {build_ms:.0f} ms, truy vấn {query_ms:.1f} ms")
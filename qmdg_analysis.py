@@ -0,0 +1,363 @@
+# qmdg_analysis.py - Chart analysis stage (phân tích bàn một lần cho mỗi bàn + chủ đề)
+"""
+AnalyzedChart: mọi thuộc tính suy ra của 9 cung (Dụng Thần, Vượng/Tướng theo mùa,
+Cát/Hung của Môn, màu Cát/Hung, Lục Thân, Cách Cục, ...) được tính một lần cho mỗi
+(bàn, chủ đề, mùa, Lục Thân) rồi dùng chung: lưới 9 cung, phần so sánh Chủ/Khách,
+báo cáo kỹ thuật, prompt AI, FreeAIHelper và /api/calculate.
+
+Kết quả bất biến và được cache (lru_cache theo Chart 64 byte), nên nhiều phiên xem cùng
+khung giờ + chủ đề dùng chung một đối tượng.
+
+    from qmdg_analysis import analyze_chart
+    analyzed = analyze_chart(chart_data, selected_topic, season=season_of(month))
+    for palace in analyzed:
+        palace.star, palace.cat_hung, palace.strength, palace.has_dung_than, ...
+"""
+from collections.abc import Mapping
+from functools import lru_cache
+
+from qmdg_chart import Chart, ChartView
+from qmdg_data import (CUNG_NGU_HANH, KY_MON_DATA, QUAI_TUONG, TOPIC_INTERPRETATIONS, add_cach_cuc_listener,
+                       tra_cach_cuc)
+
+try:
+    from database_tuong_tac import SINH_KHAC_MATRIX
+    from phan_tich_da_tang import phan_tich_yeu_to_thoi_gian
+    USE_MULTI_LAYER_ANALYSIS = True
+except Exception:
+    USE_MULTI_LAYER_ANALYSIS = False
+    SINH_KHAC_MATRIX = {}
+
+CACHE_SIZE = 1024
+PALACES = tuple(range(1, 10))
+
+SEASON_BY_MONTH = {1: "Xuân", 2: "Xuân", 3: "Xuân", 4: "Hạ", 5: "Hạ", 6: "Hạ",
+                   7: "Thu", 8: "Thu", 9: "Thu", 10: "Đông", 11: "Đông", 12: "Đông"}
+STRENGTH_COLORS = {"Vượng": "#ef4444", "Tướng": "#f59e0b", "Hưu": "#10b981", "Tù": "#3b82f6", "Tử": "#64748b"}
+DEFAULT_STRENGTH_COLOR = "#475569"
+ELEMENT_STYLES = {
+    "Mộc": {"border": "#10b981", "icon": "🌿"},
+    "Hỏa": {"border": "#ef4444", "icon": "🔥"},
+    "Thổ": {"border": "#f59e0b", "icon": "⛰️"},
+    "Kim": {"border": "#94a3b8", "icon": "⚔️"},
+    "Thủy": {"border": "#3b82f6", "icon": "💧"},
+}
+DEFAULT_ELEMENT_STYLE = {"border": "#475569", "icon": "✨"}
+
+# Màu Cát (đỏ) / thường (xám đậm) theo loại yếu tố (khớp chuỗi con như lưới cũ)
+GOOD_NAMES = {
+    "star": ("Thiên Phụ", "Thiên Nhậm", "Thiên Tâm", "Thiên Cầm"),
+    "door": ("Khai", "Hưu", "Sinh", "Khai Môn", "Hưu Môn", "Sinh Môn"),
+    "deity": ("Trực Phù", "Thái Âm", "Lục Hợp", "Cửu Địa", "Cửu Thiên"),
+    "stem": ("Giáp", "Ất", "Bính", "Đinh", "Mậu"),
+}
+GOOD_COLOR, PLAIN_COLOR = "#ef4444", "#1e293b"
+
+# Điểm Cát/Hung 1-10 theo Môn, +/-1 theo Sao (như /api/calculate)
+DOOR_SCORES = {"Đại Cát": 9, "Cát": 7, "Hung": 3, "Đại Hung": 1}
+STEMS_ON_HEAVEN = ("Nhâm", "Quý", "Ất", "Bính", "Đinh", "Mậu", "Kỷ", "Canh", "Tân")
+# Dụng Thần dạng "Can Giờ"... -> (trụ, nhãn hiển thị khi khớp Can Thiên Bàn)
+SYMBOLIC_STEMS = {"Can Giờ": ('can_gio', "Can Giờ ({} - Sự việc)"), "Can Ngày": ('can_ngay', "Can Ngày ({})"),
+                  "Can Tháng": ('can_thang', "Can Tháng ({})"), "Can Năm": ('can_nam', "Can Năm ({})")}
+
+_PHU_TRO = KY_MON_DATA["DU_LIEU_DUNG_THAN_PHU_TRO"]
+_CAN_CHI = KY_MON_DATA["CAN_CHI_LUAN_GIAI"]
+
+
+def season_of(month):
+    return SEASON_BY_MONTH.get(month, "Xuân")
+
+
+def qmdg_color(name, category):
+    """Màu hiển thị của một yếu tố: đỏ nếu thuộc nhóm Cát của loại đó."""
+    return GOOD_COLOR if any(good in name for good in GOOD_NAMES[category]) else PLAIN_COLOR
+
+
+def door_key(door):
+    """Khóa BAT_MON của một Môn ("Khai" / "Khai Môn" -> "Khai Môn")."""
+    return door if " Môn" in door else door + " Môn"
+
+
+def resolve_relation(pillars, rel_type=None, custom_stem=None):
+    """(Can đại diện, nhãn) của đối tượng Lục Thân được chọn ở sidebar."""
+    rel_type = rel_type or "🧑 Bản thân"
+    if "Anh chị em" in rel_type:
+        return pillars['can_thang'], "Anh chị em"
+    if "Bố mẹ" in rel_type:
+        return pillars['can_nam'], "Bố mẹ"
+    if "Con cái" in rel_type:
+        return pillars['can_gio'], "Con cái"
+    if "Người lạ" in rel_type:
+        custom_stem = custom_stem or "Giáp"
+        if "Không rõ" in custom_stem:
+            return pillars['can_gio'], "Đối tượng (Can Giờ)"
+        return custom_stem, f"Đối tượng ({custom_stem})"
+    return pillars['can_ngay'], "Bản thân"
+
+
+class PalaceAnalysis:
+    """Một cung đã phân tích (bất biến, dùng chung giữa các phiên - không sửa tại chỗ)."""
+    __slots__ = (
+        'num', 'qua', 'title', 'hanh', 'star', 'door', 'deity', 'can_thien', 'can_dia',
+        'can_thien_display', 'door_key', 'star_info', 'door_info', 'deity_info',
+        'cat_hung', 'star_cat_hung', 'auspiciousness', 'strength', 'strength_color',
+        'border_color', 'icon', 'colors', 'has_dung_than', 'dung_than_found', 'is_relation',
+        'interaction', 'cach_cuc', 'meanings', 'khong_vong', 'dich_ma',
+    )
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            object.__setattr__(self, name, values[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PalaceAnalysis là bất biến")
+
+    def info(self):
+        """Dict cung theo định dạng so sánh Chủ/Khách (so, ten, hanh, sao, cua, than, can_thien, can_dia)."""
+        return {'so': self.num, 'ten': self.qua, 'hanh': self.hanh, 'sao': self.star, 'cua': self.door,
+                'than': self.deity, 'can_thien': self.can_thien, 'can_dia': self.can_dia}
+
+    def palace_data(self):
+        """Dict cung theo định dạng analyze_palace của AI helper."""
+        return {"num": self.num, "qua": self.qua, "hanh": self.hanh, "star": self.star, "door": self.door,
+                "deity": self.deity, "can_thien": self.can_thien, "can_dia": self.can_dia}
+
+    def __repr__(self):
+        return f"<PalaceAnalysis {self.num} {self.star}/{self.door}/{self.deity} {self.cat_hung} {self.strength}>"
+
+
+class AnalyzedChart:
+    """Bàn đã phân tích: 9 PalaceAnalysis + thông tin chung (Dụng Thần, Lục Thân, cung Chủ)."""
+    __slots__ = ('chart', 'topic', 'season', 'dung_than', 'hints', 'pillars', 'relation_stem',
+                 'relation_label', 'subject_palace', 'chu_palace', 'palaces')
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            object.__setattr__(self, name, values[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError("AnalyzedChart là bất biến")
+
+    def palace(self, num):
+        return self.palaces[num - 1]
+
+    def __iter__(self):
+        return iter(self.palaces)
+
+    def __len__(self):
+        return len(self.palaces)
+
+    @property
+    def view(self):
+        """chart_data (ChartView) tương ứng, cho các hàm còn nhận dict."""
+        return self.chart.view()
+
+    def palace_info(self, num):
+        return self.palace(num).info()
+
+    def summary_lines(self):
+        """Một dòng mỗi cung cho prompt AI."""
+        return [f"Cung {p.num}: Sao {p.star}, Môn {p.door}, Thần {p.deity}, Can {p.can_thien}/{p.can_dia}"
+                for p in self.palaces]
+
+    def palaces_by_cat_hung(self, *levels):
+        """Các cung (trừ Trung Cung) có Cát/Hung của Môn thuộc levels."""
+        return [p for p in self.palaces if p.num != 5 and p.cat_hung in levels]
+
+    def __repr__(self):
+        return f"<AnalyzedChart {self.chart!r} chủ đề {self.topic!r} mùa {self.season}>"
+
+
+def _as_chart(chart_data):
+    if isinstance(chart_data, Chart):
+        return chart_data
+    if isinstance(chart_data, ChartView):
+        return chart_data.chart
+    if isinstance(chart_data, Mapping):
+        # chart_data dict kiểu cũ (vd. tinh_ky_mon_don_gian): mã hóa lại thành Chart
+        get = chart_data.get
+        params = {key: get(key) for key in ('can_gio', 'chi_gio', 'can_ngay', 'chi_ngay', 'can_thang',
+                                            'chi_thang', 'can_nam', 'chi_nam', 'tiet_khi', 'is_duong_don')}
+        if isinstance(get('cuc'), int):
+            params['cuc'] = get('cuc')
+        dich_ma, truc_phu_cung = get('dich_ma'), get('truc_phu_cung')
+        return Chart.from_plates(get('thien_ban') or {}, get('can_thien_ban') or {}, get('nhan_ban') or {},
+                                 get('than_ban') or {}, get('dia_can') or {}, get('khong_vong') or (),
+                                 dich_ma if isinstance(dich_ma, int) else None,
+                                 truc_phu_cung if isinstance(truc_phu_cung, int) else None, params)
+    raise TypeError(f"Không phân tích được chart_data kiểu {type(chart_data).__name__}")
+
+
+def _found_dung_than(dung_than, star, door, deity, can_thien, pillars, khong_vong, dich_ma):
+    """Dụng Thần có mặt trong cung (quy tắc khớp của phần chi tiết cung)."""
+    found = []
+    for dt in dung_than:
+        display_name = dt
+        if dt in (star, deity):
+            is_match = True
+        elif dt == door or dt == f"{door} Môn" or (door and dt.startswith(door)):
+            is_match = True
+        elif dt in SYMBOLIC_STEMS:
+            key, fmt = SYMBOLIC_STEMS[dt]
+            is_match = pillars[key] == can_thien
+            display_name = fmt.format(pillars[key])
+        elif dt in STEMS_ON_HEAVEN:
+            is_match = dt == can_thien
+        elif dt == "Mã Tinh":
+            is_match = dich_ma
+        elif dt == "Không Vong":
+            is_match = khong_vong
+        else:
+            is_match = False
+        if is_match:
+            found.append(display_name)
+    return found
+
+
+def _analyze_palace(chart, num, view, dung_than, season, pillars, relation_stem, relation_label, subject_hanh):
+    star = view['thien_ban'].get(num, 'N/A')
+    door = view['nhan_ban'].get(num, 'N/A')
+    deity = view['than_ban'].get(num, 'N/A')
+    can_thien = view['can_thien_ban'].get(num, 'N/A')
+    can_dia = view['dia_can'].get(num, 'N/A')
+    hanh = CUNG_NGU_HANH.get(num, 'N/A')
+    elements = (star, door, deity, can_thien, can_dia)
+
+    key = door_key(door)
+    door_info = _PHU_TRO["BAT_MON"].get(key, {})
+    star_info = _PHU_TRO["CUU_TINH"].get(star, {})
+    deity_info = _PHU_TRO["BAT_THAN"].get(deity, {})
+    cat_hung = door_info.get("Cát_Hung", "Bình")
+    star_cat_hung = star_info.get("Cát_Hung", "Bình")
+    auspiciousness = DOOR_SCORES.get(cat_hung, 5)
+    if star_cat_hung == "Cát":
+        auspiciousness = min(10, auspiciousness + 1)
+    elif star_cat_hung == "Hung":
+        auspiciousness = max(1, auspiciousness - 1)
+
+    strength = phan_tich_yeu_to_thoi_gian(hanh, season) if USE_MULTI_LAYER_ANALYSIS else "Bình"
+    style = ELEMENT_STYLES.get(hanh, DEFAULT_ELEMENT_STYLE)
+    khong_vong = chart.is_khong_vong(num)
+    dich_ma = chart.is_dich_ma(num)
+
+    # Trung Cung không có Can Thiên Bàn: hiển thị (và tra Cách Cục / Dụng Thần) theo Can Địa Bàn
+    shown = can_dia if num == 5 and can_thien == 'N/A' else can_thien
+    found = _found_dung_than(dung_than, star, door, deity, shown, pillars, khong_vong, dich_ma)
+    is_relation = relation_stem == shown
+    if is_relation:
+        found.append(f"📍 {relation_label}")
+
+    return PalaceAnalysis(
+        num=num,
+        qua=QUAI_TUONG.get(num, 'N/A'),
+        title="5 Trung Cung" if num == 5 else f"{num} {QUAI_TUONG.get(num, '')}",
+        hanh=hanh, star=star, door=door, deity=deity, can_thien=can_thien, can_dia=can_dia,
+        can_thien_display=shown,
+        door_key=key, star_info=star_info, door_info=door_info, deity_info=deity_info,
+        cat_hung=cat_hung, star_cat_hung=star_cat_hung, auspiciousness=auspiciousness,
+        strength=strength, strength_color=STRENGTH_COLORS.get(strength, DEFAULT_STRENGTH_COLOR),
+        border_color=style["border"], icon=style["icon"],
+        colors={'star': qmdg_color(star, "star"), 'door': qmdg_color(door, "door"),
+                'deity': qmdg_color(deity, "deity"), 'can_thien': qmdg_color(can_thien, "stem"),
+                'can_dia': qmdg_color(can_dia, "stem")},
+        has_dung_than=any(dt in elements for dt in dung_than),
+        dung_than_found=tuple(found),
+        is_relation=is_relation,
+        interaction=SINH_KHAC_MATRIX.get(subject_hanh, {}).get(hanh, "Bình Hòa"),
+        cach_cuc=tra_cach_cuc(shown, can_dia),
+        meanings=(
+            deity_info.get("Tính_Chất", "N/A"),
+            star_info.get("Tính_Chất", "N/A"),
+            door_info.get("Luận_Đoán", "N/A"),
+            _CAN_CHI.get(shown, {}).get("Tính_Chất", "N/A"),
+            _CAN_CHI.get(can_dia, {}).get("Tính_Chất", "N/A"),
+        ),
+        khong_vong=khong_vong, dich_ma=dich_ma,
+    )
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _analyze(chart, topic, season, rel_type, custom_stem):
+    view = chart.view()
+    pillars = {key: view[key] for key in ('can_gio', 'can_ngay', 'can_thang', 'can_nam')}
+    topic_data = TOPIC_INTERPRETATIONS.get(topic, {}) if topic else {}
+    dung_than = tuple(topic_data.get("Dụng_Thần", []))
+    relation_stem, relation_label = resolve_relation(pillars, rel_type, custom_stem)
+
+    # Cung Bản thân: Can Ngày trên Địa Bàn (phần chi tiết cung); cung Chủ: trên Thiên Bàn (so sánh)
+    subject_palace = next((p for p, can in view['dia_can'].items() if can == pillars['can_ngay']), 0)
+    chu_palace = next((p for p, can in view['can_thien_ban'].items() if can == pillars['can_ngay']), 5)
+    subject_hanh = CUNG_NGU_HANH.get(subject_palace, "Thổ")
+
+    palaces = tuple(_analyze_palace(chart, num, view, dung_than, season, pillars,
+                                    relation_stem, relation_label, subject_hanh) for num in PALACES)
+    return AnalyzedChart(
+        chart=chart, topic=topic, season=season, dung_than=dung_than,
+        hints=topic_data.get("Luận_Giải_Gợi_Ý", ""), pillars=pillars,
+        relation_stem=relation_stem, relation_label=relation_label,
+        subject_palace=subject_palace, chu_palace=chu_palace, palaces=palaces,
+    )
+
+
+# Cách Cục tùy chỉnh thay đổi (save_custom_data) -> bỏ mọi AnalyzedChart đã cache
+add_cach_cuc_listener(_analyze.cache_clear)
+
+
+def analyze_chart(chart_data, topic=None, season=None, rel_type=None, custom_stem=None):
+    """
+    AnalyzedChart của một bàn (Chart, ChartView hoặc dict chart_data kiểu cũ).
+    season: "Xuân"/"Hạ"/"Thu"/"Đông" (mặc định theo tháng hiện tại, như lưới 9 cung);
+    rel_type / custom_stem: lựa chọn Lục Thân ở sidebar (mặc định Bản thân).
+    """
+    if season is None:
+        from datetime import datetime
+        season = season_of(datetime.now().month)
+    if rel_type is None or "Người lạ" not in rel_type:
+        custom_stem = None  # chỉ "Người lạ" dùng Can tự chọn: không tách cache vô ích
+    return _analyze(_as_chart(chart_data), topic, season, rel_type, custom_stem)
+
+
+def cache_info():
+    return _analyze.cache_info()
+
+
+if __name__ == "__main__":
+    import time
+    from datetime import datetime, timedelta
+
+    from qmdg_calc import calculate_qmdg_params
+
+    # Đối chiếu với cách lưới 9 cung cũ tính từng thuộc tính
+    topic = next(iter(TOPIC_INTERPRETATIONS))
+    t = datetime(2024, 3, 1)
+    for _ in range(200):
+        view = Chart.from_params(calculate_qmdg_params(t)).view()
+        analyzed = analyze_chart(view, topic, season="Xuân")
+        dung_than_list = TOPIC_INTERPRETATIONS[topic].get("Dụng_Thần", [])
+        for p in analyzed:
+            sao = view['thien_ban'].get(p.num, 'N/A')
+            cua = view['nhan_ban'].get(p.num, 'N/A')
+            than = view['than_ban'].get(p.num, 'N/A')
+            can_thien = view['can_thien_ban'].get(p.num, 'N/A')
+            can_dia = view['dia_can'].get(p.num, 'N/A')
+            assert (p.star, p.door, p.deity, p.can_thien, p.can_dia) == (sao, cua, than, can_thien, can_dia)
+            assert p.has_dung_than == any(dt in [sao, cua, than, can_thien, can_dia] for dt in dung_than_list)
+            door_data = _PHU_TRO["BAT_MON"].get(cua if " Môn" in cua else cua + " Môn", {})
+            assert p.cat_hung == door_data.get("Cát_Hung", "Bình")
+            assert p.khong_vong == (p.num in view['khong_vong']) and p.dich_ma == (p.num == view['dich_ma'])
+            shown = can_dia if p.num == 5 and can_thien == 'N/A' else can_thien
+            assert p.cach_cuc == tra_cach_cuc(shown, can_dia)
+        t += timedelta(hours=2)
+    print(f"✅ Khớp cách tính từng cung cũ trên 200 bàn ({topic})")
+
+    view = Chart.from_params(calculate_qmdg_params(datetime.now())).view()
+    n = 2000
+    start = time.perf_counter()
+    for _ in range(n):
+        _analyze.__wrapped__(view.chart, topic, "Xuân", None, None)
+    build_us = (time.perf_counter() - start) / n * 1e6
+    start = time.perf_counter()
+    for _ in range(n):
+        analyze_chart(view, topic, season="Xuân")
+    cached_us = (time.perf_counter() - start) / n * 1e6
+    print(f"   dựng AnalyzedChart {build_us:.0f} µs, lấy từ cache {cached_us:.1f} µs ({cache_info()})")
@@ -0,0 +1,317 @@
+# qmdg_auspicious.py - Auspicious-time search (tìm giờ tốt theo chủ đề)
+"""
+Tìm top-K khung giờ tốt nhất trong một khoảng ngày cho một chủ đề (Dụng Thần trong
+TOPIC_INTERPRETATIONS) và một Can chủ thể.
+
+Điểm của một khung giờ chỉ phụ thuộc vào khóa bàn (Cục, Âm/Dương Độn, giờ Can Chi:
+1080 khóa) và Can chủ thể (10), nên được tính sẵn thành bảng SCORE[khóa, can] rồi tra
+bằng NumPy cho cả lô khung giờ. Mỗi ngày có cận trên = điểm lớn nhất của 12 giờ Can Chi
+trong ngày với (các) Cục của ngày đó; ngày được duyệt theo cận trên giảm dần và dừng
+ngay khi cận trên không thể vượt phần tử thứ K - tìm theo tháng/năm vẫn tức thì.
+
+Điểm khung giờ = trung bình điểm các cung Dụng Thần
+               + quan hệ Sinh Khắc (SINH_KHAC_MATRIX) giữa cung chủ thể và Dụng Thần chính.
+Điểm cung giống /api/calculate (Cát Hung của Môn, ±1 theo Sao), -2 nếu Không Vong,
+±1 theo Cách Cục của cặp Can.
+
+    from qmdg_auspicious import find_auspicious_times
+    find_auspicious_times("Kinh Doanh Tổng Quát", start, end, subject="Can Ngày", k=10)
+"""
+import heapq
+import sys
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+
+import qmdg_calc
+from qmdg_batch import EPOCH_ORDINAL, params_from_minute_keys, term_indices
+from qmdg_calc import CAN, CHART_KEYS, CYCLE_CAN, CYCLE_CHI, SLOT_START_MINUTES, timeline_chart
+from qmdg_solar_terms import MINUTES_PER_DAY, minute_key, minute_key_to_datetime, year_term_table
+
+SUBJECT_DAY = "Can Ngày"             # chủ thể = Can Ngày của từng khung giờ
+DAY_CHUNK = 16                       # số ngày chấm điểm mỗi lượt (vector hóa)
+
+DOOR_SCORE = {"Đại Cát": 9, "Cát": 7, "Hung": 3, "Đại Hung": 1}
+# SINH_KHAC_MATRIX[chủ][dụng thần] -> điểm cộng cho chủ thể
+RELATION_SCORE = {"Được Sinh": 2.0, "Khắc": 1.0, "Bình": 0.5, "Sinh": -0.5, "Bị Khắc": -2.0}
+
+
+def chart_key(is_duong_don, cuc, hour_cycle):
+    return (int(is_duong_don) * 9 + cuc - 1) * 60 + hour_cycle
+
+
+@lru_cache(maxsize=1)
+def all_charts():
+    """1080 bàn theo chart_key (dict của qmdg_calc.timeline_chart)."""
+    charts = [None] * CHART_KEYS
+    for dun in (False, True):
+        for cuc in range(1, 10):
+            for hour_cycle in range(60):
+                charts[chart_key(dun, cuc, hour_cycle)] = timeline_chart(cuc, dun, hour_cycle)
+    return charts
+
+
+def palace_scores(chart):
+    """Điểm 1-10 của 9 cung (index 0 = cung 1)."""
+    from qmdg_data import KY_MON_DATA, get_cach_cuc_matrix, CAN_CODE
+    phu_tro = KY_MON_DATA["DU_LIEU_DUNG_THAN_PHU_TRO"]
+    matrix = get_cach_cuc_matrix()
+    scores = []
+    for p in range(1, 10):
+        door = chart['nhan_ban'].get(p)
+        score = DOOR_SCORE.get(phu_tro["BAT_MON"].get(door, {}).get("Cát_Hung"), 5) if door else 5
+        star_cat_hung = phu_tro["CUU_TINH"].get(chart['thien_ban'].get(p), {}).get("Cát_Hung")
+        if star_cat_hung == "Cát":
+            score = min(10, score + 1)
+        elif star_cat_hung == "Hung":
+            score = max(1, score - 1)
+        if p in chart['khong_vong']:
+            score -= 2
+        thien, dia = CAN_CODE.get(chart['can_thien_ban'].get(p)), CAN_CODE.get(chart['dia_can'].get(p))
+        record = matrix[thien][dia] if thien is not None and dia is not None else None
+        if record:
+            if record.get("Cát_Hung") in ("Cát", "Đại Cát"):
+                score += 1
+            elif record.get("Cát_Hung") in ("Hung", "Đại Hung"):
+                score -= 1
+        scores.append(score)
+    return scores
+
+
+def _stem_palace(chart, stem):
+    """Cung có Can ở Thiên Bàn (Giáp ẩn dưới Tuần Thủ)."""
+    stem = chart['tuan_thu'] if stem == "Giáp" else stem
+    for p, can in chart['can_thien_ban'].items():
+        if can == stem:
+            return p
+    for p, can in chart['dia_can'].items():  # cung 5 chỉ có Can Địa
+        if can == stem:
+            return p
+    return None
+
+
+def dung_than_palaces(chart, dung_than_list):
+    """
+    Cung của từng Dụng Thần còn xác định được trên bàn.
+    Can Ngày (chủ thể) và Can Tháng/Năm (không thuộc khóa bàn) được bỏ qua.
+    """
+    palaces = []
+    for dt in dung_than_list:
+        name = dt.split("(")[0].strip()
+        if name.lower().startswith(("can ngày", "can tháng", "can năm")):
+            continue
+        if name.startswith("Can Giờ"):
+            palace = _stem_palace(chart, chart['can_gio'])
+        elif name.startswith("Cung "):
+            digits = [int(c) for c in name[5:] if c.isdigit()]
+            palace = digits[0] if digits else None
+        elif name in CAN:
+            palace = _stem_palace(chart, name)
+        else:
+            palace = next((p for plate in ('nhan_ban', 'thien_ban', 'than_ban')
+                           for p, value in chart[plate].items() if name and name in value), None)
+        if palace:
+            palaces.append(palace)
+    return palaces
+
+
+def _clear_score_tables():
+    score_table.cache_clear()
+    day_bound_table.cache_clear()
+
+
+@lru_cache(maxsize=64)
+def score_table(topic):
+    """
+    Bảng điểm (1080, 10): hàng = chart_key, cột = mã Can chủ thể.
+    Xóa cùng day_bound_table khi Cách Cục tùy chỉnh thay đổi (add_cach_cuc_listener).
+    Raises:
+        KeyError: chủ đề không có trong TOPIC_INTERPRETATIONS.
+    """
+    from qmdg_data import CUNG_NGU_HANH, TOPIC_INTERPRETATIONS, add_cach_cuc_listener
+    from database_tuong_tac import SINH_KHAC_MATRIX
+    add_cach_cuc_listener(_clear_score_tables)  # qmdg_data chỉ được import khi cần
+    dung_than_list = TOPIC_INTERPRETATIONS[topic].get("Dụng_Thần", [])
+    table = np.zeros((CHART_KEYS, 10), dtype=np.float64)
+    for key, chart in enumerate(all_charts()):
+        scores = palace_scores(chart)
+        palaces = dung_than_palaces(chart, dung_than_list)
+        base = sum(scores[p - 1] for p in palaces) / len(palaces) if palaces else 5.0
+        for subject in range(10):
+            subject_palace = _stem_palace(chart, CAN[subject])
+            if palaces and subject_palace:
+                relation = SINH_KHAC_MATRIX[CUNG_NGU_HANH[subject_palace]][CUNG_NGU_HANH[palaces[0]]]
+                bonus = RELATION_SCORE.get(relation, 0.0)
+            elif subject_palace:
+                bonus = (scores[subject_palace - 1] - 5) / 4
+            else:
+                bonus = 0.0
+            table[key, subject] = base + bonus
+    return table
+
+
+@lru_cache(maxsize=64)
+def day_bound_table(topic):
+    """Cận trên (18 Cục/Độn, 10 Can ngày, 10 Can chủ thể): max điểm của 12 giờ trong ngày."""
+    table = score_table(topic)
+    bounds = np.empty((18, 10, 10), dtype=np.float64)
+    for cd in range(18):
+        for day_can in range(10):
+            start = qmdg_calc.DAY_HOUR_START[day_can]
+            keys = [cd * 60 + qmdg_calc.HOUR_CYCLE[start][slot] for slot in range(12)]
+            bounds[cd, day_can] = table[keys].max(axis=0)
+    return bounds
+
+
+def _subject_code(subject):
+    if subject == SUBJECT_DAY:
+        return None
+    if subject not in CAN:
+        raise ValueError(f"Can chủ thể không hợp lệ: {subject!r} (dùng một Can hoặc '{SUBJECT_DAY}')")
+    return CAN.index(subject)
+
+
+def _day_ranges(start_key, end_key):
+    """Các ngày giao với [start_key, end_key): ordinal, cd lúc đầu/cuối ngày, Can ngày."""
+    first_day, last_day = start_key // MINUTES_PER_DAY, (end_key - 1) // MINUTES_PER_DAY
+    days = np.arange(first_day, last_day + 1, dtype=np.int64)
+    day_start = np.maximum(days * MINUTES_PER_DAY, start_key)
+    day_end = np.minimum((days + 1) * MINUTES_PER_DAY, end_key) - 1
+    day_cycle = (days - qmdg_calc.GIAP_TY_ORDINAL) % 60
+    years = (days - EPOCH_ORDINAL).astype('datetime64[D]').astype('datetime64[Y]').astype(np.int64) + 1970
+    yuan = np.array(qmdg_calc.DAY_YUAN, dtype=np.int64)[day_cycle]
+    cuc_by_term = np.array(qmdg_calc.CUC_BY_TERM, dtype=np.int64)
+
+    def cd_at(keys):
+        term = term_indices(keys, years).astype(np.int64)
+        dun = (term < qmdg_calc.YANG_TERM_COUNT).astype(np.int64)
+        return dun * 9 + cuc_by_term[term, yuan] - 1
+
+    return days, day_start, day_end, cd_at(day_start), cd_at(day_end), day_cycle % 10
+
+
+def _day_slots(day, start_key, end_key):
+    """Minute key bắt đầu/kết thúc các khung giờ của một ngày (tách tại ranh giới Tiết Khí)."""
+    base = day * MINUTES_PER_DAY
+    year = minute_key_to_datetime(base).year
+    starts = {base + minute for minute in SLOT_START_MINUTES}
+    starts.update(k for k in year_term_table(year)[0] if base < k < base + MINUTES_PER_DAY)
+    first = max(start_key, base)
+    starts = sorted(k for k in starts if first <= k < end_key)
+    if not starts or starts[0] > first:
+        starts.insert(0, first)
+    ends = starts[1:] + [min(end_key, base + MINUTES_PER_DAY)]
+    return starts, ends
+
+
+def find_auspicious_times(topic, start, end, subject=SUBJECT_DAY, k=10):
+    """
+    Top-K khung giờ tốt nhất trong [start, end).
+    Args:
+        topic: tên chủ đề trong TOPIC_INTERPRETATIONS.
+        subject: Can chủ thể ("Giáp"..."Quý") hoặc "Can Ngày" (Can của từng ngày).
+    Returns:
+        list[dict]: start, end, score, cuc, is_duong_don, can_gio, chi_gio - điểm giảm dần,
+        cùng điểm thì khung sớm hơn đứng trước.
+    """
+    subject_code = _subject_code(subject)
+    table = score_table(topic)
+    bounds = day_bound_table(topic)
+    start_key, end_key = minute_key(start), minute_key(end)
+    if k <= 0 or start_key >= end_key:
+        return []
+
+    days, day_start, _, cd_start, cd_end, day_can = _day_ranges(start_key, end_key)
+    subj = day_can if subject_code is None else np.full(len(days), subject_code)
+    day_bound = np.maximum(bounds[cd_start, day_can, subj], bounds[cd_end, day_can, subj])
+    order = np.lexsort((days, -day_bound))  # cận trên giảm dần, ngày sớm trước
+
+    heap = []  # (score, -start_key, end_key, key code) - K phần tử tốt nhất
+    for chunk_start in range(0, len(order), DAY_CHUNK):
+        chunk = order[chunk_start:chunk_start + DAY_CHUNK]
+        if len(heap) == k and (day_bound[chunk[0]], -day_start[chunk[0]]) < heap[0][:2]:
+            break  # không ngày nào còn lại có thể lọt vào top-K
+        slot_starts, slot_ends = [], []
+        for i in chunk:
+            if len(heap) == k and (day_bound[i], -day_start[i]) < heap[0][:2]:
+                break
+            starts, ends = _day_slots(int(days[i]), start_key, end_key)
+            slot_starts.extend(starts)
+            slot_ends.extend(ends)
+        if not slot_starts:
+            break
+
+        params = params_from_minute_keys(slot_starts)
+        can_gio, chi_gio = params['can_gio'].astype(np.int64), params['chi_gio'].astype(np.int64)
+        hour_cycle = (6 * can_gio - 5 * chi_gio) % 60
+        keys = (params['is_duong_don'].astype(np.int64) * 9 + params['cuc'] - 1) * 60 + hour_cycle
+        if subject_code is None:
+            subjects = params['can_ngay'].astype(np.int64)
+        else:
+            subjects = np.full(len(keys), subject_code)
+        scores = table[keys, subjects]  # chấm điểm vector hóa cho cả lô
+
+        for score, s_key, e_key, key in zip(scores.tolist(), slot_starts, slot_ends, keys.tolist()):
+            item = (score, -s_key, e_key, key)
+            if len(heap) < k:
+                heapq.heappush(heap, item)
+            elif item[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, item)
+
+    results = []
+    for score, neg_start, e_key, key in sorted(heap, key=lambda x: (-x[0], -x[1])):
+        hour_cycle = key % 60
+        results.append({
+            'start': minute_key_to_datetime(-neg_start),
+            'end': minute_key_to_datetime(e_key),
+            'score': round(score, 2),
+            'cuc': (key // 60) % 9 + 1,
+            'is_duong_don': key >= 9 * 60,
+            'can_gio': CYCLE_CAN[hour_cycle],
+            'chi_gio': CYCLE_CHI[hour_cycle],
+        })
+    return results
+
+
+def _brute_force(topic, start, end, subject=SUBJECT_DAY, k=10):
+    """Chấm điểm mọi khung giờ (không cắt tỉa) - để đối chiếu."""
+    subject_code = _subject_code(subject)
+    table = score_table(topic)
+    items = []
+    for slot_start, slot_end, chart in qmdg_calc.iter_chart_timeline(start, end):
+        key = chart_key(chart['is_duong_don'], chart['cuc'], qmdg_calc._cycle_index(
+            CAN.index(chart['can_gio']), qmdg_calc.CHI.index(chart['chi_gio'])))
+        subj = qmdg_calc.day_cycle_index(slot_start.toordinal()) % 10 if subject_code is None else subject_code
+        items.append((-table[key, subj], slot_start))
+    items.sort()
+    return [(round(-score, 2), s) for score, s in items[:k]]
+
+
+if __name__ == "__main__":
+    # python qmdg_auspicious.py "Kinh Doanh Tổng Quát" [số ngày] [Can chủ thể]
+    import time
+
+    topic = sys.argv[1] if len(sys.argv) > 1 else "Kinh Doanh Tổng Quát"
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    subject = sys.argv[3] if len(sys.argv) > 3 else SUBJECT_DAY
+    start = datetime.now().replace(second=0, microsecond=0)
+    end = start + timedelta(days=days)
+
+    t0 = time.perf_counter()
+    score_table(topic)
+    day_bound_table(topic)
+    table_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    results = find_auspicious_times(topic, start, end, subject, k=10)
+    search_ms = (time.perf_counter() - t0) * 1000
+
+    print(f"Chủ đề: {topic} - chủ thể {subject} - {days} ngày")
+    for r in results:
+        print(f"  {r['start']:%Y-%m-%d %H:%M} → {r['end']:%H:%M}  {r['score']:5.2f}  "
+              f"Cục {r['cuc']} {'Dương' if r['is_duong_don'] else 'Âm'}  giờ {r['can_gio']} {r['chi_gio']}")
+    print(f"Bảng điểm {table_ms:.0f} ms, tìm kiếm {search_ms:.1f} ms")
+    if days <= 400:
+        expected = _brute_force(topic, start, end, subject, k=10)
+        got = [(r['score'], r['start']) for r in results]
+        print(f"{'✅' if got == expected else '❌'} Đối chiếu với chấm điểm toàn bộ")
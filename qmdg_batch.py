@@ -0,0 +1,160 @@
+# qmdg_batch.py - Vectorized QMDG parameters (NumPy)
+"""
+Tính tham số Kỳ Môn cho hàng loạt thời điểm bằng NumPy.
+
+calculate_qmdg_params_batch() nhận mảng datetime64 (hoặc pandas DatetimeIndex,
+list datetime) và trả về các cột số nguyên - cùng bảng tra với qmdg_calc.qmdg_kernel
+nên kết quả trùng khớp từng giá trị với đường tính đơn lẻ (xem decode_params).
+
+Cột trả về (mã -> tên qua CODE_TABLES):
+    can_gio, chi_gio, can_ngay, chi_ngay, can_thang, chi_thang, can_nam, chi_nam,
+    cuc, is_duong_don, tiet_khi, tuan_thu, leader_palace, truc_phu, truc_su
+"""
+import sys
+import time
+
+import numpy as np
+
+import qmdg_calc
+from qmdg_calc import CAN, CHI, TIET_KHI_LIST
+from qmdg_solar_terms import MIN_YEAR, MAX_YEAR, MINUTES_PER_DAY, year_term_table
+
+EPOCH_ORDINAL = 719163  # date(1970, 1, 1).toordinal()
+
+STAR_NAMES = tuple(qmdg_calc.TRUC_PHU_BY_PALACE[p] for p in range(1, 10))
+DOOR_NAMES = tuple(qmdg_calc.TRUC_SU_BY_PALACE[p] for p in range(1, 10))
+TUAN_THU_CODES = np.array([CAN.index(c) for c in qmdg_calc.TUAN_THU_BY_XUN], dtype=np.int8)
+
+CODE_TABLES = {
+    'can_gio': CAN, 'chi_gio': CHI, 'can_ngay': CAN, 'chi_ngay': CHI,
+    'can_thang': CAN, 'chi_thang': CHI, 'can_nam': CAN, 'chi_nam': CHI,
+    'tiet_khi': TIET_KHI_LIST, 'tuan_thu': CAN, 'truc_phu': STAR_NAMES, 'truc_su': DOOR_NAMES,
+}
+
+# Bảng tra của kernel dưới dạng mảng NumPy
+_HOUR_SLOT = np.array(qmdg_calc.HOUR_SLOT, dtype=np.int64)
+_HOUR_CYCLE = np.array(qmdg_calc.HOUR_CYCLE, dtype=np.int64)
+_DAY_HOUR_START = np.array(qmdg_calc.DAY_HOUR_START, dtype=np.int64)
+_MONTH_CYCLE = np.array(qmdg_calc.MONTH_CYCLE, dtype=np.int64)
+_DAY_YUAN = np.array(qmdg_calc.DAY_YUAN, dtype=np.int64)
+_CUC_BY_TERM = np.array(qmdg_calc.CUC_BY_TERM, dtype=np.int8)
+_LEADER_PALACE = np.zeros((2, 10, 6), dtype=np.int8)
+for _dun in (0, 1):
+    for _cuc in range(1, 10):
+        _LEADER_PALACE[_dun, _cuc] = qmdg_calc.LEADER_PALACE[_dun][_cuc]
+
+
+def to_minute_keys(datetimes):
+    """Minute keys (ordinal * 1440 + minute of day, wall clock) as int64."""
+    tz = getattr(datetimes, 'tz', None)
+    if tz is not None:  # pandas tz-aware index: dùng giờ địa phương như đường đơn lẻ
+        datetimes = datetimes.tz_localize(None)
+    values = np.asarray(datetimes)
+    if values.dtype == object:
+        values = np.array([dt.replace(tzinfo=None) if getattr(dt, 'tzinfo', None) else dt
+                           for dt in values.ravel()], dtype='datetime64[us]')
+    minutes = values.astype('datetime64[m]').astype(np.int64).ravel()
+    return minutes + EPOCH_ORDINAL * MINUTES_PER_DAY
+
+
+def term_indices(keys, years):
+    """Vectorized qmdg_solar_terms.term_index over consecutive year tables."""
+    first, last = int(years.min()), int(years.max())
+    if first < MIN_YEAR or last > MAX_YEAR:
+        bad = first if first < MIN_YEAR else last
+        raise ValueError(f"Năm {bad} nằm ngoài phạm vi Tiết Khí hỗ trợ ({MIN_YEAR}-{MAX_YEAR})")
+    bounds, indices = [], []
+    for year in range(first, last + 1):
+        year_keys, year_indices = year_term_table(year)
+        bounds.extend(year_keys)
+        indices.extend(year_indices)
+    bounds = np.array(bounds, dtype=np.int64)
+    indices = np.array(indices + [0], dtype=np.int8)  # -1 -> Đông Chí (phần tử cuối)
+    return indices[np.searchsorted(bounds, keys, side='right') - 1]
+
+
+def calculate_qmdg_params_batch(datetimes):
+    """
+    Vectorized calculate_qmdg_params.
+    Args:
+        datetimes: NumPy datetime64 array, pandas DatetimeIndex or sequence of datetime.
+    Returns:
+        dict: {tên cột: np.ndarray} - xem CODE_TABLES để đổi mã sang tên.
+    """
+    return params_from_minute_keys(to_minute_keys(datetimes))
+
+
+def params_from_minute_keys(keys):
+    """calculate_qmdg_params_batch trên mảng minute key (int64) có sẵn."""
+    keys = np.asarray(keys, dtype=np.int64)
+    if keys.size == 0:
+        return {name: np.zeros(0, dtype=np.int8) for name in
+                list(CODE_TABLES) + ['cuc', 'is_duong_don', 'leader_palace']}
+
+    day_ord = keys // MINUTES_PER_DAY
+    slot = _HOUR_SLOT[(keys % MINUTES_PER_DAY) // 60]
+    years = (day_ord - EPOCH_ORDINAL).astype('datetime64[D]').astype('datetime64[Y]').astype(np.int64) + 1970
+    term = term_indices(keys, years)
+
+    day_cycle = (day_ord - qmdg_calc.GIAP_TY_ORDINAL) % 60
+    year_cycle = (years - 4) % 60
+    hour_cycle = _HOUR_CYCLE[_DAY_HOUR_START[day_cycle % 10], slot]
+    month_cycle = _MONTH_CYCLE[year_cycle % 10, term]
+    is_duong_don = term < qmdg_calc.YANG_TERM_COUNT
+    cuc = _CUC_BY_TERM[term, _DAY_YUAN[day_cycle]]
+    xun = hour_cycle // 10
+    leader = _LEADER_PALACE[is_duong_don.astype(np.int64), cuc, xun]
+
+    return {
+        'can_gio': (hour_cycle % 10).astype(np.int8), 'chi_gio': (hour_cycle % 12).astype(np.int8),
+        'can_ngay': (day_cycle % 10).astype(np.int8), 'chi_ngay': (day_cycle % 12).astype(np.int8),
+        'can_thang': (month_cycle % 10).astype(np.int8), 'chi_thang': (month_cycle % 12).astype(np.int8),
+        'can_nam': (year_cycle % 10).astype(np.int8), 'chi_nam': (year_cycle % 12).astype(np.int8),
+        'cuc': cuc, 'is_duong_don': is_duong_don, 'tiet_khi': term,
+        'tuan_thu': TUAN_THU_CODES[xun], 'leader_palace': leader,
+        'truc_phu': leader - 1, 'truc_su': leader - 1,
+    }
+
+
+def decode_params(batch, i):
+    """Row i of a batch as the calculate_qmdg_params dict."""
+    row = {name: names[int(batch[name][i])] for name, names in CODE_TABLES.items()}
+    row['cuc'] = int(batch['cuc'][i])
+    row['is_duong_don'] = bool(batch['is_duong_don'][i])
+    row['leader_palace'] = int(batch['leader_palace'][i])
+    return row
+
+
+if __name__ == "__main__":
+    # python qmdg_batch.py [n] - đối chiếu với đường đơn lẻ và đo thời gian
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    # Các khung 2 giờ liên tiếp từ 2000 (n = 200000 ~ 45 năm) + một mẫu ngẫu nhiên 1900-2100
+    stamps = np.datetime64('2000-01-01T00:00', 'm') + np.arange(n) * np.timedelta64(120, 'm')
+    rng = np.random.default_rng(42)
+    span = (np.datetime64('2100-12-31T23:59', 'm') - np.datetime64('1900-01-01T00:00', 'm')).astype(np.int64)
+    random_stamps = np.datetime64('1900-01-01T00:00', 'm') + rng.integers(0, span, 20000).astype('timedelta64[m]')
+
+    start = time.perf_counter()
+    batch = calculate_qmdg_params_batch(stamps)
+    cold_s = time.perf_counter() - start
+    start = time.perf_counter()
+    batch = calculate_qmdg_params_batch(stamps)
+    warm_s = time.perf_counter() - start
+
+    bad = 0
+    for values in (stamps[::max(1, n // 20000)], random_stamps):
+        rows = calculate_qmdg_params_batch(values)
+        bad += sum(1 for i, dt in enumerate(values.astype(object))
+                   if qmdg_calc.calculate_qmdg_params(dt) != decode_params(rows, i))
+
+    sample = stamps[:20000].astype(object)
+    start = time.perf_counter()
+    for dt in sample:
+        qmdg_calc.calculate_qmdg_params(dt)
+    scalar_s = (time.perf_counter() - start) / len(sample) * n
+
+    print(f"{'✅' if not bad else '❌'} Batch vs scalar: {bad} sai khác")
+    print(f"Batch:  {n} khung giờ - {cold_s * 1000:.0f} ms (lần đầu, gồm bảng tiết khí), {warm_s * 1000:.0f} ms (đã cache)")
+    print(f"Scalar: ~{scalar_s * 1000:.0f} ms cho {n} khung giờ (ước tính)")
+    if bad:
+        sys.exit(1)
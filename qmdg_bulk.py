@@ -0,0 +1,315 @@
+# qmdg_bulk.py - Bulk chart generator (lập bàn hàng loạt)
+"""
+Lập bàn Kỳ Môn, quẻ Mai Hoa và quẻ Lục Hào cho một dải thời gian hoặc một file CSV
+các thời điểm, chia lô chạy song song trên mọi nhân CPU (ProcessPoolExecutor) và ghi
+kết quả ra JSONL / CSV theo đúng thứ tự đầu vào.
+
+- Bộ nhớ giới hạn: chỉ tối đa workers * INFLIGHT_PER_WORKER lô đang chạy / chờ ghi.
+- Checkpoint: sau mỗi lô ghi xong, <output>.checkpoint lưu số lô + vị trí byte của file;
+  chạy lại với --resume sẽ cắt file về vị trí đó và tiếp tục từ lô kế tiếp.
+- Tiến độ + tốc độ (dòng/s) in ra stderr.
+
+Engine:
+    qmdg      qmdg_calc.calculate_qmdg_params + bàn (qmdg_chart.Chart.from_params)
+    mai_hoa   mai_hoa_dich_so.tinh_qua_theo_thoi_gian
+    luc_hao   luc_hao_kinh_dich.lap_qua_luc_hao (chủ đề "Chung", Can Chi ngày của thời điểm)
+
+Dòng lệnh:
+    python qmdg_bulk.py --start 2024-01-01 --end 2025-01-01 -o charts.jsonl
+    python qmdg_bulk.py --input times.csv --engine qmdg -o charts.csv --workers 4
+    python qmdg_bulk.py --start 2024-01-01 --end 2025-01-01 -o charts.jsonl --resume
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from itertools import islice
+
+ENGINES = ('qmdg', 'mai_hoa', 'luc_hao')
+DEFAULT_CHUNK = 500                # số thời điểm mỗi lô
+INFLIGHT_PER_WORKER = 2            # số lô tối đa đang chạy / chờ ghi cho mỗi worker
+CHECKPOINT_VERSION = 1
+SCHEMA_DATETIME = datetime(2024, 1, 1, 12, 0)   # thời điểm mẫu để lấy cột CSV của từng engine
+
+
+# ======================================================================
+# TÍNH TOÁN (chạy trong worker)
+# ======================================================================
+
+def _qmdg_record(dt):
+    from qmdg_calc import calculate_qmdg_params
+    from qmdg_chart import Chart
+    params = calculate_qmdg_params(dt)
+    record = dict(params)
+    record.update(Chart.from_params(params).as_dict())
+    return record
+
+
+def _mai_hoa_record(dt):
+    from mai_hoa_dich_so import tinh_qua_theo_thoi_gian
+    return tinh_qua_theo_thoi_gian(dt.year, dt.month, dt.day, dt.hour)
+
+
+def _luc_hao_record(dt):
+    from luc_hao_kinh_dich import lap_qua_luc_hao
+    from qmdg_calc import get_can_chi_day
+    can_ngay, chi_ngay = get_can_chi_day(dt)
+    return lap_qua_luc_hao(dt.year, dt.month, dt.day, dt.hour, "Chung", can_ngay, chi_ngay)
+
+
+_RECORD_FUNCS = {'qmdg': _qmdg_record, 'mai_hoa': _mai_hoa_record, 'luc_hao': _luc_hao_record}
+
+
+def build_record(dt, engines=ENGINES):
+    """{datetime, <engine>: kết quả} - lỗi của từng engine được ghi vào <engine>_error."""
+    record = {'datetime': dt.isoformat(timespec='minutes')}
+    for name in engines:
+        try:
+            record[name] = _RECORD_FUNCS[name](dt)
+        except Exception as e:
+            record[name + '_error'] = str(e)
+    return record
+
+
+def flatten_record(record, prefix=''):
+    """Dict lồng nhau -> {khóa.con: giá trị vô hướng}; list được ghi dạng JSON."""
+    flat = {}
+    for key, value in record.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_record(value, name + '.'))
+        elif isinstance(value, (list, tuple)):
+            flat[name] = json.dumps(value, ensure_ascii=False, default=str)
+        else:
+            flat[name] = value
+    return flat
+
+
+def csv_fieldnames(engines=ENGINES):
+    """Cột CSV cố định: datetime, rồi với mỗi engine các cột của bản ghi mẫu + <engine>_error.
+
+    Không lấy từ dòng đầu tiên của dữ liệu: nếu dòng đó lỗi thì cả file thiếu cột của engine.
+    """
+    fieldnames = ['datetime']
+    for name in engines:
+        sample = flatten_record({name: _RECORD_FUNCS[name](SCHEMA_DATETIME)})
+        fieldnames.extend(sample)
+        fieldnames.append(name + '_error')
+    return fieldnames
+
+
+def render_chunk(datetimes, engines, fmt, fieldnames=None):
+    """Text của một lô (JSONL hoặc các dòng CSV theo fieldnames)."""
+    out = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.DictWriter(out, fieldnames=fieldnames, extrasaction='raise', lineterminator='\n')
+        for dt in datetimes:
+            writer.writerow(flatten_record(build_record(dt, engines)))
+    else:
+        for dt in datetimes:
+            out.write(json.dumps(build_record(dt, engines), ensure_ascii=False, default=str))
+            out.write('\n')
+    return out.getvalue()
+
+
+# ======================================================================
+# ĐẦU VÀO
+# ======================================================================
+
+def iter_range(start, end, step_minutes):
+    dt, step = start, timedelta(minutes=step_minutes)
+    while dt < end:
+        yield dt
+        dt += step
+
+
+def count_range(start, end, step_minutes):
+    return max(0, -(-int((end - start).total_seconds() // 60) // step_minutes))
+
+
+def iter_csv(path, column=None):
+    """Thời điểm (ISO) trong cột column (mặc định cột 'datetime' hoặc cột đầu tiên)."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        index = 0
+        if column is not None:
+            index = header.index(column)
+        elif 'datetime' in header:
+            index = header.index('datetime')
+        else:
+            try:  # không có header
+                yield datetime.fromisoformat(header[0].strip())
+            except ValueError:
+                pass
+        for row in reader:
+            if len(row) > index and row[index].strip():
+                yield datetime.fromisoformat(row[index].strip())
+
+
+def iter_chunks(items, size):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# ======================================================================
+# CHECKPOINT
+# ======================================================================
+
+def checkpoint_path(output):
+    return output + '.checkpoint'
+
+
+def load_checkpoint(output, signature):
+    """Checkpoint của lần chạy cùng tham số hoặc None."""
+    try:
+        with open(checkpoint_path(output), encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get('version') != CHECKPOINT_VERSION or state.get('signature') != signature:
+        return None
+    return state
+
+
+def save_checkpoint(output, state):
+    path = checkpoint_path(output)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(path + '.tmp', path)
+
+
+# ======================================================================
+# CHẠY
+# ======================================================================
+
+def run(datetimes, output, engines=ENGINES, fmt='jsonl', workers=None, chunk_size=DEFAULT_CHUNK,
+        signature=None, resume=False, total=None, progress=None):
+    """
+    Lập bàn cho datetimes (iterable) và ghi vào output theo thứ tự.
+    Args:
+        signature: dict mô tả đầu vào - checkpoint chỉ được dùng lại khi trùng khớp.
+        progress: hàm(rows, total, rows_lần_này, elapsed_s) gọi sau mỗi lô ghi xong.
+    Returns:
+        int: tổng số dòng trong output.
+    """
+    workers = workers or os.cpu_count() or 1
+    signature = dict(signature or {}, engines=list(engines), format=fmt, chunk=chunk_size)
+    state = load_checkpoint(output, signature) if resume else None
+    fieldnames = None
+    if fmt == 'csv':
+        fieldnames = state['fieldnames'] if state else None
+    if state is None:
+        state = {'version': CHECKPOINT_VERSION, 'signature': signature,
+                 'chunks': 0, 'rows': 0, 'offset': 0, 'fieldnames': None}
+
+    chunks = iter_chunks(datetimes, chunk_size)
+    for _ in islice(chunks, state['chunks']):  # bỏ qua các lô đã ghi
+        pass
+
+    mode = 'r+b' if state['offset'] and os.path.exists(output) else 'wb'
+    with open(output, mode) as out:
+        out.seek(state['offset'])
+        out.truncate()
+        if fmt == 'csv' and fieldnames is None:
+            fieldnames = csv_fieldnames(engines)
+            header = io.StringIO()
+            csv.writer(header, lineterminator='\n').writerow(fieldnames)
+            out.write(header.getvalue().encode('utf-8'))
+            state['fieldnames'] = fieldnames
+
+        started = time.perf_counter()
+        done_rows = 0
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            def drain_one():
+                nonlocal done_rows
+                future, size = pending.popleft()
+                out.write(future.result().encode('utf-8'))
+                out.flush()
+                state['chunks'] += 1
+                state['rows'] += size
+                state['offset'] = out.tell()
+                save_checkpoint(output, state)
+                done_rows += size
+                if progress:
+                    progress(state['rows'], total, done_rows, time.perf_counter() - started)
+
+            for chunk in chunks:
+                pending.append((pool.submit(render_chunk, chunk, engines, fmt, fieldnames), len(chunk)))
+                if len(pending) >= workers * INFLIGHT_PER_WORKER:
+                    drain_one()
+            while pending:
+                drain_one()
+
+    try:
+        os.remove(checkpoint_path(output))
+    except OSError:
+        pass
+    return state['rows']
+
+
+def _print_progress(rows, total, done_rows, elapsed):
+    rate = done_rows / elapsed if elapsed > 0 else 0.0
+    if total:
+        eta = (total - rows) / rate if rate else 0.0
+        line = f"\r{rows:,}/{total:,} ({rows / total:.1%}) {rate:,.0f} dòng/s, còn ~{eta:,.0f} s"
+    else:
+        line = f"\r{rows:,} dòng {rate:,.0f} dòng/s"
+    sys.stderr.write(line)
+    sys.stderr.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='qmdg_bulk.py', description="Lập bàn Kỳ Môn / Mai Hoa / Lục Hào hàng loạt")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--start', type=datetime.fromisoformat, help="thời điểm bắt đầu (ISO)")
+    source.add_argument('--input', help="file CSV các thời điểm (ISO)")
+    parser.add_argument('--end', type=datetime.fromisoformat, help="thời điểm kết thúc (không gồm)")
+    parser.add_argument('--step', type=int, default=120, help="bước (phút) giữa các thời điểm, mặc định 120")
+    parser.add_argument('--column', help="tên cột thời điểm trong CSV đầu vào")
+    parser.add_argument('--engine', action='append', choices=ENGINES, help="engine cần chạy (lặp lại được, mặc định tất cả)")
+    parser.add_argument('-o', '--output', required=True, help="file kết quả (.jsonl hoặc .csv)")
+    parser.add_argument('--format', choices=('jsonl', 'csv'), help="định dạng (mặc định theo đuôi file)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="số tiến trình (mặc định số nhân CPU)")
+    parser.add_argument('--chunk', type=int, default=DEFAULT_CHUNK, help=f"số thời điểm mỗi lô (mặc định {DEFAULT_CHUNK})")
+    parser.add_argument('--resume', action='store_true', help="tiếp tục từ checkpoint nếu có")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ('csv' if args.output.lower().endswith('.csv') else 'jsonl')
+    if args.start is not None:
+        if args.end is None or args.end <= args.start or args.step <= 0:
+            parser.error("--start cần --end lớn hơn và --step > 0")
+        datetimes = iter_range(args.start, args.end, args.step)
+        total = count_range(args.start, args.end, args.step)
+        signature = {'start': args.start.isoformat(), 'end': args.end.isoformat(), 'step': args.step}
+    else:
+        datetimes = iter_csv(args.input, args.column)
+        total = None
+        st = os.stat(args.input)
+        signature = {'input': os.path.abspath(args.input), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                     'column': args.column}
+
+    started = time.perf_counter()
+    rows = run(datetimes, args.output, tuple(args.engine or ENGINES), fmt, args.workers, args.chunk,
+               signature, args.resume, total, _print_progress)
+    elapsed = time.perf_counter() - started
+    sys.stderr.write('\n')
+    print(f"✅ {args.output}: {rows:,} dòng, {elapsed:.1f} s ({args.workers} worker)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
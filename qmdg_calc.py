@@ -1,19 +1,19 @@
 
 # qmdg_calc.py - Core calculation engine for Kỳ Môn Độn Giáp
 import math
+import time as _time
 from datetime import datetime, timedelta, time
 
+from qmdg_lunar import solar_to_lunar
+from qmdg_solar_terms import (
+    MINUTES_PER_DAY, TIET_KHI_LIST, get_term_boundaries, minute_key, minute_key_to_datetime,
+    next_term_boundary, term_index
+)
+
 # Data for calculations
 CAN = ["Giáp", "Ất", "Bính", "Đinh", "Mậu", "Kỷ", "Canh", "Tân", "Nhâm", "Quý"]
 CHI = ["Tý", "Sửu", "Dần", "Mão", "Thìn", "Tị", "Ngọ", "Mùi", "Thân", "Dậu", "Tuất", "Hợi"]
 
-TIET_KHI_LIST = [
-    "Đông Chí", "Tiểu Hàn", "Đại Hàn", "Lập Xuân", "Vũ Thủy", "Kinh Trập",
-    "Xuân Phân", "Thanh Minh", "Cốc Vũ", "Lập Hạ", "Tiểu Mãn", "Mang Chủng",
-    "Hạ Chí", "Tiểu Thử", "Đại Thử", "Lập Thu", "Xử Thử", "Bạch Lộ",
-    "Thu Phân", "Hàn Lộ", "Sương Giáng", "Lập Đông", "Tiểu Tuyết", "Đại Tuyết"
-]
-
 # Map Tiết khí to Cục (Thượng, Trung, Hạ)
 TIET_KHI_CUC = {
     "Đông Chí": (1, 7, 4), "Tiểu Hàn": (2, 8, 5), "Đại Hàn": (3, 9, 6),
@@ -29,56 +29,28 @@ TIET_KHI_CUC = {
 def get_can_chi_year(year):
     """Calculate Can Chi for Year."""
     idx = (year - 4) % 60
-    return CAN[idx % 10], CHI[idx % 12]
+    return CYCLE_CAN[idx], CYCLE_CHI[idx]
 
 def get_can_chi_day(dt):
     """Calculate Can Chi for Day using reliable base. Jan 1, 2024 is Giáp Tý (index 0)."""
-    base_dt = datetime(2024, 1, 1)
-    diff = (dt.date() - base_dt.date()).days
-    idx = (0 + diff) % 60
-    if idx < 0: idx += 60
-    return CAN[idx % 10], CHI[idx % 12]
+    idx = day_cycle_index(dt.toordinal())
+    return CYCLE_CAN[idx], CYCLE_CHI[idx]
 
 def get_can_chi_hour(day_can, hour):
     """Calculate Can Chi for Hour based on Day Can."""
     # Hour index: 0(Tý) to 11(Hợi). Tý is 23h-1h.
     hour_idx = ((hour + 1) // 2) % 12
     # Giáp Kỷ khởi Giáp Tý (0), Ất Canh khởi Bính Tý (2)...
-    start_can_map = {"Giáp": 0, "Kỷ": 0, "Ất": 2, "Canh": 2, "Bính": 4, "Tân": 4, "Đinh": 6, "Nhâm": 6, "Mậu": 8, "Quý": 8}
-    start_can_idx = start_can_map.get(day_can, 0)
-    hour_can_idx = (start_can_idx + hour_idx) % 10
-    return CAN[hour_can_idx], CHI[hour_idx]
+    idx = HOUR_CYCLE[HOUR_START_CAN.get(day_can, 0)][hour_idx]
+    return CYCLE_CAN[idx], CYCLE_CHI[idx]
+
+def tiet_khi_index(dt):
+    """Index into TIET_KHI_LIST of the solar term in force at dt (minute precision, UTC+7)."""
+    return term_index(minute_key(dt), dt.year)
 
 def get_tiet_khi(dt):
-    """Calculate Solar Term (Approximate dates for 21st century)."""
-    if dt.tzinfo is not None: dt = dt.replace(tzinfo=None)
-    year = dt.year
-    base_dates = {
-        "Xuân Phân": (3, 20.6), "Thanh Minh": (4, 4.8), "Cốc Vũ": (4, 20.1),
-        "Lập Hạ": (5, 5.5), "Tiểu Mãn": (5, 21.1), "Mang Chủng": (6, 5.7),
-        "Hạ Chí": (6, 21.3), "Tiểu Thử": (7, 7.3), "Đại Thử": (7, 22.8),
-        "Lập Thu": (8, 7.5), "Xử Thử": (8, 23.1), "Bạch Lộ": (9, 7.7),
-        "Thu Phân": (9, 22.9), "Hàn Lộ": (10, 8.3), "Sương Giáng": (10, 23.4),
-        "Lập Đông": (11, 7.3), "Tiểu Tuyết": (11, 22.3), "Đại Tuyết": (12, 7.1),
-        "Đông Chí": (12, 21.8), "Tiểu Hàn": (1, 5.4), "Đại Hàn": (1, 20.1),
-        "Lập Xuân": (2, 4.2), "Vũ Thủy": (2, 18.9), "Kinh Trập": (3, 5.6)
-    }
-    terms = []
-    for name, (month, day_ref) in base_dates.items():
-        y_offset = (year - 2024) * 0.2422
-        day = int(day_ref + y_offset)
-        t_dt = datetime(year, month, day)
-        terms.append((t_dt, name))
-    terms.sort()
-    
-    current_term = terms[-1][1]
-    if dt < terms[0][0]:
-        current_term = "Đông Chí"
-    else:
-        for t_dt, name in terms:
-            if dt >= t_dt: current_term = name
-            else: break
-    return current_term
+    """Calculate Solar Term from the apparent solar longitude (1900-2100)."""
+    return TIET_KHI_LIST[tiet_khi_index(dt)]
 
 def get_can_chi_month(year_can, tiet_khi):
     """Calculate Can Chi for Month based on Year Can and Solar Term."""
@@ -97,79 +69,209 @@ def get_can_chi_month(year_can, tiet_khi):
     month_can_idx = (year_can_idx + (chi_idx - 2)) % 10
     return CAN[month_can_idx], month_chi
 
-def solar_to_lunar(dt):
-    """
-    High-precision Solar to Lunar conversion for Vietnam (2024-2030).
-    Using exact month lengths to avoid one-day offsets.
-    """
-    if dt.tzinfo is not None: dt = dt.replace(tzinfo=None)
-    
-    # LUNAR_DATA: {Year: (NY_Month, NY_Day, LeapMonthIndex_1based, [MonthLengths])}
-    # A LeapMonthIndex of 0 means no leap month.
-    # Month list includes the leap month if it exists.
-    LUNAR_CONFIG = {
-        2024: (2, 10, 0, [29, 30, 29, 29, 30, 29, 30, 30, 29, 30, 30, 29]),
-        2025: (1, 29, 6, [30, 29, 30, 29, 30, 30, 29, 30, 29, 30, 29, 30, 29]),
-        2026: (2, 17, 0, [30, 30, 29, 30, 29, 29, 30, 29, 30, 30, 29, 30]),
-        2027: (2, 6, 0,  [30, 29, 30, 29, 30, 29, 29, 30, 29, 30, 30, 30]),
-        2028: (1, 26, 5, [29, 30, 29, 30, 30, 29, 30, 29, 29, 30, 30, 29, 30])
-    }
-    
-    y = dt.year
-    if y not in LUNAR_CONFIG and (y-1) not in LUNAR_CONFIG:
-        # Fallback for very outside dates
-        return dt.day, dt.month, y, False
-
-    # Check if date belongs to previous lunar year
-    ny_m, ny_d, leap_m, months = LUNAR_CONFIG.get(y, (1, 1, 0, []))
-    new_year_dt = datetime(y, ny_m, ny_d)
-    
-    calc_y = y
-    if dt < new_year_dt:
-        calc_y = y - 1
-        if calc_y not in LUNAR_CONFIG:
-            return dt.day, dt.month, calc_y, False
-        ny_m, ny_d, leap_m, months = LUNAR_CONFIG[calc_y]
-        new_year_dt = datetime(calc_y, ny_m, ny_d)
-    
-    diff = (dt.date() - new_year_dt.date()).days
-    curr_diff = diff
-    l_month = 1
-    is_leap_result = False
-    
-    # Iterate through months using the mask
-    for idx, m_len in enumerate(months):
-        if curr_diff < m_len:
-            # Check if this physical month index corresponds to a leap month
-            # For 2025, leap_m=6 (Tháng 6), so index 5 is T6, index 6 is T6 Nhuận
-            physical_month_idx = idx + 1
-            
-            if leap_m > 0:
-                if physical_month_idx <= leap_m:
-                    return curr_diff + 1, physical_month_idx, calc_y, False
-                elif physical_month_idx == leap_m + 1:
-                    return curr_diff + 1, leap_m, calc_y, True
-                else:
-                    return curr_diff + 1, physical_month_idx - 1, calc_y, False
-            else:
-                return curr_diff + 1, physical_month_idx, calc_y, False
-        
-        curr_diff -= m_len
-            
-    return 1, 1, calc_y, False
-
 # Fixed data for QMDG
 SAO_GOC = {1: "Thiên Bồng", 2: "Thiên Nhuế", 3: "Thiên Xung", 4: "Thiên Phụ", 5: "Thiên Cầm", 6: "Thiên Tâm", 7: "Thiên Trụ", 8: "Thiên Nhậm", 9: "Thiên Anh"}
 MON_GOC = {1: "Hưu", 2: "Tử", 3: "Thương", 4: "Đỗ", 6: "Khai", 7: "Kinh", 8: "Sinh", 9: "Cảnh"}
 CHI_CUNG_MAP = {"Tý": 1, "Sửu": 8, "Dần": 8, "Mão": 3, "Thìn": 4, "Tị": 4, "Ngọ": 9, "Mùi": 2, "Thân": 2, "Dậu": 7, "Tuất": 6, "Hợi": 6}
 
+# ======================================================================
+# CALENDAR KERNEL (integer day ordinals + hour-slot indices)
+# All sexagenary lookups are precomputed at import; the kernel itself only
+# does integer arithmetic and tuple indexing.
+# ======================================================================
+GIAP_TY_ORDINAL = datetime(2024, 1, 1).toordinal()  # Jan 1, 2024 is Giáp Tý
+CYCLE_CAN = tuple(CAN[i % 10] for i in range(60))
+CYCLE_CHI = tuple(CHI[i % 12] for i in range(60))
+HOUR_SLOT = tuple(((h + 1) // 2) % 12 for h in range(24))
+# Giáp Kỷ khởi Giáp Tý (0), Ất Canh khởi Bính Tý (2)...
+HOUR_START_CAN = {"Giáp": 0, "Kỷ": 0, "Ất": 2, "Canh": 2, "Bính": 4, "Tân": 4, "Đinh": 6, "Nhâm": 6, "Mậu": 8, "Quý": 8}
+
+def _cycle_index(can_idx, chi_idx):
+    """Position in the 60 Giáp Tý cycle of a (can, chi) index pair."""
+    return (6 * can_idx - 5 * chi_idx) % 60
+
+# HOUR_CYCLE[hour start can][slot] -> cycle index of the hour
+HOUR_CYCLE = tuple(
+    tuple(_cycle_index((start + slot) % 10, slot) for slot in range(12))
+    for start in range(10)
+)
+# Day can index -> hour start can index
+DAY_HOUR_START = tuple(HOUR_START_CAN[CAN[c]] for c in range(10))
+# MONTH_CYCLE[year can][term index] -> cycle index of the month
+MONTH_CYCLE = tuple(
+    tuple(_cycle_index(CAN.index(m_can), CHI.index(m_chi))
+          for m_can, m_chi in (get_can_chi_month(CAN[y], t) for t in TIET_KHI_LIST))
+    for y in range(10)
+)
+# Day cycle index -> Thượng/Trung/Hạ nguyên (0/1/2)
+DAY_YUAN = tuple((i % 15) // 5 for i in range(60))
+# CUC_BY_TERM[term index][yuan]
+CUC_BY_TERM = tuple(TIET_KHI_CUC.get(name, (1, 7, 4)) for name in TIET_KHI_LIST)
+YANG_TERM_COUNT = 12  # Đông Chí -> Mang Chủng: Dương Độn
+# Tuần (hour cycle index // 10) -> Lục Nghi giữ chỗ của Giáp (Tuần Thủ)
+TUAN_THU_BY_XUN = ("Mậu", "Kỷ", "Canh", "Tân", "Nhâm", "Quý")
+LUC_NGHI_ORDER = ("Mậu", "Kỷ", "Canh", "Tân", "Nhâm", "Quý", "Đinh", "Bính", "Ất")
+
+def _leader_palace(cuc, is_duong_don, tuan_thu):
+    """Palace of the Tuần Thủ stem on the Earth plate."""
+    step = LUC_NGHI_ORDER.index(tuan_thu)
+    return (cuc - 1 + step) % 9 + 1 if is_duong_don else (cuc - 1 - step) % 9 + 1
+
+# LEADER_PALACE[is_duong_don][cuc][xun]
+LEADER_PALACE = tuple(
+    tuple(tuple(_leader_palace(cuc, bool(dun), t) for t in TUAN_THU_BY_XUN) if cuc else ()
+          for cuc in range(10))
+    for dun in (0, 1)
+)
+TRUC_PHU_BY_PALACE = {p: ("Thiên Cầm" if p == 5 else s) for p, s in SAO_GOC.items()}
+TRUC_SU_BY_PALACE = {p: MON_GOC.get(p, "Tử") + " Môn" for p in range(1, 10)}
+
+def day_cycle_index(day_ord):
+    """Cycle index (0 = Giáp Tý) of a proleptic Gregorian day ordinal."""
+    return (day_ord - GIAP_TY_ORDINAL) % 60
+
+def qmdg_kernel(day_ord, slot, year, term_idx):
+    """
+    Integer core of calculate_qmdg_params.
+    Args:
+        day_ord (int): date.toordinal() of the civil day.
+        slot (int): hour slot 0 (Tý) .. 11 (Hợi).
+        year (int): civil year (Can Chi năm follows the civil year, as before).
+        term_idx (int): index into TIET_KHI_LIST.
+    Returns:
+        tuple: (year_cycle, month_cycle, day_cycle, hour_cycle, term_idx,
+                cuc, is_duong_don, leader_palace) - cycle values are 0..59.
+    """
+    day_cycle = (day_ord - GIAP_TY_ORDINAL) % 60
+    year_cycle = (year - 4) % 60
+    hour_cycle = HOUR_CYCLE[DAY_HOUR_START[day_cycle % 10]][slot]
+    is_duong_don = term_idx < YANG_TERM_COUNT
+    cuc = CUC_BY_TERM[term_idx][DAY_YUAN[day_cycle]]
+    return (year_cycle, MONTH_CYCLE[year_cycle % 10][term_idx], day_cycle, hour_cycle, term_idx,
+            cuc, is_duong_don, LEADER_PALACE[is_duong_don][cuc][hour_cycle // 10])
+
+def params_from_kernel(codes):
+    """Expand kernel codes into the calculate_qmdg_params dict."""
+    year_cycle, month_cycle, day_cycle, hour_cycle, term_idx, cuc, is_duong_don, leader_palace = codes
+    return {
+        'can_gio': CYCLE_CAN[hour_cycle], 'chi_gio': CYCLE_CHI[hour_cycle],
+        'can_ngay': CYCLE_CAN[day_cycle], 'chi_ngay': CYCLE_CHI[day_cycle],
+        'can_thang': CYCLE_CAN[month_cycle], 'chi_thang': CYCLE_CHI[month_cycle],
+        'can_nam': CYCLE_CAN[year_cycle], 'chi_nam': CYCLE_CHI[year_cycle],
+        'cuc': cuc, 'is_duong_don': is_duong_don, 'tiet_khi': TIET_KHI_LIST[term_idx],
+        'tuan_thu': TUAN_THU_BY_XUN[hour_cycle // 10], 'leader_palace': leader_palace,
+        'truc_phu': TRUC_PHU_BY_PALACE[leader_palace], 'truc_su': TRUC_SU_BY_PALACE[leader_palace]
+    }
+
+def kernel_codes(dt):
+    """Kernel codes for a datetime (timezone is dropped, wall-clock time is used)."""
+    day_ord = dt.toordinal()
+    year = dt.year
+    return qmdg_kernel(day_ord, HOUR_SLOT[dt.hour], year, term_index(minute_key(dt), year))
+
 def calculate_qmdg_params(dt):
     """Main entry point for QMDG parameters calculation."""
+    return params_from_kernel(kernel_codes(dt))
+
+def calculate_qmdg_params_batch(datetimes):
+    """Vectorized calculate_qmdg_params over a datetime64 array (requires NumPy, see qmdg_batch)."""
+    from qmdg_batch import calculate_qmdg_params_batch as _batch
+    return _batch(datetimes)
+
+# ======================================================================
+# CHART TIMELINE
+# A chart (plates) only changes at odd hours (chi giờ), at midnight (Can ngày
+# -> Can giờ) and at solar-term boundaries (Cục / Độn).
+# ======================================================================
+# Minute of day of the next change after an hour of the day (Tý spans 23h-1h)
+NEXT_SLOT_MINUTE = tuple(min(1440, ((h + 1) // 2 * 2 + 1) * 60) for h in range(24))
+# Minute of day each slot starts: early Tý, Sửu ... Hợi, late Tý (23h)
+SLOT_START_MINUTES = (0,) + tuple(h * 60 for h in range(1, 24, 2)) + (23 * 60,)
+# Number of chart keys: 2 độn x 9 cục x 60 giờ Can Chi
+CHART_KEYS = 1080
+
+def timeline_chart(cuc, is_duong_don, hour_cycle):
+    """Plates of one chart key (cục, độn, giờ Can Chi) as a dict."""
+    from qmdg_chart_table import an_bai_luc_nghi, lap_ban_qmdg, tinh_khong_vong, tinh_dich_ma
+    can_gio, chi_gio = CYCLE_CAN[hour_cycle], CYCLE_CHI[hour_cycle]
+    leader_palace = LEADER_PALACE[is_duong_don][cuc][hour_cycle // 10]
+    truc_phu, truc_su = TRUC_PHU_BY_PALACE[leader_palace], TRUC_SU_BY_PALACE[leader_palace]
+    thien_ban, can_thien_ban, nhan_ban, than_ban, truc_phu_cung = lap_ban_qmdg(
+        cuc, truc_phu, truc_su, can_gio, chi_gio, is_duong_don)
+    return {
+        'cuc': cuc, 'is_duong_don': is_duong_don, 'can_gio': can_gio, 'chi_gio': chi_gio,
+        'tuan_thu': TUAN_THU_BY_XUN[hour_cycle // 10], 'leader_palace': leader_palace,
+        'truc_phu': truc_phu, 'truc_su': truc_su,
+        'dia_can': an_bai_luc_nghi(cuc, is_duong_don),
+        'thien_ban': thien_ban, 'can_thien_ban': can_thien_ban, 'nhan_ban': nhan_ban,
+        'than_ban': than_ban, 'truc_phu_cung': truc_phu_cung,
+        'khong_vong': tinh_khong_vong(can_gio, chi_gio), 'dich_ma': tinh_dich_ma(chi_gio),
+    }
+
+def iter_chart_timeline(start, end):
+    """
+    Lazy stream of charts over [start, end) (wall-clock, minute precision).
+    Yields:
+        (slot_start, slot_end, chart) - consecutive segments with identical plates
+        are merged; chart dicts are shared between segments with the same plates
+        and must not be mutated. Day/month/year pillars are not part of a chart,
+        use calculate_qmdg_params(slot_start) when they are needed.
+    """
+    key = minute_key(start)
+    end_key = minute_key(end) + (1 if end.second or end.microsecond else 0)
+    if key >= end_key:
+        return
+
+    day_ord, minute = divmod(key, MINUTES_PER_DAY)
+    year = start.year
+    next_year_ord = datetime(year + 1, 1, 1).toordinal()
+    term = term_index(key, year)
+    next_term = next_term_boundary(key, year)
+    charts = {}
+    seg_start = seg_chart = seg_key = None
+
+    while key < end_key:
+        hour = minute // 60
+        boundary = min(day_ord * MINUTES_PER_DAY + NEXT_SLOT_MINUTE[hour], next_term, end_key)
+        codes = qmdg_kernel(day_ord, HOUR_SLOT[hour], year, term)
+        chart_key = (codes[5], codes[6], codes[3])
+        if chart_key != seg_key:
+            if seg_key is not None:
+                yield minute_key_to_datetime(seg_start), minute_key_to_datetime(key), seg_chart
+            seg_chart = charts.get(chart_key)
+            if seg_chart is None:
+                seg_chart = charts[chart_key] = timeline_chart(*chart_key)
+            seg_start, seg_key = key, chart_key
+
+        # Advance the integer state to the next change point
+        key = boundary
+        day_ord, minute = divmod(key, MINUTES_PER_DAY)
+        if day_ord == next_year_ord:
+            year += 1
+            next_year_ord = datetime(year + 1, 1, 1).toordinal()
+        if key == next_term and key < end_key:
+            term = (term + 1) % 24
+            next_term = next_term_boundary(key, year)
+
+    yield minute_key_to_datetime(seg_start), minute_key_to_datetime(end_key), seg_chart
+
+def _calculate_qmdg_params_reference(dt):
+    """Original step-by-step implementation, kept to verify and benchmark the kernel."""
     if dt.tzinfo is not None: dt = dt.replace(tzinfo=None)
     year_can, year_chi = get_can_chi_year(dt.year)
-    day_can, day_chi = get_can_chi_day(dt)
-    hour_can, hour_chi = get_can_chi_hour(day_can, dt.hour)
-    tiet_khi = get_tiet_khi(dt)
+    day_idx = (dt.date() - datetime(2024, 1, 1).date()).days % 60
+    day_can, day_chi = CAN[day_idx % 10], CHI[day_idx % 12]
+    hour_idx = ((dt.hour + 1) // 2) % 12
+    start_can_map = {"Giáp": 0, "Kỷ": 0, "Ất": 2, "Canh": 2, "Bính": 4, "Tân": 4, "Đinh": 6, "Nhâm": 6, "Mậu": 8, "Quý": 8}
+    hour_can, hour_chi = CAN[(start_can_map.get(day_can, 0) + hour_idx) % 10], CHI[hour_idx]
+    terms = get_term_boundaries(dt.year)
+    tiet_khi = terms[-1][1]
+    if dt < terms[0][0]:
+        tiet_khi = "Đông Chí"
+    else:
+        for t_dt, name in terms:
+            if dt >= t_dt: tiet_khi = name
+            else: break
     month_can, month_chi = get_can_chi_month(year_can, tiet_khi)
     yang_terms = ["Đông Chí", "Tiểu Hàn", "Đại Hàn", "Lập Xuân", "Vũ Thủy", "Kinh Trập", "Xuân Phân", "Thanh Minh", "Cốc Vũ", "Lập Hạ", "Tiểu Mãn", "Mang Chủng"]
     is_duong_don = tiet_khi in yang_terms
@@ -203,3 +305,24 @@ def calculate_qmdg_params(dt):
         'cuc': cuc, 'is_duong_don': is_duong_don, 'tiet_khi': tiet_khi, 'tuan_thu': tuan_thu,
         'leader_palace': leader_palace, 'truc_phu': truc_phu, 'truc_su': truc_su + (" Môn" if " Môn" not in truc_su else "")
     }
+
+
+def _benchmark(func, datetimes, repeat=3):
+    """Best-of-N wall time per call (µs)."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = _time.perf_counter()
+        for dt in datetimes:
+            func(dt)
+        best = min(best, _time.perf_counter() - start)
+    return best / len(datetimes) * 1e6
+
+if __name__ == "__main__":
+    # python qmdg_calc.py   (đối chiếu với bản tham chiếu: python -m pytest tests/test_qmdg_calc.py)
+    sample = [datetime(2024, 1, 1) + timedelta(minutes=37 * i) for i in range(50000)]
+    ref_us = _benchmark(_calculate_qmdg_params_reference, sample)
+    new_us = _benchmark(calculate_qmdg_params, sample)
+    codes_us = _benchmark(kernel_codes, sample)
+    print(f"calculate_qmdg_params (reference): {ref_us:8.2f} µs/chart")
+    print(f"calculate_qmdg_params (kernel):    {new_us:8.2f} µs/chart  ({ref_us / new_us:.1f}x)")
+    print(f"kernel_codes only:                 {codes_us:8.2f} µs/chart  ({ref_us / codes_us:.1f}x)")
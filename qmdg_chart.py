@@ -0,0 +1,323 @@
+# qmdg_chart.py - Compact Kỳ Môn chart (64-byte binary layout)
+"""
+Chart: một bàn Kỳ Môn lưu dưới dạng 64 byte mã số nguyên thay cho bốn dict chuỗi.
+
+Bố cục nhị phân (to_bytes / from_bytes):
+    0       phiên bản định dạng
+    1       Cục                         2   cờ (bit 0 = Dương Độn)
+    3..6    chu kỳ Can Chi giờ/ngày/tháng/năm (0-59, 0xFF = không có)
+    7       Tiết Khí (index TIET_KHI_LIST, 0xFF = không có)
+    8       cung Tuần Thủ (leader palace)   9   cung đích Trực Phù
+    10..11  Không Vong bitmask (uint16, bit p = cung p)
+    12..13  Dịch Mã bitmask (uint16, bit p = cung p)
+    16..24  Sao theo cung 1..9          25..33  Môn
+    34..42  Thần                        43..51  Can Thiên Bàn
+    52..60  Can Địa Bàn                 (0xFF = cung không có giá trị, vd. cung 5)
+
+Các accessor (stars, doors, ...) trả về memoryview trên bộ đệm - không sao chép.
+view() trả về một Mapping chỉ đọc có cùng khóa với chart_data cũ
+(thien_ban, nhan_ban, than_ban, can_thien_ban, dia_can, khong_vong, dich_ma, can_gio...)
+để GeminiQMDGHelper, FreeAIHelper và app.py dùng như trước.
+"""
+from collections.abc import Mapping
+
+from qmdg_calc import CAN, CHI, TIET_KHI_LIST
+from qmdg_data import CUNG_NGU_HANH, QUAI_TUONG
+
+FORMAT_VERSION = 1
+CHART_SIZE = 64
+NONE_CODE = 0xFF
+
+STAR_NAMES = ("Thiên Bồng", "Thiên Nhuế", "Thiên Xung", "Thiên Phụ", "Thiên Cầm",
+              "Thiên Tâm", "Thiên Trụ", "Thiên Nhậm", "Thiên Anh", "Thiên Nhuế/Cầm")
+DOOR_NAMES = ("Hưu Môn", "Tử Môn", "Thương Môn", "Đỗ Môn", "Khai Môn", "Kinh Môn", "Sinh Môn", "Cảnh Môn")
+DEITY_NAMES = ("Trực Phù", "Đằng Xà", "Thái Âm", "Lục Hợp", "Bạch Hổ", "Huyền Vũ", "Cửu Địa", "Cửu Thiên")
+STEM_NAMES = tuple(CAN)
+
+STAR_CODE = {name: i for i, name in enumerate(STAR_NAMES)}
+DOOR_CODE = {name: i for i, name in enumerate(DOOR_NAMES)}
+DEITY_CODE = {name: i for i, name in enumerate(DEITY_NAMES)}
+STEM_CODE = {name: i for i, name in enumerate(STEM_NAMES)}
+TIET_KHI_CODE = {name: i for i, name in enumerate(TIET_KHI_LIST)}
+
+# Offsets
+_CUC, _FLAGS, _HOUR, _DAY, _MONTH, _YEAR, _TERM, _LEADER, _TRUC_PHU_CUNG = 1, 2, 3, 4, 5, 6, 7, 8, 9
+_KV, _DM = 10, 12
+_STAR, _DOOR, _DEITY, _HEAVEN, _EARTH = 16, 25, 34, 43, 52
+PLATES = (
+    ('thien_ban', _STAR, STAR_NAMES), ('nhan_ban', _DOOR, DOOR_NAMES), ('than_ban', _DEITY, DEITY_NAMES),
+    ('can_thien_ban', _HEAVEN, STEM_NAMES), ('dia_can', _EARTH, STEM_NAMES),
+)
+
+
+def _cycle_code(can, chi):
+    """0-59 cycle code of a (can, chi) name pair, NONE_CODE when unknown."""
+    can_idx, chi_idx = STEM_CODE.get(can), CHI.index(chi) if chi in CHI else None
+    if can_idx is None or chi_idx is None or (can_idx - chi_idx) % 2:
+        return NONE_CODE
+    return (6 * can_idx - 5 * chi_idx) % 60
+
+
+def _encode_plate(buf, offset, plate, codes):
+    for p in range(1, 10):
+        value = plate.get(p)
+        buf[offset + p - 1] = codes[value] if value in codes else NONE_CODE
+
+
+class Chart:
+    """Bàn Kỳ Môn bất biến trên bộ đệm 64 byte."""
+    __slots__ = ('_buf', '_mv')
+
+    def __init__(self, data):
+        if len(data) != CHART_SIZE:
+            raise ValueError(f"Chart cần đúng {CHART_SIZE} byte, nhận {len(data)}")
+        if data[0] != FORMAT_VERSION:
+            raise ValueError(f"Phiên bản Chart không hỗ trợ: {data[0]}")
+        self._buf = bytes(data)
+        self._mv = memoryview(self._buf)
+
+    # ---------- Construction ----------
+    @classmethod
+    def from_plates(cls, thien_ban, can_thien_ban, nhan_ban, than_ban, dia_can,
+                    khong_vong, dich_ma, truc_phu_cung, params):
+        """Mã hóa đầu ra của lap_ban_qmdg + tham số calculate_qmdg_params."""
+        buf = bytearray(CHART_SIZE)
+        buf[0] = FORMAT_VERSION
+        buf[_CUC] = params.get('cuc', 0)
+        buf[_FLAGS] = 1 if params.get('is_duong_don') else 0
+        for offset, can_key, chi_key in ((_HOUR, 'can_gio', 'chi_gio'), (_DAY, 'can_ngay', 'chi_ngay'),
+                                         (_MONTH, 'can_thang', 'chi_thang'), (_YEAR, 'can_nam', 'chi_nam')):
+            buf[offset] = _cycle_code(params.get(can_key), params.get(chi_key))
+        buf[_TERM] = TIET_KHI_CODE.get(params.get('tiet_khi'), NONE_CODE)
+        buf[_LEADER] = params.get('leader_palace', 0)
+        buf[_TRUC_PHU_CUNG] = truc_phu_cung or 0
+        kv_mask = 0
+        for p in khong_vong or ():
+            kv_mask |= 1 << p
+        buf[_KV:_KV + 2] = kv_mask.to_bytes(2, 'little')
+        buf[_DM:_DM + 2] = ((1 << dich_ma) if dich_ma else 0).to_bytes(2, 'little')
+        _encode_plate(buf, _STAR, thien_ban, STAR_CODE)
+        _encode_plate(buf, _DOOR, nhan_ban, DOOR_CODE)
+        _encode_plate(buf, _DEITY, than_ban, DEITY_CODE)
+        _encode_plate(buf, _HEAVEN, can_thien_ban, STEM_CODE)
+        _encode_plate(buf, _EARTH, dia_can, STEM_CODE)
+        return cls(buf)
+
+    @classmethod
+    def from_params(cls, params):
+        """Dựng bàn từ dict của qmdg_calc.calculate_qmdg_params (bàn tra từ qmdg_chart_table)."""
+        from qmdg_chart_table import an_bai_luc_nghi, lap_ban_qmdg, tinh_khong_vong, tinh_dich_ma
+        can_gio, chi_gio = params['can_gio'], params['chi_gio']
+        thien_ban, can_thien_ban, nhan_ban, than_ban, truc_phu_cung = lap_ban_qmdg(
+            params['cuc'], params['truc_phu'], params['truc_su'], can_gio, chi_gio, params['is_duong_don'])
+        return cls.from_plates(thien_ban, can_thien_ban, nhan_ban, than_ban,
+                               an_bai_luc_nghi(params['cuc'], params['is_duong_don']),
+                               tinh_khong_vong(can_gio, chi_gio), tinh_dich_ma(chi_gio),
+                               truc_phu_cung, params)
+
+    @classmethod
+    def from_datetime(cls, dt):
+        from qmdg_calc import calculate_qmdg_params
+        return cls.from_params(calculate_qmdg_params(dt))
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(data)
+
+    def to_bytes(self):
+        return self._buf
+
+    __bytes__ = to_bytes
+
+    # ---------- Zero-copy accessors ----------
+    @property
+    def stars(self):
+        return self._mv[_STAR:_STAR + 9]
+
+    @property
+    def doors(self):
+        return self._mv[_DOOR:_DOOR + 9]
+
+    @property
+    def deities(self):
+        return self._mv[_DEITY:_DEITY + 9]
+
+    @property
+    def heaven_stems(self):
+        return self._mv[_HEAVEN:_HEAVEN + 9]
+
+    @property
+    def earth_stems(self):
+        return self._mv[_EARTH:_EARTH + 9]
+
+    @property
+    def khong_vong_mask(self):
+        return self._buf[_KV] | self._buf[_KV + 1] << 8
+
+    @property
+    def dich_ma_mask(self):
+        return self._buf[_DM] | self._buf[_DM + 1] << 8
+
+    @property
+    def cuc(self):
+        return self._buf[_CUC]
+
+    @property
+    def is_duong_don(self):
+        return bool(self._buf[_FLAGS] & 1)
+
+    @property
+    def leader_palace(self):
+        return self._buf[_LEADER]
+
+    @property
+    def truc_phu_cung(self):
+        return self._buf[_TRUC_PHU_CUNG]
+
+    @property
+    def khong_vong(self):
+        mask = self.khong_vong_mask
+        return [p for p in range(1, 10) if mask >> p & 1]
+
+    @property
+    def dich_ma(self):
+        mask = self.dich_ma_mask
+        return next((p for p in range(1, 10) if mask >> p & 1), None)
+
+    def _name(self, offset, names, palace):
+        code = self._buf[offset + palace - 1]
+        return None if code == NONE_CODE else names[code]
+
+    def star(self, palace):
+        return self._name(_STAR, STAR_NAMES, palace)
+
+    def door(self, palace):
+        return self._name(_DOOR, DOOR_NAMES, palace)
+
+    def deity(self, palace):
+        return self._name(_DEITY, DEITY_NAMES, palace)
+
+    def can_thien(self, palace):
+        return self._name(_HEAVEN, STEM_NAMES, palace)
+
+    def can_dia(self, palace):
+        return self._name(_EARTH, STEM_NAMES, palace)
+
+    def is_khong_vong(self, palace):
+        return bool(self.khong_vong_mask >> palace & 1)
+
+    def is_dich_ma(self, palace):
+        return bool(self.dich_ma_mask >> palace & 1)
+
+    def pillar(self, name):
+        """(can, chi) của 'gio' / 'ngay' / 'thang' / 'nam', hoặc ('N/A', 'N/A')."""
+        code = self._buf[{'gio': _HOUR, 'ngay': _DAY, 'thang': _MONTH, 'nam': _YEAR}[name]]
+        if code == NONE_CODE:
+            return 'N/A', 'N/A'
+        return CAN[code % 10], CHI[code % 12]
+
+    @property
+    def tiet_khi(self):
+        code = self._buf[_TERM]
+        return None if code == NONE_CODE else TIET_KHI_LIST[code]
+
+    # ---------- Dict views ----------
+    def view(self):
+        """Mapping chỉ đọc, tương thích chart_data cũ (không sao chép dữ liệu)."""
+        return ChartView(self)
+
+    def as_dict(self):
+        """Bản sao dict thuần của view() (cho JSON / API)."""
+        return {key: (dict(value) if isinstance(value, Mapping) else value)
+                for key, value in ChartView(self).items()}
+
+    def palace_data(self, palace):
+        """Dict một cung theo định dạng analyze_palace (num, qua, hanh, star, door, ...)."""
+        return {
+            "num": palace,
+            "qua": QUAI_TUONG.get(palace, 'N/A'),
+            "hanh": CUNG_NGU_HANH.get(palace, 'N/A'),
+            "star": self.star(palace) or 'N/A',
+            "door": self.door(palace) or 'N/A',
+            "deity": self.deity(palace) or 'N/A',
+            "can_thien": self.can_thien(palace) or 'N/A',
+            "can_dia": self.can_dia(palace) or 'N/A',
+        }
+
+    def __eq__(self, other):
+        return isinstance(other, Chart) and self._buf == other._buf
+
+    def __hash__(self):
+        return hash(self._buf)
+
+    def __getstate__(self):
+        return self._buf
+
+    def __setstate__(self, state):
+        self._buf = state
+        self._mv = memoryview(state)
+
+    def __repr__(self):
+        can_gio, chi_gio = self.pillar('gio')
+        return f"<Chart cục {self.cuc} {'Dương' if self.is_duong_don else 'Âm'} độn, giờ {can_gio} {chi_gio}>"
+
+
+class PlateView(Mapping):
+    """{cung: tên} chỉ đọc trên một dải mã của Chart; cung không có giá trị bị bỏ qua."""
+    __slots__ = ('_codes', '_names')
+
+    def __init__(self, codes, names):
+        self._codes = codes
+        self._names = names
+
+    def __getitem__(self, palace):
+        if not isinstance(palace, int) or not 1 <= palace <= 9:
+            raise KeyError(palace)
+        code = self._codes[palace - 1]
+        if code == NONE_CODE:
+            raise KeyError(palace)
+        return self._names[code]
+
+    def __iter__(self):
+        codes = self._codes
+        return (p for p in range(1, 10) if codes[p - 1] != NONE_CODE)
+
+    def __len__(self):
+        return sum(1 for code in self._codes if code != NONE_CODE)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class ChartView(Mapping):
+    """Mapping tương thích chart_data: thien_ban, nhan_ban, ..., khong_vong, dich_ma, can_gio..."""
+    __slots__ = ('chart',)
+
+    _PILLARS = {
+        'can_gio': ('gio', 0), 'chi_gio': ('gio', 1), 'can_ngay': ('ngay', 0), 'chi_ngay': ('ngay', 1),
+        'can_thang': ('thang', 0), 'chi_thang': ('thang', 1), 'can_nam': ('nam', 0), 'chi_nam': ('nam', 1),
+    }
+    _KEYS = tuple(name for name, _, _ in PLATES) + (
+        'khong_vong', 'dich_ma', 'truc_phu_cung', 'cuc', 'is_duong_don', 'tiet_khi',
+    ) + tuple(_PILLARS)
+
+    def __init__(self, chart):
+        self.chart = chart
+
+    def __getitem__(self, key):
+        chart = self.chart
+        for name, offset, names in PLATES:
+            if key == name:
+                return PlateView(chart._mv[offset:offset + 9], names)
+        if key in self._PILLARS:
+            pillar, part = self._PILLARS[key]
+            return chart.pillar(pillar)[part]
+        if key in ('khong_vong', 'dich_ma', 'truc_phu_cung', 'cuc', 'is_duong_don', 'tiet_khi'):
+            return getattr(chart, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._KEYS)
+
+    def __len__(self):
+        return len(self._KEYS)
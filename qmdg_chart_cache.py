@@ -0,0 +1,153 @@
+# qmdg_chart_cache.py - Slot-keyed chart cache (cache bàn theo khung giờ)
+"""
+Cache dùng chung cho mọi phiên Streamlit: tham số (calculate_qmdg_params), ngày âm lịch
+và bàn (qmdg_chart.Chart) chỉ phụ thuộc vào khung giờ chứa thời điểm được chọn, nên được
+tính một lần cho mỗi khung rồi dùng lại ở sidebar, view Kỳ Môn và mọi lần rerun.
+
+Khung giờ = [0h, 1h), [1h, 3h), ..., [21h, 23h), [23h, 24h), tách thêm tại ranh giới
+Tiết Khí. Khóa cache là minute key bắt đầu khung nên một mục không bao giờ được dùng
+ngoài khung của nó: đúng tại ranh giới, thời điểm "bây giờ" rơi vào khóa mới.
+Số mục có giới hạn (LRU), stats() trả về hit / miss / eviction.
+
+    from qmdg_chart_cache import get_slot_chart
+    slot = get_slot_chart(selected_datetime)
+    slot.params, slot.lunar, slot.chart, slot.start, slot.end
+"""
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+from qmdg_calc import NEXT_SLOT_MINUTE, calculate_qmdg_params, solar_to_lunar
+from qmdg_solar_terms import MINUTES_PER_DAY, minute_key, minute_key_to_datetime, year_term_table
+
+DEFAULT_MAXSIZE = 512
+# Giờ bắt đầu của khung chứa giờ h (Tý sớm 0h, Sửu 1h ... Hợi 21h, Tý muộn 23h)
+SLOT_START_HOUR = tuple(0 if h == 0 else (h if h % 2 else h - 1) for h in range(24))
+
+
+def slot_bounds(dt):
+    """(minute key bắt đầu, minute key kết thúc) của khung chứa dt (giờ địa phương)."""
+    key = minute_key(dt)
+    base = key - key % MINUTES_PER_DAY
+    hour = (key - base) // 60
+    start, end = base + SLOT_START_HOUR[hour] * 60, base + NEXT_SLOT_MINUTE[hour]
+    terms = year_term_table(dt.year)[0]
+    i = bisect_right(terms, key)
+    if i and terms[i - 1] > start:
+        start = terms[i - 1]
+    i = bisect_left(terms, key + 1)
+    if i < len(terms) and terms[i] < end:
+        end = terms[i]
+    return start, end
+
+
+class SlotChart:
+    """Kết quả của một khung giờ. Dùng chung giữa các phiên - không sửa tại chỗ."""
+    __slots__ = ('start', 'end', 'params', 'lunar', 'chart')
+
+    def __init__(self, start_key, end_key):
+        self.start = minute_key_to_datetime(start_key)
+        self.end = minute_key_to_datetime(end_key)
+        self.params = calculate_qmdg_params(self.start)
+        self.lunar = solar_to_lunar(self.start)
+        self.chart = None
+
+    def get_chart(self):
+        """ChartView của khung (dựng lần đầu khi cần)."""
+        if self.chart is None:
+            from qmdg_chart import Chart
+            self.chart = Chart.from_params(self.params).view()
+        return self.chart
+
+
+class SlotChartCache:
+    """LRU có giới hạn {minute key bắt đầu khung: SlotChart}, an toàn đa luồng."""
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    @classmethod
+    def get_instance(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def get(self, dt):
+        start_key, end_key = slot_bounds(dt)
+        with self._lock:
+            entry = self._entries.get(start_key)
+            if entry is not None:
+                self._entries.move_to_end(start_key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+        entry = SlotChart(start_key, end_key)  # tính ngoài khóa; hai phiên cùng miss thì giữ bản đầu
+        with self._lock:
+            entry = self._entries.setdefault(start_key, entry)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self._entries), 'maxsize': self.maxsize,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+
+def get_slot_chart(dt):
+    """SlotChart của khung chứa dt từ cache dùng chung của tiến trình."""
+    return SlotChartCache.get_instance().get(dt)
+
+
+def cache_stats():
+    return SlotChartCache.get_instance().stats()
+
+
+if __name__ == "__main__":
+    import time
+    from datetime import datetime, timedelta
+
+    from qmdg_chart import Chart
+
+    # Đối chiếu từng phút quanh một ranh giới Tiết Khí + 3 ngày liền
+    cache = SlotChartCache(maxsize=64)
+    boundary = minute_key_to_datetime(year_term_table(2024)[0][5])
+    t = boundary - timedelta(days=1)
+    while t < boundary + timedelta(days=2):
+        slot = cache.get(t)
+        assert slot.start <= t < slot.end, (t, slot.start, slot.end)
+        assert slot.params == calculate_qmdg_params(t), t
+        assert slot.lunar == solar_to_lunar(t), t
+        assert dict(slot.get_chart()) == dict(Chart.from_params(calculate_qmdg_params(t)).view()), t
+        t += timedelta(minutes=7)
+    print(f"✅ Khớp tính trực tiếp quanh {boundary:%Y-%m-%d %H:%M}: {cache.stats()}")
+
+    now = datetime.now()
+    n = 20000
+    start = time.perf_counter()
+    for _ in range(n):
+        calculate_qmdg_params(now)
+        solar_to_lunar(now)
+        Chart.from_params(calculate_qmdg_params(now)).view()
+    direct_us = (time.perf_counter() - start) / n * 1e6
+    start = time.perf_counter()
+    for _ in range(n):
+        get_slot_chart(now).get_chart()
+    cached_us = (time.perf_counter() - start) / n * 1e6
+    print(f"   trực tiếp {direct_us:.1f} µs, cache {cached_us:.1f} µs ({cache_stats()})")
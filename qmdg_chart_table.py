@@ -0,0 +1,243 @@
+"""
+BẢNG TRA CỨU KỲ MÔN DỰNG SẴN (Chart Table)
+
+Toàn bộ đầu ra của lap_ban_qmdg chỉ phụ thuộc vào (Cục, Âm/Dương Độn, Can Giờ, Chi Giờ):
+9 cục x 2 độn x 60 giờ Can Chi = 1080 bàn. Module này dựng (hoặc nạp từ đĩa) toàn bộ
+bảng một lần rồi phục vụ các hàm dưới đây như tra cứu O(1), trả về đúng giá trị
+như các hàm gốc trong qmdg_data:
+
+    an_bai_luc_nghi, lap_ban_qmdg, tinh_khong_vong, tinh_dich_ma
+
+Đầu vào nằm ngoài bảng (Trực Phù/Trực Sử tự chọn, Can Chi không hợp lệ...) được
+chuyển thẳng về hàm gốc nên kết quả luôn giống hệt.
+
+Dòng lệnh:
+    python qmdg_chart_table.py --verify   # Đối chiếu toàn bộ bảng với qmdg_data
+    python qmdg_chart_table.py --build    # Ghi bảng ra đĩa (qmdg_chart_table.pkl)
+"""
+import os
+import pickle
+import sys
+import tempfile
+import threading
+
+import qmdg_data
+
+CHART_TABLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'qmdg_chart_table.pkl')
+CHART_TABLE_VERSION = 1
+
+CAN = ["Giáp", "Ất", "Bính", "Đinh", "Mậu", "Kỷ", "Canh", "Tân", "Nhâm", "Quý"]
+CHI = ["Tý", "Sửu", "Dần", "Mão", "Thìn", "Tị", "Ngọ", "Mùi", "Thân", "Dậu", "Tuất", "Hợi"]
+
+SAO_GOC = {1: "Thiên Bồng", 2: "Thiên Nhuế", 3: "Thiên Xung", 4: "Thiên Phụ", 5: "Thiên Cầm", 6: "Thiên Tâm", 7: "Thiên Trụ", 8: "Thiên Nhậm", 9: "Thiên Anh"}
+MON_GOC = {1: "Hưu", 2: "Tử", 3: "Thương", 4: "Đỗ", 6: "Khai", 7: "Kinh", 8: "Sinh", 9: "Cảnh"}
+# Chi của Giáp đầu tuần -> Lục Nghi ẩn Giáp (Tuần Thủ)
+TUAN_THU_MAP = {0: "Mậu", 10: "Kỷ", 8: "Canh", 6: "Tân", 4: "Nhâm", 2: "Quý"}
+
+
+def iter_gio_can_chi():
+    """Duyệt 60 giờ Can Chi hợp lệ (Giáp Tý -> Quý Hợi)."""
+    for i in range(60):
+        yield CAN[i % 10], CHI[i % 12]
+
+
+def tinh_truc_phu_truc_su(cuc, is_duong_don, can_gio, chi_gio):
+    """Trực Phù / Trực Sử của một giờ, cùng quy tắc với qmdg_calc.calculate_qmdg_params."""
+    dia_ban = qmdg_data.an_bai_luc_nghi(cuc, is_duong_don)
+    leader_chi_idx = (CHI.index(chi_gio) - CAN.index(can_gio)) % 12
+    tuan_thu = TUAN_THU_MAP.get(leader_chi_idx, "Mậu")
+    leader_palace = 1
+    for p, can in dia_ban.items():
+        if can == tuan_thu:
+            leader_palace = p
+            break
+    if leader_palace == 5:
+        return "Thiên Cầm", "Tử Môn"
+    return SAO_GOC.get(leader_palace, "Thiên Tâm"), MON_GOC.get(leader_palace, "Khai") + " Môn"
+
+
+def _source_signature():
+    """Dấu vân tay của qmdg_data.py: bảng trên đĩa chỉ dùng lại khi mã nguồn chưa đổi."""
+    try:
+        st = os.stat(qmdg_data.__file__)
+        return (st.st_size, st.st_mtime_ns)
+    except (OSError, TypeError):
+        return None
+
+
+def build_chart_table():
+    """Dựng toàn bộ bảng từ các hàm gốc trong qmdg_data."""
+    luc_nghi = {}
+    plates = {}
+    for cuc in range(1, 10):
+        for is_duong_don in (True, False):
+            luc_nghi[(cuc, is_duong_don)] = qmdg_data.an_bai_luc_nghi(cuc, is_duong_don)
+            for can_gio, chi_gio in iter_gio_can_chi():
+                truc_phu, truc_su = tinh_truc_phu_truc_su(cuc, is_duong_don, can_gio, chi_gio)
+                plates[(cuc, is_duong_don, can_gio, chi_gio)] = (
+                    truc_phu, truc_su,
+                    qmdg_data.lap_ban_qmdg(cuc, truc_phu, truc_su, can_gio, chi_gio, is_duong_don)
+                )
+
+    khong_vong = {(can, chi): qmdg_data.tinh_khong_vong(can, chi) for can in CAN for chi in CHI}
+    dich_ma = {chi: qmdg_data.tinh_dich_ma(chi) for chi in CHI}
+
+    return {
+        "version": CHART_TABLE_VERSION,
+        "source": _source_signature(),
+        "luc_nghi": luc_nghi,
+        "plates": plates,
+        "khong_vong": khong_vong,
+        "dich_ma": dich_ma,
+    }
+
+
+def save_chart_table(table, path=None):
+    """Ghi bảng ra đĩa (qua file tạm + os.replace). Lỗi ghi được ném lại sau khi dọn file tạm."""
+    path = path or CHART_TABLE_FILE
+    tmp_path = None
+    try:
+        # File tạm riêng cho mỗi lần ghi, như qmdg_snapshot.save_snapshot
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                        prefix=os.path.basename(path) + ".", suffix=".tmp")
+        os.chmod(tmp_path, 0o644)  # mkstemp tạo file 0600
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(table, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except Exception:
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        raise
+    return path
+
+
+def load_chart_table(path=None):
+    """Nạp bảng từ đĩa. Trả về None nếu không có file, hỏng hoặc đã cũ."""
+    path = path or CHART_TABLE_FILE
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            table = pickle.load(f)
+    except Exception:
+        return None
+    if not isinstance(table, dict) or table.get("version") != CHART_TABLE_VERSION:
+        return None
+    if table.get("source") != _source_signature():
+        return None
+    return table
+
+
+_TABLE = None
+_TABLE_LOCK = threading.Lock()
+
+
+def get_chart_table():
+    """Bảng dùng chung cho toàn tiến trình (nạp từ đĩa nếu còn hợp lệ, ngược lại dựng mới)."""
+    global _TABLE
+    if _TABLE is None:
+        with _TABLE_LOCK:
+            if _TABLE is None:
+                _TABLE = load_chart_table() or build_chart_table()
+    return _TABLE
+
+
+# ======================================================================
+# API TRA CỨU (cùng chữ ký với qmdg_data)
+# ======================================================================
+
+def an_bai_luc_nghi(cuc, is_duong_don):
+    """An bài Lục Nghi (Địa Bàn) - tra bảng."""
+    dia_ban = get_chart_table()["luc_nghi"].get((cuc, bool(is_duong_don)))
+    if dia_ban is None:
+        return qmdg_data.an_bai_luc_nghi(cuc, is_duong_don)
+    return dict(dia_ban)
+
+
+def lap_ban_qmdg(cuc, truc_phu_star, truc_su_door, can_gio, chi_gio, is_duong_don):
+    """Lập bàn QMDG (Thiên, Nhân, Thần) - tra bảng."""
+    entry = get_chart_table()["plates"].get((cuc, bool(is_duong_don), can_gio, chi_gio))
+    if entry is None or entry[0] != truc_phu_star or entry[1] != truc_su_door:
+        return qmdg_data.lap_ban_qmdg(cuc, truc_phu_star, truc_su_door, can_gio, chi_gio, is_duong_don)
+    thien_ban, can_thien_ban, nhan_ban, than_ban, cung_dich_truc_phu = entry[2]
+    return dict(thien_ban), dict(can_thien_ban), dict(nhan_ban), dict(than_ban), cung_dich_truc_phu
+
+
+def tinh_khong_vong(can_gio, dia_chi_gio):
+    """Tính Không Vong - tra bảng."""
+    try:
+        kv = get_chart_table()["khong_vong"].get((can_gio, dia_chi_gio))
+    except TypeError:
+        kv = None
+    if kv is None:
+        return qmdg_data.tinh_khong_vong(can_gio, dia_chi_gio)
+    return list(kv)
+
+
+def tinh_dich_ma(dia_chi_gio):
+    """Tính Dịch Mã - tra bảng."""
+    try:
+        return get_chart_table()["dich_ma"][dia_chi_gio]
+    except (KeyError, TypeError):
+        return qmdg_data.tinh_dich_ma(dia_chi_gio)
+
+
+# ======================================================================
+# KIỂM TRA
+# ======================================================================
+
+def verify_chart_table(table=None):
+    """
+    Đối chiếu bảng với các hàm gốc trong qmdg_data.
+    Returns:
+        list: Danh sách sai khác (rỗng nếu bảng khớp hoàn toàn).
+    """
+    table = table or get_chart_table()
+    mismatches = []
+
+    for (cuc, is_duong_don), dia_ban in table["luc_nghi"].items():
+        if dia_ban != qmdg_data.an_bai_luc_nghi(cuc, is_duong_don):
+            mismatches.append(("an_bai_luc_nghi", (cuc, is_duong_don)))
+
+    for key, (truc_phu, truc_su, result) in table["plates"].items():
+        cuc, is_duong_don, can_gio, chi_gio = key
+        expected = qmdg_data.lap_ban_qmdg(cuc, truc_phu, truc_su, can_gio, chi_gio, is_duong_don)
+        if result != expected:
+            mismatches.append(("lap_ban_qmdg", key))
+        if (truc_phu, truc_su) != tinh_truc_phu_truc_su(cuc, is_duong_don, can_gio, chi_gio):
+            mismatches.append(("truc_phu_truc_su", key))
+
+    for (can, chi), kv in table["khong_vong"].items():
+        if kv != qmdg_data.tinh_khong_vong(can, chi):
+            mismatches.append(("tinh_khong_vong", (can, chi)))
+
+    for chi, dm in table["dich_ma"].items():
+        if dm != qmdg_data.tinh_dich_ma(chi):
+            mismatches.append(("tinh_dich_ma", chi))
+
+    expected_plates = 9 * 2 * 60
+    if len(table["plates"]) != expected_plates:
+        mismatches.append(("plates_count", len(table["plates"])))
+
+    return mismatches
+
+
+if __name__ == "__main__":
+    if "--build" in sys.argv:
+        table = build_chart_table()
+        print(f"✅ Đã ghi {len(table['plates'])} bàn vào {save_chart_table(table)}")
+
+    if "--verify" in sys.argv or len(sys.argv) == 1:
+        table = build_chart_table() if "--rebuild" in sys.argv else get_chart_table()
+        errors = verify_chart_table(table)
+        if errors:
+            print(f"❌ Bảng không khớp ({len(errors)} sai khác):")
+            for err in errors[:20]:
+                print("   ", err)
+            sys.exit(1)
+        print(f"✅ Bảng khớp với qmdg_data: {len(table['plates'])} bàn, "
+              f"{len(table['luc_nghi'])} địa bàn, {len(table['khong_vong'])} Không Vong, "
+              f"{len(table['dich_ma'])} Dịch Mã")
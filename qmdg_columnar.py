@@ -0,0 +1,295 @@
+# qmdg_columnar.py - Columnar almanac export (xuất lịch dạng cột)
+"""
+Xuất toàn bộ khung giờ của một dải năm thành file dạng cột (mã số nguyên) và đọc lại
+bằng memory-map: cắt theo ngày chỉ là searchsorted + view, không tính lại, không copy.
+
+Một export là một thư mục:
+    manifest.json           version, năm đầu/cuối, số dòng, dtype/shape từng cột, bảng mã
+    <cột>.npy               mỗi cột một file .npy (np.load(mmap_mode='r'))
+
+Cột:
+    start_key, end_key      minute key (int64) bắt đầu / kết thúc khung
+    can_gio ... truc_su     tham số như qmdg_batch.params_from_minute_keys (int8)
+    chart_key               (độn * 9 + cục - 1) * 60 + giờ Can Chi (uint16)
+    stars, doors, deities,  (n, 9) uint8 - mã qmdg_chart theo cung 1..9, 0xFF = trống
+    heaven_stems, earth_stems
+    truc_phu_cung           cung của sao Trực Phù trên Thiên Bàn (uint8, 0 = không có)
+    khong_vong_mask, dich_ma_mask   bit p = cung p (uint16)
+
+Khung giờ: 0h, 1h, 3h, ..., 21h, 23h mỗi ngày và tách tại ranh giới Tiết Khí.
+
+qmdg_almanac đọc các năm có sẵn trong export khi biến môi trường QMDG_ALMANAC_DIR trỏ
+tới thư mục export (xem default_columns).
+
+Dòng lệnh:
+    python qmdg_columnar.py export DIR 2000 2050   # Xuất năm 2000-2050
+    python qmdg_columnar.py DIR                    # Đối chiếu + đo tốc độ đọc
+"""
+import json
+import os
+import sys
+import threading
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+
+from qmdg_batch import CODE_TABLES, decode_params, params_from_minute_keys
+from qmdg_calc import CHART_KEYS, SLOT_START_MINUTES, timeline_chart
+from qmdg_chart import (
+    CHART_SIZE, DEITY_NAMES, DOOR_NAMES, NONE_CODE, STAR_NAMES, STEM_NAMES, Chart,
+)
+from qmdg_solar_terms import (
+    MAX_YEAR, MIN_YEAR, MINUTES_PER_DAY, minute_key, minute_key_to_datetime, year_term_table,
+)
+
+COLUMNAR_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+ALMANAC_DIR_ENV = "QMDG_ALMANAC_DIR"
+
+PARAM_COLUMNS = tuple(CODE_TABLES) + ('cuc', 'is_duong_don', 'leader_palace')
+# (cột, vị trí trong Chart, bảng tên, khóa dict của qmdg_calc.timeline_chart)
+PLATE_COLUMNS = (
+    ('stars', 16, STAR_NAMES, 'thien_ban'),
+    ('doors', 25, DOOR_NAMES, 'nhan_ban'),
+    ('deities', 34, DEITY_NAMES, 'than_ban'),
+    ('heaven_stems', 43, STEM_NAMES, 'can_thien_ban'),
+    ('earth_stems', 52, STEM_NAMES, 'dia_can'),
+)
+
+
+def chart_key_codes(params):
+    """Khóa bàn (0..1079) cho một lô tham số của params_from_minute_keys."""
+    dun = params['is_duong_don'].astype(np.int64)
+    hour_cycle = (6 * params['can_gio'].astype(np.int64) - 5 * params['chi_gio'].astype(np.int64)) % 60
+    return ((dun * 9 + params['cuc'].astype(np.int64) - 1) * 60 + hour_cycle).astype(np.uint16)
+
+
+@lru_cache(maxsize=1)
+def chart_byte_table():
+    """(1080, CHART_SIZE) uint8: bàn mã hóa qmdg_chart của từng khóa bàn."""
+    table = np.zeros((CHART_KEYS, CHART_SIZE), dtype=np.uint8)
+    for dun in (0, 1):
+        for cuc in range(1, 10):
+            for hour_cycle in range(60):
+                chart = timeline_chart(cuc, bool(dun), hour_cycle)
+                encoded = Chart.from_plates(
+                    chart['thien_ban'], chart['can_thien_ban'], chart['nhan_ban'], chart['than_ban'],
+                    chart['dia_can'], chart['khong_vong'], chart['dich_ma'], chart['truc_phu_cung'], chart)
+                table[(dun * 9 + cuc - 1) * 60 + hour_cycle] = np.frombuffer(encoded.to_bytes(), dtype=np.uint8)
+    table.flags.writeable = False
+    return table
+
+
+def slot_start_keys(start_key, end_key):
+    """Minute key bắt đầu mọi khung trong [start_key, end_key) (int64, tăng dần)."""
+    first_day, last_day = start_key // MINUTES_PER_DAY, (end_key - 1) // MINUTES_PER_DAY
+    days = np.arange(first_day, last_day + 1, dtype=np.int64)
+    starts = (days[:, None] * MINUTES_PER_DAY + np.array(SLOT_START_MINUTES, dtype=np.int64)).ravel()
+    first_year = minute_key_to_datetime(start_key).year
+    last_year = minute_key_to_datetime(end_key - 1).year
+    terms = [k for year in range(first_year, last_year + 1) for k in year_term_table(year)[0]]
+    starts = np.union1d(starts, np.array(terms, dtype=np.int64))
+    starts = starts[(starts > start_key) & (starts < end_key)]
+    return np.concatenate(([start_key], starts)).astype(np.int64)
+
+
+def build_columns(first_year, last_year):
+    """{tên cột: np.ndarray} cho mọi khung giờ từ 1/1/first_year tới hết last_year."""
+    if first_year > last_year or first_year < MIN_YEAR or last_year > MAX_YEAR:
+        raise ValueError(f"Dải năm {first_year}-{last_year} không hợp lệ ({MIN_YEAR}-{MAX_YEAR})")
+    start_key = minute_key(datetime(first_year, 1, 1))
+    end_key = minute_key(datetime(last_year + 1, 1, 1))
+    starts = slot_start_keys(start_key, end_key)
+    params = params_from_minute_keys(starts)
+    keys = chart_key_codes(params)
+    charts = chart_byte_table()[keys]
+
+    columns = {
+        'start_key': starts,
+        'end_key': np.append(starts[1:], end_key).astype(np.int64),
+    }
+    for name in PARAM_COLUMNS:
+        columns[name] = params[name].astype(np.int8)
+    columns['chart_key'] = keys
+    for name, offset, _, _ in PLATE_COLUMNS:
+        columns[name] = np.ascontiguousarray(charts[:, offset:offset + 9])
+    columns['truc_phu_cung'] = np.ascontiguousarray(charts[:, 9])
+    columns['khong_vong_mask'] = charts[:, 10:12].copy().view('<u2').ravel()
+    columns['dich_ma_mask'] = charts[:, 12:14].copy().view('<u2').ravel()
+    return columns
+
+
+def export_almanac(path, first_year, last_year):
+    """
+    Ghi export dạng cột vào thư mục path (ghi đè export cũ).
+    Returns:
+        dict: manifest đã ghi.
+    """
+    columns = build_columns(first_year, last_year)
+    os.makedirs(path, exist_ok=True)
+    for name, values in columns.items():
+        np.save(os.path.join(path, name + ".npy"), values, allow_pickle=False)
+    manifest = {
+        "version": COLUMNAR_VERSION,
+        "first_year": first_year,
+        "last_year": last_year,
+        "rows": int(len(columns['start_key'])),
+        "columns": {name: {"dtype": values.dtype.str, "shape": list(values.shape)}
+                    for name, values in columns.items()},
+        "code_tables": dict({name: list(names) for name, names in CODE_TABLES.items()},
+                            **{name: list(names) for name, _, names, _ in PLATE_COLUMNS}),
+    }
+    tmp_path = os.path.join(path, MANIFEST_FILE + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, os.path.join(path, MANIFEST_FILE))  # manifest ghi sau cùng
+    return manifest
+
+
+class AlmanacColumns:
+    """
+    Đọc export dạng cột: mỗi cột được memory-map ở lần truy cập đầu tiên,
+    slice() / row_range() trả về view trên file, không copy.
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, MANIFEST_FILE), encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get("version") != COLUMNAR_VERSION:
+            raise ValueError(f"Export {path} có version {manifest.get('version')}, cần {COLUMNAR_VERSION}")
+        self.path = path
+        self.manifest = manifest
+        self.first_year = manifest["first_year"]
+        self.last_year = manifest["last_year"]
+        self.rows = manifest["rows"]
+        self._columns = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        values = self._columns.get(name)
+        if values is None:
+            if name not in self.manifest["columns"]:
+                raise KeyError(name)
+            with self._lock:
+                values = self._columns.get(name)
+                if values is None:
+                    values = np.load(os.path.join(self.path, name + ".npy"), mmap_mode='r')
+                    if len(values) != self.rows:
+                        raise ValueError(f"Cột {name} có {len(values)} dòng, manifest ghi {self.rows}")
+                    self._columns[name] = values
+        return values
+
+    @property
+    def columns(self):
+        return tuple(self.manifest["columns"])
+
+    def covers(self, year):
+        return self.first_year <= year <= self.last_year
+
+    def key_range(self, start_key, end_key):
+        """(i, j): các dòng [i, j) giao với [start_key, end_key)."""
+        starts = self['start_key']
+        i = max(0, int(np.searchsorted(starts, start_key, side='right')) - 1)
+        j = int(np.searchsorted(starts, end_key, side='left'))
+        return i, max(i, j)
+
+    def row_range(self, start, end):
+        return self.key_range(minute_key(start), minute_key(end))
+
+    def slice(self, start, end, columns=None):
+        """{tên cột: view} các khung giao với [start, end)."""
+        i, j = self.row_range(start, end)
+        return {name: self[name][i:j] for name in (columns or self.columns)}
+
+    def year_range(self, year):
+        return self.key_range(minute_key(datetime(year, 1, 1)), minute_key(datetime(year + 1, 1, 1)))
+
+    def decode_row(self, i):
+        """Dòng i dưới dạng dict calculate_qmdg_params + start/end (datetime)."""
+        row = decode_params({name: self[name] for name in PARAM_COLUMNS}, i)
+        row['start'] = minute_key_to_datetime(int(self['start_key'][i]))
+        row['end'] = minute_key_to_datetime(int(self['end_key'][i]))
+        return row
+
+    def chart(self, i):
+        """Dòng i dưới dạng qmdg_chart.Chart (tham số + bàn)."""
+        row = self.decode_row(i)
+        plates = {}
+        for name, _, names, _ in PLATE_COLUMNS:
+            plates[name] = {p: names[code] for p, code in enumerate(self[name][i].tolist(), 1)
+                            if code != NONE_CODE}
+        kv_mask, dm_mask = int(self['khong_vong_mask'][i]), int(self['dich_ma_mask'][i])
+        return Chart.from_plates(
+            plates['stars'], plates['heaven_stems'], plates['doors'], plates['deities'], plates['earth_stems'],
+            [p for p in range(1, 10) if kv_mask >> p & 1], dm_mask.bit_length() - 1 if dm_mask else None,
+            int(self['truc_phu_cung'][i]) or None, row)
+
+    def __repr__(self):
+        return f"<AlmanacColumns {self.path} {self.first_year}-{self.last_year}, {self.rows} khung>"
+
+
+_default_lock = threading.Lock()
+_default = {}
+
+
+def default_columns():
+    """Export tại $QMDG_ALMANAC_DIR (mở một lần cho mỗi đường dẫn) hoặc None."""
+    path = os.environ.get(ALMANAC_DIR_ENV)
+    if not path:
+        return None
+    with _default_lock:
+        if path not in _default:
+            try:
+                _default[path] = AlmanacColumns(path)
+            except (OSError, ValueError, KeyError):
+                _default[path] = None
+        return _default[path]
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    if len(sys.argv) >= 5 and sys.argv[1] == "export":
+        target, first, last = sys.argv[2], int(sys.argv[3]), int(sys.argv[4])
+        t0 = time.perf_counter()
+        info = export_almanac(target, first, last)
+        print(f"✅ {target}: {info['rows']:,} khung ({first}-{last}) trong {time.perf_counter() - t0:.2f} s")
+        sys.exit(0)
+
+    if len(sys.argv) >= 2:
+        reader = AlmanacColumns(sys.argv[1])
+    else:
+        year = datetime.now().year
+        target = tempfile.mkdtemp(prefix="qmdg_columnar_")
+        export_almanac(target, year, year)
+        reader = AlmanacColumns(target)
+    print(reader)
+
+    # Đối chiếu một năm với qmdg_calc.iter_chart_timeline (các khung cùng bàn liền nhau được gộp)
+    from qmdg_calc import calculate_qmdg_params, iter_chart_timeline
+
+    year = reader.first_year
+    i, j = reader.year_range(year)
+    keys = reader['chart_key'][i:j]
+    merged = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) + i
+    timeline = list(iter_chart_timeline(datetime(year, 1, 1), datetime(year + 1, 1, 1)))
+    assert len(timeline) == len(merged), (len(timeline), len(merged))
+    for row, (start, _, expected) in zip(merged.tolist(), timeline):
+        assert reader.decode_row(row)['start'] == start
+        chart = reader.chart(row)
+        assert dict(chart.view()['thien_ban']) == expected['thien_ban']
+        assert dict(chart.view()['nhan_ban']) == expected['nhan_ban']
+        assert sorted(expected['khong_vong']) == chart.khong_vong
+    for row in np.random.default_rng(7).integers(i, j, 500).tolist():
+        params = calculate_qmdg_params(reader.decode_row(row)['start'])
+        decoded = reader.decode_row(row)
+        assert all(decoded[name] == params[name] for name in PARAM_COLUMNS), row
+    print(f"✅ Năm {year}: {j - i} khung khớp với iter_chart_timeline / calculate_qmdg_params")
+
+    day = datetime(year, 6, 1)
+    t0 = time.perf_counter()
+    for _ in range(10000):
+        reader.slice(day, day.replace(day=8), ('start_key', 'chart_key', 'doors'))
+    print(f"   slice 1 tuần: {(time.perf_counter() - t0) / 10000 * 1e6:.1f} µs")
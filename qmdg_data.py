@@ -1,7 +1,10 @@
+import copy
 import json
 import os
 import sys
+import threading
 from datetime import datetime
+from types import MappingProxyType
 
 def resource_path(relative_path):
     """ Get absolute path to resource, works for dev and for PyInstaller """
@@ -9,7 +12,9 @@ def resource_path(relative_path):
         # PyInstaller creates a temp folder and stores path in _MEIPASS
         base_path = sys._MEIPASS
     except Exception:
-        base_path = os.path.abspath(".")
+        # Theo thư mục của module, không theo thư mục hiện hành: chạy từ web/ hay nơi khác vẫn
+        # đọc cùng file dữ liệu (và KNOWLEDGE_SOURCES không đổi -> snapshot không bị dựng lại).
+        base_path = os.path.dirname(os.path.abspath(__file__))
 
     return os.path.join(base_path, relative_path)
 
@@ -36,20 +41,22 @@ def merge_excel_data(base_data):
         return base_data
     
     # Trộn Stem Combos vào TRUCTU_TRANH
-    stem_combos = excel_data.get("STEM_COMBOS", {})
+    merge_stem_combos(base_data["TRUCTU_TRANH"], excel_data.get("STEM_COMBOS", {}))
+    base_data["ENRICHED_DATA"] = excel_data
+    return base_data
+
+def merge_stem_combos(tranh_data, stem_combos):
+    """Trộn Stem Combos (Excel) vào tranh_data tại chỗ."""
     for key, content in stem_combos.items():
-        if key not in base_data["TRUCTU_TRANH"]:
-            base_data["TRUCTU_TRANH"][key] = {
+        if key not in tranh_data:
+            tranh_data[key] = {
                 "Tên_Cách_Cục": "Tra cứu Excel",
                 "Cát_Hung": "Tra cứu",
                 "Luận_Giải": content
             }
         else:
             # Bổ sung thêm diễn giải từ Excel nếu đã có
-            base_data["TRUCTU_TRANH"][key]["Luận_Giải"] += f"\n (Excel: {content})"
-            
-    base_data["ENRICHED_DATA"] = excel_data
-    return base_data
+            tranh_data[key]["Luận_Giải"] += f"\n (Excel: {content})"
 
 def load_advanced_knowledge():
     """Tải dữ liệu nâng cao từ các nguồn PDF/Book."""
@@ -77,6 +84,7 @@ def save_custom_data(data):
     try:
         with open(CUSTOM_DATA_FILE, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=4)
+        apply_custom_patterns(data)
         return True
     except IOError:
         return False
@@ -113,8 +121,8 @@ CAN_CHI_Gio = ["Tý", "Sửu", "Dần", "Mão", "Thìn", "Tị", "Ngọ", "Mùi"
 
 # DỮ LIỆU CHÍNH
 KY_MON_DATA = {
-    # Dữ liệu từ Excel sẽ được trộn vào đây nếu có
-    "ENRICHED_DATA": load_excel_data(),
+    # Dữ liệu từ Excel sẽ được trộn vào đây nếu có (merge_excel_data)
+    "ENRICHED_DATA": {},
     "DU_LIEU_DUNG_THAN_PHU_TRO": {
         "CUU_TINH": {
             "Thiên Bồng": {"Hành": "Thủy", "Tính_Chất": "Tướng quân, thích hợp trộm cướp, binh đao."},
@@ -545,29 +553,23 @@ def kiem_tra_cau_truc_tranh(can_thien_ban, dia_can):
     ket_qua = {}
     
     # Chuẩn bị Can Thiên Bàn đầy đủ (thêm Mậu vào cung 5 nếu chưa có)
-    can_thien_ban_full = can_thien_ban.copy()
+    can_thien_ban_full = dict(can_thien_ban)
     if 5 not in can_thien_ban_full or can_thien_ban_full[5] == 'N/A':
         can_thien_ban_full[5] = "Mậu" 
         
-    tranh_data_all = KY_MON_DATA["TRUCTU_TRANH"] 
+    matrix = get_cach_cuc_matrix()
 
     for cung_so in range(1, 10):
         can_thien = can_thien_ban_full.get(cung_so, 'N/A')
         can_dia = dia_can.get(cung_so, 'N/A')
+        thien_code = CAN_CODE.get(can_thien.strip()) if isinstance(can_thien, str) else None
+        dia_code = CAN_CODE.get(can_dia.strip()) if isinstance(can_dia, str) else None
         
-        if can_thien and can_dia and can_thien not in ["Giáp", "N/A"] and can_dia not in ["Giáp", "N/A"]:
-            # Key: Can Thiên + Can Địa (ví dụ: ẤtBính)
-            key = can_thien.strip() + can_dia.strip()
-            
-            result = tranh_data_all.get(key, {})
-            
-            if result:
-                ket_qua[cung_so] = result
-            else:
-                ket_qua[cung_so] = {"Tên_Cách_Cục": "Không có", "Cát_Hung": "Bình", "Luận_Giải": "Không có cách cục đặc biệt được lưu."}
-                
+        # Bỏ qua Giáp (ẩn dưới Lục Nghi) và Can không hợp lệ
+        if thien_code and dia_code:
+            ket_qua[cung_so] = matrix[thien_code][dia_code] or KHONG_CACH_CUC
         else:
-            ket_qua[cung_so] = {"Tên_Cách_Cục": "Không có", "Cát_Hung": "Bình", "Luận_Giải": "Không có cách cục đặc biệt được lưu."}
+            ket_qua[cung_so] = KHONG_CACH_CUC
 
     return ket_qua
 
@@ -775,15 +777,130 @@ def lap_ban_qmdg_thủ_công(sao_cung_1, cua_cung_1, can_thien_cung_1, than_cung
 
     return thien_ban, can_thien_ban, nhan_ban, than_ban, truc_phu_cung_so, dia_can
 
-# Tải dữ liệu tùy chỉnh khi khởi động
-KY_MON_DATA_CUSTOM = load_custom_data()
-if KY_MON_DATA_CUSTOM and "TRUCTU_TRANH" in KY_MON_DATA_CUSTOM:
-    KY_MON_DATA["TRUCTU_TRANH"].update(KY_MON_DATA_CUSTOM["TRUCTU_TRANH"])
+def build_knowledge_data(base_data):
+    """Trộn dữ liệu tùy chỉnh, Excel và tri thức nâng cao vào KY_MON_DATA."""
+    # Tải dữ liệu tùy chỉnh
+    custom_data = load_custom_data()
+    if custom_data and "TRUCTU_TRANH" in custom_data:
+        base_data["TRUCTU_TRANH"].update(custom_data["TRUCTU_TRANH"])
 
-# NEW: Trộn dữ liệu từ Excel vào KY_MON_DATA
-KY_MON_DATA = merge_excel_data(KY_MON_DATA)
+    # Trộn dữ liệu từ Excel
+    base_data = merge_excel_data(base_data)
 
-# NEW: Trộn dữ liệu nâng cao (PDF Knowledge)
-KY_MON_DATA["ADVANCED_KNOWLEDGE"] = load_advanced_knowledge()
+    # Trộn dữ liệu nâng cao (PDF Knowledge)
+    base_data["ADVANCED_KNOWLEDGE"] = load_advanced_knowledge()
+    return base_data
+
+
+# Snapshot đã trộn sẵn (qmdg_snapshot): chỉ dựng lại khi một file nguồn thay đổi.
+# Nằm cạnh module (không theo thư mục hiện hành): import từ thư mục khác không để lại file rác.
+KNOWLEDGE_SNAPSHOT_FILE = resource_path('qmdg_knowledge.snapshot')
+KNOWLEDGE_SOURCES = [os.path.abspath(__file__), CUSTOM_DATA_FILE, EXCEL_DATA_FILE, ADVANCED_DATA_FILE]
+
+def load_knowledge_data(base_data):
+    """
+    KY_MON_DATA đã trộn dưới dạng LazySections: nạp từ snapshot nếu còn hợp lệ, ngược lại
+    dựng và ghi snapshot. Các section lớn (ENRICHED_DATA, ADVANCED_KNOWLEDGE...) chỉ được
+    giải mã khi truy cập lần đầu - xem KY_MON_DATA.section_stats().
+    """
+    from qmdg_snapshot import LazySections, load_snapshot_lazy, save_snapshot
+    if not os.environ.get("QMDG_REBUILD_SNAPSHOT"):
+        sections = load_snapshot_lazy(KNOWLEDGE_SNAPSHOT_FILE, KNOWLEDGE_SOURCES)
+        if sections is not None:
+            return sections
+    data = build_knowledge_data(base_data)
+    if save_snapshot(KNOWLEDGE_SNAPSHOT_FILE, data, KNOWLEDGE_SOURCES):
+        # Đọc lại dạng lazy để giải phóng các section lớn chưa dùng
+        sections = load_snapshot_lazy(KNOWLEDGE_SNAPSHOT_FILE, KNOWLEDGE_SOURCES)
+        if sections is not None:
+            return sections
+    return LazySections(loaded=data)
+
+
+# TRUCTU_TRANH gốc (trước khi trộn custom + Excel) để dựng lại khi custom_data.json thay đổi
+_BASE_TRUCTU_TRANH = copy.deepcopy(KY_MON_DATA["TRUCTU_TRANH"])
+KY_MON_DATA = load_knowledge_data(KY_MON_DATA)
 
 TOPIC_INTERPRETATIONS = KY_MON_DATA.get("TOPIC_INTERPRETATIONS", {})
+
+# ======================================================================
+# MA TRẬN CÁCH CỤC 10x10 (Can Thiên x Can Địa)
+# ======================================================================
+# Dựng một lần từ TRUCTU_TRANH (sau khi đã trộn custom + Excel): mỗi ô là view chỉ đọc
+# (MappingProxyType) của bản ghi trong TRUCTU_TRANH, None nếu cặp Can không có cách cục.
+# Các ô được trả thẳng cho nơi gọi và dùng chung giữa các phiên: không sửa được tại chỗ.
+
+CAN_10 = ["Giáp", "Ất", "Bính", "Đinh", "Mậu", "Kỷ", "Canh", "Tân", "Nhâm", "Quý"]
+CAN_CODE = {can: i for i, can in enumerate(CAN_10)}
+KHONG_CACH_CUC = MappingProxyType({"Tên_Cách_Cục": "Không có", "Cát_Hung": "Bình",
+                                   "Luận_Giải": "Không có cách cục đặc biệt được lưu."})
+
+_CACH_CUC_MATRIX = None
+_CACH_CUC_LOCK = threading.Lock()
+_CACH_CUC_LISTENERS = []   # cache dựng từ Cách Cục ở module khác (qmdg_auspicious, qmdg_analysis)
+
+
+def build_cach_cuc_matrix(tranh_data=None):
+    """Dựng ma trận 10x10 (tuple các tuple) từ TRUCTU_TRANH."""
+    tranh_data = KY_MON_DATA["TRUCTU_TRANH"] if tranh_data is None else tranh_data
+    def cell(record):
+        return MappingProxyType(record) if record else None
+    return tuple(tuple(cell(tranh_data.get(can_thien + can_dia)) for can_dia in CAN_10) for can_thien in CAN_10)
+
+
+def get_cach_cuc_matrix():
+    """Ma trận dùng chung cho toàn tiến trình, dựng lại sau invalidate_cach_cuc_matrix()."""
+    global _CACH_CUC_MATRIX
+    matrix = _CACH_CUC_MATRIX
+    if matrix is None:
+        with _CACH_CUC_LOCK:
+            if _CACH_CUC_MATRIX is None:
+                _CACH_CUC_MATRIX = build_cach_cuc_matrix()
+            matrix = _CACH_CUC_MATRIX
+    return matrix
+
+
+def add_cach_cuc_listener(func):
+    """Đăng ký func() được gọi mỗi khi ma trận Cách Cục bị bỏ (để xóa cache suy ra từ nó)."""
+    if func not in _CACH_CUC_LISTENERS:
+        _CACH_CUC_LISTENERS.append(func)
+
+
+def invalidate_cach_cuc_matrix():
+    """Bỏ ma trận đã dựng và báo các listener - gọi sau khi TRUCTU_TRANH thay đổi lúc chạy."""
+    global _CACH_CUC_MATRIX
+    with _CACH_CUC_LOCK:
+        _CACH_CUC_MATRIX = None
+    for func in list(_CACH_CUC_LISTENERS):
+        func()
+
+
+def build_tructu_tranh(custom_data):
+    """TRUCTU_TRANH = gốc + custom (ghi đè) + Stem Combos Excel (bổ sung), cùng thứ tự như lúc import."""
+    tranh_data = copy.deepcopy(_BASE_TRUCTU_TRANH)
+    tranh_data.update(copy.deepcopy((custom_data or {}).get("TRUCTU_TRANH") or {}))
+    merge_stem_combos(tranh_data, KY_MON_DATA.get("ENRICHED_DATA", {}).get("STEM_COMBOS", {}))
+    return tranh_data
+
+
+def apply_custom_patterns(data):
+    """Dựng lại TRUCTU_TRANH từ dữ liệu gốc + cách cục tùy chỉnh data và làm mới ma trận.
+
+    Mẫu bị xóa khỏi custom_data.json cũng hết hiệu lực ngay (không chỉ update()).
+    """
+    KY_MON_DATA["TRUCTU_TRANH"] = build_tructu_tranh(data)
+    invalidate_cach_cuc_matrix()
+
+
+def tra_cach_cuc_code(thien_code, dia_code):
+    """Cách cục theo mã Can (0-9). Trả về bản ghi hoặc None."""
+    return get_cach_cuc_matrix()[thien_code][dia_code]
+
+
+def tra_cach_cuc(can_thien, can_dia):
+    """Cách cục theo tên Can Thiên/Địa. Trả về bản ghi hoặc None."""
+    thien_code = CAN_CODE.get(can_thien.strip()) if isinstance(can_thien, str) else None
+    dia_code = CAN_CODE.get(can_dia.strip()) if isinstance(can_dia, str) else None
+    if thien_code is None or dia_code is None:
+        return None
+    return get_cach_cuc_matrix()[thien_code][dia_code]
@@ -0,0 +1,255 @@
+# qmdg_lunar.py - Vietnamese lunar calendar (Âm lịch) 1899-2100
+"""
+Âm lịch Việt Nam (múi giờ UTC+7) dạng bảng nén theo bit.
+
+Mỗi năm âm lịch là một số nguyên trong LUNAR_INFO:
+    bit  0-12 : độ dài các tháng theo thứ tự thực (bit = 1 -> tháng đủ 30 ngày)
+    bit 13-16 : tháng nhuận (0 = không nhuận; tháng nhuận đứng ngay sau tháng cùng số)
+    bit 17-22 : ngày Tết = date(năm, 1, 1).toordinal() + giá trị này
+
+Bảng được giải nén một lần khi import thành mảng ngày bắt đầu tháng (cộng dồn),
+nên solar_to_lunar chỉ còn vài phép tính số nguyên, không vòng lặp, không tạo dict.
+
+Bảng được sinh bằng build_lunar_info() (điểm Sóc theo Meeus, Trung Khí theo
+qmdg_solar_terms, quy tắc tháng nhuận của lịch Việt Nam):
+    python qmdg_lunar.py --verify     # Sinh lại và đối chiếu với bảng nhúng
+    python qmdg_lunar.py --generate   # In bảng mới
+"""
+import math
+import sys
+from array import array
+from datetime import date
+
+LUNAR_BASE_YEAR = 1899
+TZ_OFFSET_HOURS = 7
+
+LUNAR_INFO = (
+    0x500ad5, 0x3d16d2, 0x620752, 0x4c06a5, 0x36b64b, 0x5c064b, 0x440c9b, 0x30955a,  # 1899
+    0x56056a, 0x400b69, 0x2a5752, 0x500b52, 0x3adb25, 0x600b25, 0x480a4b, 0x32b4ab,  # 1907
+    0x5802ad, 0x42056d, 0x2c6b69, 0x520da9, 0x3efd92, 0x640e92, 0x4c0d25, 0x36da4d,  # 1915
+    0x5c0a56, 0x4602b6, 0x2e95b5, 0x5606d4, 0x400ea9, 0x2c5e92, 0x500e92, 0x3acd26,  # 1923
+    0x5e052b, 0x480a57, 0x32b4d6, 0x58035a, 0x4206d5, 0x2e76c9, 0x520749, 0x3d1693,  # 1931
+    0x620a95, 0x4c052b, 0x34ca5b, 0x5a0aad, 0x46056a, 0x309b65, 0x560ba4, 0x400b49,  # 1939
+    0x2a5a95, 0x500a95, 0x38f52d, 0x5e0556, 0x480ab5, 0x34b5aa, 0x5805d2, 0x420da5,  # 1947
+    0x2e7d4a, 0x540e4a, 0x3d0c96, 0x600a97, 0x4c0556, 0x36cab5, 0x5a0ad9, 0x4606d2,  # 1955
+    0x308ea5, 0x560725, 0x3e064b, 0x286c97, 0x4e04ab, 0x38e55b, 0x5c056b, 0x480b69,  # 1963
+    0x34b752, 0x5a0b52, 0x420b25, 0x2c9a4b, 0x520a4d, 0x3d14ab, 0x6002ad, 0x4a05ad,  # 1971
+    0x36cb6a, 0x5c0da9, 0x460d92, 0x309d25, 0x560d25, 0x400a55, 0x2854ad, 0x4e04b6,  # 1979
+    0x38e5b5, 0x5e06d5, 0x480ec9, 0x34be92, 0x5a0e92, 0x440d26, 0x2c6a56, 0x500a57,  # 1987
+    0x3d1556, 0x62056a, 0x4a0b55, 0x36b6c9, 0x5c0749, 0x460693, 0x2e952b, 0x54052b,  # 1995
+    0x3e0a5b, 0x2a555a, 0x4e056a, 0x38eb65, 0x5e0ba5, 0x4a0d49, 0x32ba95, 0x580a95,  # 2003
+    0x42052d, 0x2c8aad, 0x500ab5, 0x3d35aa, 0x6205d2, 0x4c0da5, 0x36dd4a, 0x5c0e4a,  # 2011
+    0x460c96, 0x30992e, 0x540556, 0x3e0ab5, 0x2a55b2, 0x5006d2, 0x38cea5, 0x5e0725,  # 2019
+    0x48064b, 0x32ac97, 0x5604ab, 0x40055b, 0x2c6ada, 0x520b6a, 0x3d7752, 0x620b92,  # 2027
+    0x4c0b25, 0x36da4b, 0x5a0a4d, 0x4404ad, 0x2ea95b, 0x5405ad, 0x3e0baa, 0x2a5b52,  # 2035
+    0x500d92, 0x3afd25, 0x5e0d25, 0x480a55, 0x32b4ad, 0x5804b6, 0x4006b5, 0x2c6daa,  # 2043
+    0x520eca, 0x3f0e92, 0x600e93, 0x4c0d26, 0x36ca56, 0x5a0a5b, 0x44055a, 0x2e8ad5,  # 2051
+    0x540b55, 0x40074a, 0x286e93, 0x4e0a93, 0x38f52b, 0x5e052b, 0x460a9b, 0x32b55a,  # 2059
+    0x58056a, 0x420b65, 0x2c974a, 0x520d4a, 0x3d1a95, 0x620c95, 0x4a092d, 0x34caad,  # 2067
+    0x5a0ab5, 0x4605aa, 0x2e8da5, 0x540ea5, 0x400d4a, 0x2a7d15, 0x4e0c96, 0x38f956,  # 2075
+    0x5e0556, 0x480ab5, 0x32b6b4, 0x5806d4, 0x420ea5, 0x2e8e8a, 0x50068b, 0x3b1497,  # 2083
+    0x6004ab, 0x4a095b, 0x34cada, 0x5a0b6a, 0x460754, 0x309725, 0x540b45, 0x3e0a8b,  # 2091
+    0x28552b, 0x4e04ad,  # 2099
+)
+
+LUNAR_LAST_YEAR = LUNAR_BASE_YEAR + len(LUNAR_INFO) - 1
+
+_SYNODIC_MONTH = 29.530588861
+_JD_ORDINAL_1 = 1721425.5  # Julian Day of 0001-01-01 00:00
+
+
+def decode_year(info, year):
+    """(ngày Tết dạng ordinal, tháng nhuận, [độ dài các tháng]) của một năm âm lịch."""
+    leap = (info >> 13) & 0xF
+    count = 13 if leap else 12
+    lengths = [30 if info >> i & 1 else 29 for i in range(count)]
+    return date(year, 1, 1).toordinal() + (info >> 17), leap, lengths
+
+
+def _expand(lunar_info):
+    """Giải nén bảng thành các mảng phẳng theo tháng."""
+    starts = array('l')
+    months = array('H')  # (năm - LUNAR_BASE_YEAR) << 5 | tháng << 1 | nhuận
+    cursor = None
+    for offset, info in enumerate(lunar_info):
+        year = LUNAR_BASE_YEAR + offset
+        new_year, leap, lengths = decode_year(info, year)
+        if cursor is not None and cursor != new_year:
+            raise ValueError(f"Bảng âm lịch không liên tục tại năm {year}")
+        cursor = new_year
+        month = 1
+        for i, length in enumerate(lengths):
+            is_leap = leap and i == leap
+            if is_leap:
+                month -= 1
+            starts.append(cursor)
+            months.append(offset << 5 | month << 1 | (1 if is_leap else 0))
+            cursor += length
+            month += 1
+    starts.append(cursor)  # Sentinel: ngày đầu năm sau năm cuối
+    return starts, months
+
+
+_MONTH_START, _MONTH_CODE = _expand(LUNAR_INFO) if LUNAR_INFO else (array('l', [0]), array('H'))
+_FIRST_DAY = _MONTH_START[0]
+_END_DAY = _MONTH_START[-1]
+_LAST_MONTH = len(_MONTH_CODE) - 1
+_MONTH_SCALE = 1000000
+_SYNODIC_SCALED = round(_SYNODIC_MONTH * _MONTH_SCALE)
+
+
+def solar_to_lunar(dt):
+    """
+    Đổi ngày dương (date/datetime, giờ địa phương) sang âm lịch Việt Nam.
+    Returns:
+        tuple: (ngày, tháng, năm, nhuận)
+    """
+    day = dt.toordinal()
+    if not _FIRST_DAY <= day < _END_DAY:
+        raise ValueError(f"Ngày {dt:%Y-%m-%d} nằm ngoài phạm vi âm lịch hỗ trợ "
+                         f"({LUNAR_BASE_YEAR}-{LUNAR_LAST_YEAR})")
+    i = (day - _FIRST_DAY) * _MONTH_SCALE // _SYNODIC_SCALED
+    if i > _LAST_MONTH:
+        i = _LAST_MONTH
+    if day < _MONTH_START[i]:
+        i -= 1
+    elif day >= _MONTH_START[i + 1]:
+        i += 1
+    code = _MONTH_CODE[i]
+    return day - _MONTH_START[i] + 1, code >> 1 & 0xF, LUNAR_BASE_YEAR + (code >> 5), bool(code & 1)
+
+
+# ======================================================================
+# SINH BẢNG (chỉ dùng khi tạo lại LUNAR_INFO)
+# ======================================================================
+
+def _new_moon_jde(k):
+    """Julian Ephemeris Day of new moon k (k = 0 at 2000-01-06), Meeus ch. 49."""
+    t = k / 1236.85
+    jde = (2451550.09766 + _SYNODIC_MONTH * k + 0.00015437 * t ** 2
+           - 0.000000150 * t ** 3 + 0.00000000073 * t ** 4)
+    e = 1 - 0.002516 * t - 0.0000074 * t ** 2
+    m = math.radians(2.5534 + 29.10535670 * k - 0.0000014 * t ** 2 - 0.00000011 * t ** 3)
+    mp = math.radians(201.5643 + 385.81693528 * k + 0.0107582 * t ** 2
+                      + 0.00001238 * t ** 3 - 0.000000058 * t ** 4)
+    f = math.radians(160.7108 + 390.67050284 * k - 0.0016118 * t ** 2
+                     - 0.00000227 * t ** 3 + 0.000000011 * t ** 4)
+    om = math.radians(124.7746 - 1.56375588 * k + 0.0020672 * t ** 2 + 0.00000215 * t ** 3)
+    sin = math.sin
+    jde += (-0.40720 * sin(mp) + 0.17241 * e * sin(m) + 0.01608 * sin(2 * mp)
+            + 0.01039 * sin(2 * f) + 0.00739 * e * sin(mp - m) - 0.00514 * e * sin(mp + m)
+            + 0.00208 * e * e * sin(2 * m) - 0.00111 * sin(mp - 2 * f) - 0.00057 * sin(mp + 2 * f)
+            + 0.00056 * e * sin(2 * mp + m) - 0.00042 * sin(3 * mp) + 0.00042 * e * sin(m + 2 * f)
+            + 0.00038 * e * sin(m - 2 * f) - 0.00024 * e * sin(2 * mp - m) - 0.00017 * sin(om)
+            - 0.00007 * sin(mp + 2 * m) + 0.00004 * sin(2 * mp - 2 * f) + 0.00004 * sin(3 * m)
+            + 0.00003 * sin(mp + m - 2 * f) + 0.00003 * sin(2 * mp + 2 * f)
+            - 0.00003 * sin(mp + m + 2 * f) + 0.00003 * sin(mp - m + 2 * f)
+            - 0.00002 * sin(mp - m - 2 * f) - 0.00002 * sin(3 * mp + m) + 0.00002 * sin(4 * mp))
+    planetary = (
+        (0.000325, 299.77, 0.107408, -0.009173), (0.000165, 251.88, 0.016321, 0),
+        (0.000164, 251.83, 26.651886, 0), (0.000126, 349.42, 36.412478, 0),
+        (0.000110, 84.66, 18.206239, 0), (0.000062, 141.74, 53.303771, 0),
+        (0.000060, 207.14, 2.453732, 0), (0.000056, 154.84, 7.306860, 0),
+        (0.000047, 34.52, 27.261239, 0), (0.000042, 207.19, 0.121824, 0),
+        (0.000040, 291.34, 1.844379, 0), (0.000037, 161.72, 24.198154, 0),
+        (0.000035, 239.56, 25.513099, 0), (0.000023, 331.55, 3.592518, 0),
+    )
+    for coef, a0, a1, a2 in planetary:
+        jde += coef * sin(math.radians(a0 + a1 * k + a2 * t ** 2))
+    return jde
+
+
+def _jd_year(jd):
+    return 2000 + (jd - 2451545.0) / 365.25
+
+
+def _new_moon_day(k):
+    """Local (UTC+7) day ordinal of new moon k."""
+    from qmdg_solar_terms import delta_t
+    jde = _new_moon_jde(k)
+    jd_local = jde - delta_t(_jd_year(jde)) / 86400.0 + TZ_OFFSET_HOURS / 24.0
+    return math.floor(jd_local - _JD_ORDINAL_1) + 1
+
+
+def _sun_sector(day_ord):
+    """Trung khí sector (0-11) of the Sun at local midnight starting a day."""
+    from qmdg_solar_terms import delta_t, solar_longitude
+    jd_ut = _JD_ORDINAL_1 + day_ord - 1 - TZ_OFFSET_HOURS / 24.0
+    jde = jd_ut + delta_t(_jd_year(jd_ut)) / 86400.0
+    return int(solar_longitude(jde) // 30)
+
+
+def _k_before(day_ord):
+    """Index k of the last new moon starting on or before a day ordinal."""
+    jd = _JD_ORDINAL_1 + day_ord - 1
+    k = math.floor((jd - 2451550.09766) / _SYNODIC_MONTH) + 1
+    while _new_moon_day(k) > day_ord:
+        k -= 1
+    return k
+
+
+def _month11_k(year):
+    """k of the lunar month 11 (the month containing Đông Chí) of a civil year."""
+    k = _k_before(date(year, 12, 31).toordinal())
+    if _sun_sector(_new_moon_day(k)) >= 9:
+        k -= 1
+    return k
+
+
+def build_lunar_info(first_year=LUNAR_BASE_YEAR, last_year=2100):
+    """Sinh bảng LUNAR_INFO cho các năm âm lịch first_year..last_year."""
+    months = []  # (ngày bắt đầu, năm âm, tháng, nhuận)
+    for year in range(first_year, last_year + 2):
+        k11 = _month11_k(year - 1)
+        k11_next = _month11_k(year)
+        count = k11_next - k11
+        leap_offset = None
+        if count == 13:
+            for i in range(1, 13):
+                if _sun_sector(_new_moon_day(k11 + i)) == _sun_sector(_new_moon_day(k11 + i + 1)):
+                    leap_offset = i
+                    break
+        for i in range(count):
+            number = i + 11
+            if leap_offset is not None and i >= leap_offset:
+                number -= 1
+            lunar_year = year - 1 if number <= 12 else year
+            months.append((_new_moon_day(k11 + i), lunar_year, (number - 1) % 12 + 1, i == leap_offset))
+
+    info = []
+    for year in range(first_year, last_year + 1):
+        idx = next(i for i, m in enumerate(months) if m[1] == year and m[2] == 1 and not m[3])
+        end = next(i for i in range(idx + 1, len(months)) if months[i][1] != year)
+        chunk = months[idx:end]
+        lengths = [months[i + 1][0] - months[i][0] for i in range(idx, end)]
+        leap = next((m[2] for m in chunk if m[3]), 0)
+        mask = sum(1 << i for i, n in enumerate(lengths) if n == 30)
+        info.append((months[idx][0] - date(year, 1, 1).toordinal()) << 17 | leap << 13 | mask)
+    return tuple(info)
+
+
+def format_lunar_info(info, per_line=8):
+    lines = []
+    for i in range(0, len(info), per_line):
+        row = ", ".join(f"0x{v:06x}" for v in info[i:i + per_line])
+        lines.append(f"    {row},  # {LUNAR_BASE_YEAR + i}")
+    return "LUNAR_INFO = (\n" + "\n".join(lines) + "\n)"
+
+
+if __name__ == "__main__":
+    if "--generate" in sys.argv:
+        print(format_lunar_info(build_lunar_info()))
+    else:
+        rebuilt = build_lunar_info()
+        diff = [LUNAR_BASE_YEAR + i for i, (a, b) in enumerate(zip(rebuilt, LUNAR_INFO)) if a != b]
+        if diff or len(rebuilt) != len(LUNAR_INFO):
+            print(f"❌ Bảng nhúng khác bảng sinh lại tại các năm: {diff[:20]}")
+            sys.exit(1)
+        # Ước lượng chỉ số tháng trong solar_to_lunar không được lệch quá 1 tháng
+        from bisect import bisect_right
+        for day in range(_FIRST_DAY, _END_DAY):
+            guess = (day - _FIRST_DAY) * _MONTH_SCALE // _SYNODIC_SCALED
+            if abs(guess - (bisect_right(_MONTH_START, day) - 1)) > 1:
+                print(f"❌ Ước lượng tháng lệch quá 1 tại ordinal {day}")
+                sys.exit(1)
+        print(f"✅ LUNAR_INFO khớp ({len(LUNAR_INFO)} năm, {len(_MONTH_CODE)} tháng)")
@@ -0,0 +1,420 @@
+# qmdg_report.py - Background report pipeline (tạo báo cáo kỹ thuật chạy nền, phát từng phần)
+"""
+Báo cáo kỹ thuật (Cung Chủ / Cung Khách, quan hệ Ngũ Hành, 9 phương diện, phân tích liên
+mạch) được dựng trong thread pool thay vì trong lần chạy script của Streamlit.
+
+- Mỗi báo cáo là một ReportJob, dùng chung giữa các phiên và cache theo
+  (Chart của khung giờ, chủ đề, cung Chủ, cung Khách). Bấm lại nút / phiên khác cùng khóa
+  nhận ngay job cũ (đang chạy hoặc đã xong).
+- Từng phần được ghi ngay ra file TXT, Markdown và HTML (tempdir) rồi flush: báo cáo
+  nhiều chủ đề rất lớn không bao giờ nằm trọn trong bộ nhớ, chỉ PREVIEW_SECTIONS phần đầu
+  được giữ lại để hiển thị.
+- job.iter_sections() trả về từng phần ngay khi nó xong, nên UI hiển thị dần thay vì
+  chờ cả báo cáo.
+- Job bị loại khỏi cache thì file bị xóa: job.read() báo FileNotFoundError, nơi gọi
+  submit() lại. Thư mục tạm của pipeline bị xóa khi close() / thoát tiến trình.
+
+    from qmdg_report import get_report_pipeline
+    job = get_report_pipeline().submit(chart_data, topic, chu_idx, khach_idx)
+    for section in job.iter_sections():
+        section.title, section.fields, section.text
+    job.path("md"), job.read("html")
+"""
+import atexit
+import html
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from qmdg_analysis import analyze_chart
+from qmdg_data import tinh_ngu_hanh_sinh_khac
+
+try:
+    from super_detailed_analysis import phan_tich_sieu_chi_tiet_chu_de, tao_phan_tich_lien_mach
+    USE_SUPER_DETAILED = True
+except ImportError:
+    USE_SUPER_DETAILED = False
+
+MAX_WORKERS = int(os.environ.get("QMDG_REPORT_WORKERS", "2"))
+CACHE_SIZE = 64            # số báo cáo (đã xong) giữ trên đĩa
+PREVIEW_SECTIONS = 60      # số phần giữ trong bộ nhớ để hiển thị
+TITLE = "BÁO CÁO PHÂN TÍCH KỲ MÔN ĐỘN GIÁP"
+FORMATS = {
+    "txt": (".txt", "text/plain"),
+    "md": (".md", "text/markdown"),
+    "html": (".html", "text/html"),
+}
+ASPECTS = (
+    ('thai_at', '⚖️ Thái Ất'),
+    ('thanh_cong', '🎯 Thành Công'),
+    ('tai_loc', '💰 Tài Lộc'),
+    ('quan_he', '🤝 Quan Hệ'),
+    ('suc_khoe', '❤️ Sức Khỏe'),
+    ('tranh_chap', '⚔️ Tranh Chấp'),
+    ('di_chuyen', '🚗 Di Chuyển'),
+    ('hoc_van', '📚 Học Vấn'),
+    ('tam_linh', '🔮 Tâm Linh'),
+)
+
+
+class Section:
+    """Một phần của báo cáo: tiêu đề, các dòng (nhãn, giá trị) và đoạn văn tùy chọn."""
+    __slots__ = ('key', 'title', 'fields', 'text', 'level')
+
+    def __init__(self, key, title, fields=(), text=None, level=2):
+        self.key = key
+        self.title = title
+        self.fields = tuple(fields)
+        self.text = text
+        self.level = level   # 1 = tiêu đề chủ đề (báo cáo nhiều chủ đề), 2 = phần thường
+
+    def __repr__(self):
+        return f"<Section {self.key}: {self.title!r}>"
+
+
+# ===== Các phần của báo cáo =====
+
+def _palace_section(key, label, info):
+    return Section(key, f"THÔNG TIN {label} (Cung {info['so']})", (
+        ("Quái", info['ten']), ("Ngũ Hành", info['hanh']), ("Sao", info['sao']),
+        ("Môn", info['cua']), ("Thần", info['than']),
+        ("Can", f"{info['can_thien']}/{info['can_dia']}"),
+    ))
+
+
+def iter_topic_sections(chart_data, topic, chu_idx=None, khach_idx=1, now=None):
+    """Các phần báo cáo của một chủ đề, tạo lần lượt (generator)."""
+    now = now or datetime.now()
+    analyzed = analyze_chart(chart_data, topic)
+    chu = analyzed.palace_info(chu_idx or analyzed.chu_palace)
+    khach = analyzed.palace_info(khach_idx)
+    yield _palace_section("chu", "CUNG CHỦ", chu)
+    yield _palace_section("khach", "CUNG KHÁCH", khach)
+    mqh = tinh_ngu_hanh_sinh_khac(chu['hanh'], khach['hanh'])
+    yield Section("mqh", "QUAN HỆ NGŨ HÀNH CHỦ - KHÁCH", (("Chủ - Khách", mqh),))
+    if not USE_SUPER_DETAILED:
+        return
+
+    res_9pp = phan_tich_sieu_chi_tiet_chu_de(topic, chu, khach, now)
+    for key, label in ASPECTS:
+        if key in res_9pp:
+            data = res_9pp[key]
+            yield Section(key, f"{label} - Điểm: {data.get('diem', 'N/A')}/10", (
+                ("Thái độ", data.get('thai_do', 'N/A')), ("Phân tích", data.get('phan_tich', 'N/A')),
+            ))
+    if 'tong_ket' in res_9pp:
+        tong_ket = res_9pp['tong_ket']
+        fields = [("Điểm Tổng Hợp", f"{tong_ket.get('diem_tong', 'N/A')}/100"),
+                  ("Thái Độ", tong_ket.get('thai_do_chung', 'N/A'))]
+        if 'loi_khuyen_tong_quat' in tong_ket:
+            fields.append(("💡 Lời khuyên", tong_ket['loi_khuyen_tong_quat']))
+        yield Section("tong_ket", "🎯 TỔNG KẾT", fields)
+    res_lien_mach = tao_phan_tich_lien_mach(topic, chu, khach, now, res_9pp, mqh)
+    if res_lien_mach:
+        yield Section("lien_mach", "🔗 PHÂN TÍCH LIÊN MẠCH", text=str(res_lien_mach))
+
+
+def iter_report_sections(chart_data, topics, chu_idx=None, khach_idx=1, now=None):
+    """Các phần của báo cáo một hoặc nhiều chủ đề (thêm tiêu đề chủ đề khi có nhiều chủ đề)."""
+    now = now or datetime.now()
+    for topic in topics:
+        if len(topics) > 1:
+            yield Section(f"topic:{topic}", f"CHỦ ĐỀ: {topic}", level=1)
+        yield from iter_topic_sections(chart_data, topic, chu_idx, khach_idx, now)
+
+
+# ===== Ghi file từng phần =====
+
+class TextWriter:
+    def __init__(self, f):
+        self.f = f
+
+    def begin(self, topics, now):
+        self.f.write(f"{TITLE}\nChủ đề: {', '.join(topics)}\nThời gian: {now.strftime('%H:%M - %d/%m/%Y')}\n\n")
+
+    def section(self, section):
+        if section.level == 1:
+            bar = "=" * len(section.title)
+            self.f.write(f"{bar}\n{section.title}\n{bar}\n\n")
+            return
+        self.f.write(f"{section.title}:\n")
+        for label, value in section.fields:
+            self.f.write(f"- {label}: {value}\n")
+        if section.text:
+            self.f.write(f"{section.text}\n")
+        self.f.write("\n")
+
+    def end(self):
+        pass
+
+
+class MarkdownWriter(TextWriter):
+    def begin(self, topics, now):
+        self.f.write(f"# {TITLE}\n\n**Chủ đề:** {', '.join(topics)}  \n"
+                     f"**Thời gian:** {now.strftime('%H:%M - %d/%m/%Y')}\n\n")
+
+    def section(self, section):
+        self.f.write(f"{'#' * (section.level + 1)} {section.title}\n\n")
+        for label, value in section.fields:
+            self.f.write(f"- **{label}:** {value}\n")
+        if section.fields:
+            self.f.write("\n")
+        if section.text:
+            self.f.write(f"{section.text}\n\n")
+
+
+class HtmlWriter(TextWriter):
+    def begin(self, topics, now):
+        e = html.escape
+        self.f.write(f"<!DOCTYPE html>\n<html lang=\"vi\"><head><meta charset=\"utf-8\"><title>{e(TITLE)}</title></head>\n"
+                     f"<body>\n<h1>{e(TITLE)}</h1>\n<p><b>Chủ đề:</b> {e(', '.join(topics))}<br>"
+                     f"<b>Thời gian:</b> {now.strftime('%H:%M - %d/%m/%Y')}</p>\n")
+
+    def section(self, section):
+        e = html.escape
+        tag = f"h{section.level + 1}"
+        self.f.write(f"<section>\n<{tag}>{e(section.title)}</{tag}>\n")
+        if section.fields:
+            self.f.write("<ul>\n" + "".join(f"<li><b>{e(str(label))}:</b> {e(str(value))}</li>\n"
+                                            for label, value in section.fields) + "</ul>\n")
+        if section.text:
+            self.f.write("".join(f"<p>{e(p)}</p>\n" for p in section.text.split("\n\n") if p.strip()))
+        self.f.write("</section>\n")
+
+    def end(self):
+        self.f.write("</body></html>\n")
+
+
+WRITERS = {"txt": TextWriter, "md": MarkdownWriter, "html": HtmlWriter}
+
+
+# ===== Job và pipeline =====
+
+class ReportJob:
+    """Một báo cáo đang dựng / đã dựng. Dùng chung giữa các phiên - chỉ đọc từ bên ngoài."""
+
+    def __init__(self, key, chart_data, topics, chu_idx, khach_idx, directory):
+        self.key = key
+        self.topics = topics
+        self._args = (chart_data, topics, chu_idx, khach_idx)
+        self._paths = {fmt: os.path.join(directory, f"bao_cao{ext}") for fmt, (ext, _) in FORMATS.items()}
+        self._cond = threading.Condition()
+        self.sections = []        # PREVIEW_SECTIONS phần đầu
+        self.count = 0            # tổng số phần đã ghi
+        self.done = False
+        self.error = None
+        self.created = datetime.now()
+        self.elapsed = None
+
+    @property
+    def truncated(self):
+        return self.count > len(self.sections)
+
+    def run(self):
+        start = time.perf_counter()
+        files = []
+        try:
+            files = [open(path, "w", encoding="utf-8") for path in self._paths.values()]
+            writers = [WRITERS[fmt](f) for fmt, f in zip(self._paths, files)]
+            for writer in writers:
+                writer.begin(self.topics, self.created)
+            for section in iter_report_sections(*self._args, now=self.created):
+                for writer, f in zip(writers, files):
+                    writer.section(section)
+                    f.flush()
+                with self._cond:
+                    if len(self.sections) < PREVIEW_SECTIONS:
+                        self.sections.append(section)
+                    self.count += 1
+                    self._cond.notify_all()
+            for writer in writers:
+                writer.end()
+        except Exception as e:
+            self.error = e
+        finally:
+            for f in files:
+                f.close()
+            with self._cond:
+                self.elapsed = time.perf_counter() - start
+                self.done = True
+                self._cond.notify_all()
+
+    def iter_sections(self, timeout=None):
+        """Các phần (trong giới hạn xem trước) theo thứ tự, chờ phần kế tiếp nếu job đang chạy."""
+        i = 0
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                while i >= len(self.sections) and not self.done and i < PREVIEW_SECTIONS:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return
+                    self._cond.wait(remaining)
+                if i >= len(self.sections):
+                    return
+                section = self.sections[i]
+            yield section
+            i += 1
+
+    def wait(self, timeout=None):
+        with self._cond:
+            self._cond.wait_for(lambda: self.done, timeout)
+        return self.done
+
+    def path(self, fmt):
+        """Đường dẫn file của định dạng fmt (chỉ đầy đủ khi done và không có lỗi)."""
+        return self._paths[fmt]
+
+    def available(self):
+        """Đang chạy, hoặc đã xong và file vẫn còn (chưa bị loại / xóa)."""
+        return not self.done or all(os.path.exists(path) for path in self._paths.values())
+
+    def read(self, fmt):
+        """Nội dung file (bytes). FileNotFoundError nếu job đã bị loại khỏi cache."""
+        with open(self._paths[fmt], "rb") as f:
+            return f.read()
+
+    def file_name(self, fmt):
+        stem = self.topics[0] if len(self.topics) == 1 else f"{len(self.topics)}_chu_de"
+        return f"bao_cao_qmdg_{stem}_{self.created.strftime('%Y%m%d_%H%M')}{FORMATS[fmt][0]}"
+
+    def __repr__(self):
+        state = "lỗi" if self.error else ("xong" if self.done else "đang chạy")
+        return f"<ReportJob {', '.join(self.topics)[:40]!r} {self.count} phần, {state}>"
+
+
+class ReportPipeline:
+    """Thread pool + cache LRU các báo cáo theo (bàn, chủ đề, Chủ, Khách)."""
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, max_workers=MAX_WORKERS, cache_size=CACHE_SIZE, directory=None):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="qmdg-report")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._owns_dir = directory is None
+        self._dir = directory or tempfile.mkdtemp(prefix="qmdg_reports_")
+        self._next_id = 0
+        self.cache_size = cache_size
+        self.hits = self.misses = self.evictions = 0
+        atexit.register(self.close)
+
+    @classmethod
+    def get_instance(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def submit(self, chart_data, topics, chu_idx=None, khach_idx=1):
+        """ReportJob cho khóa (bàn, chủ đề, Chủ, Khách): job trong cache hoặc job mới đưa vào pool.
+
+        topics: một chủ đề (str) hoặc danh sách chủ đề; chu_idx=None -> cung Chủ theo
+        Dụng Thần của từng chủ đề.
+        """
+        topics = (topics,) if isinstance(topics, str) else tuple(topics)
+        chart = analyze_chart(chart_data).chart
+        key = (chart, topics, chu_idx, khach_idx)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.error is None and job.available():
+                self._jobs.move_to_end(key)
+                self.hits += 1
+                return job
+            self.misses += 1
+            directory = os.path.join(self._dir, str(self._next_id))
+            self._next_id += 1
+            os.makedirs(directory)
+            job = self._jobs[key] = ReportJob(key, chart, topics, chu_idx, khach_idx, directory)
+            self._evict()
+        self._executor.submit(job.run)
+        return job
+
+    def get(self, chart_data, topics, chu_idx=None, khach_idx=1):
+        """Job đã có (không tạo mới) hoặc None."""
+        topics = (topics,) if isinstance(topics, str) else tuple(topics)
+        with self._lock:
+            return self._jobs.get((analyze_chart(chart_data).chart, topics, chu_idx, khach_idx))
+
+    def _evict(self):
+        # Chỉ bỏ job đã xong: file của job đang chạy vẫn đang được ghi
+        for key in list(self._jobs):
+            if len(self._jobs) <= self.cache_size:
+                break
+            job = self._jobs[key]
+            if job.done:
+                del self._jobs[key]
+                shutil.rmtree(os.path.dirname(job.path("txt")), ignore_errors=True)
+                self.evictions += 1
+
+    def close(self):
+        """Dừng pool (bỏ job chưa chạy) và xóa thư mục tạm do pipeline tạo."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        if self._owns_dir:
+            shutil.rmtree(self._dir, ignore_errors=True)
+        atexit.unregister(self.close)
+
+    def stats(self):
+        with self._lock:
+            running = sum(not job.done for job in self._jobs.values())
+            return {"reports": len(self._jobs), "running": running, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions, "directory": self._dir}
+
+
+def get_report_pipeline():
+    return ReportPipeline.get_instance()
+
+
+if __name__ == "__main__":
+    import tracemalloc
+
+    from qmdg_chart_cache import get_slot_chart
+    from qmdg_data import TOPIC_INTERPRETATIONS
+
+    chart = get_slot_chart(datetime(2024, 5, 17, 10, 30)).get_chart()
+    pipeline = ReportPipeline(cache_size=4)
+
+    start = time.perf_counter()
+    job = pipeline.submit(chart, "Kinh Doanh", None, 1)
+    first = next(job.iter_sections())
+    first_ms = (time.perf_counter() - start) * 1000
+    sections = [first] + list(job.iter_sections())[1:]
+    assert job.wait(10) and job.error is None, job.error
+    print(f"Một chủ đề: phần đầu sau {first_ms:.1f} ms, {len(sections)} phần, xong sau {job.elapsed * 1000:.1f} ms")
+    txt = job.read("txt").decode("utf-8")
+    assert txt.startswith(TITLE) and "THÔNG TIN CUNG CHỦ" in txt and "Chủ - Khách" in txt
+    assert job.read("html").decode("utf-8").rstrip().endswith("</body></html>")
+    assert pipeline.submit(chart, "Kinh Doanh", None, 1) is job and pipeline.hits == 1
+
+    # Báo cáo mọi chủ đề: bộ nhớ giữ lại không tăng theo số phần
+    topics = list(TOPIC_INTERPRETATIONS)
+    tracemalloc.start()
+    start = time.perf_counter()
+    big = pipeline.submit(chart, topics, None, 1)
+    assert big.wait(120) and big.error is None, big.error
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = os.path.getsize(big.path("md"))
+    assert big.count == len(topics) * (len(sections) + 1) and len(big.sections) == PREVIEW_SECTIONS
+    assert len(list(big.iter_sections())) == PREVIEW_SECTIONS
+    print(f"{len(topics)} chủ đề: {big.count} phần, {elapsed:.2f} s, file MD {size / 1024:.0f} KB, "
+          f"bộ nhớ đỉnh {peak / 1024:.0f} KB")
+
+    for i in range(6):
+        pipeline.submit(chart, f"Chủ đề {i}", 2, 3).wait(10)
+    assert pipeline.stats()["reports"] <= 4 and not os.path.exists(big.path("md"))
+    evicted = job
+    try:
+        evicted.read("txt")
+        raise AssertionError("job bị loại vẫn còn file")
+    except FileNotFoundError:
+        assert pipeline.submit(chart, "Kinh Doanh", None, 1) is not evicted   # nơi gọi submit lại
+    print(f"✅ {pipeline.stats()}")
+    pipeline.close()
+    assert not os.path.exists(pipeline.stats()["directory"])
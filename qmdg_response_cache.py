@@ -0,0 +1,134 @@
+# qmdg_response_cache.py - Slot-keyed response cache (cache JSON theo khung giờ, ETag)
+"""
+Cache các response JSON chỉ phụ thuộc vào khung giờ (/api/calculate, /api/initial-data):
+body đã serialize (bytes) + ETag mạnh (sha1 của body) được giữ tới hết khung rồi tự hết
+hạn, nên client poll liên tục chỉ tốn một lần tra dict và thường chỉ nhận 304.
+
+Khóa do nơi gọi chọn, nên chứa thời điểm bắt đầu khung (vd. ("calculate", slot.start,
+topic)); mục hết hạn tại slot.end bị bỏ khi tra cứu và khi dọn LRU.
+Không phụ thuộc Flask: web/server.py lo If-None-Match / 304 / Cache-Control.
+
+    from qmdg_response_cache import get_response_cache
+    entry = get_response_cache().get_or_build(key, slot.end, lambda: body_bytes)
+    entry.body, entry.etag, entry.max_age(now)
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+DEFAULT_MAXSIZE = 256
+
+
+class CachedResponse:
+    """Body + ETag của một khóa. Dùng chung giữa các request - không sửa tại chỗ."""
+    __slots__ = ('body', 'etag', 'expires')
+
+    def __init__(self, body, expires):
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()[:20]
+        self.expires = expires
+
+    def max_age(self, now=None):
+        """Số giây còn lại tới khi hết khung (>= 0)."""
+        return max(0, int((self.expires - (now or datetime.now())).total_seconds()))
+
+
+class ResponseCache:
+    """Cache LRU (khóa -> CachedResponse), mục tự hết hạn tại expires."""
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = self.misses = self.expired = 0
+
+    @classmethod
+    def get_instance(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def get(self, key, now=None):
+        now = now or datetime.now()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if now >= entry.expires:
+                del self._entries[key]
+                self.expired += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def get_or_build(self, key, expires, build, now=None):
+        """Mục còn hạn của key, hoặc build() -> bytes được cache tới expires.
+
+        build() chạy ngoài khóa; lỗi của build() không được cache.
+        """
+        entry = self.get(key, now)
+        if entry is not None:
+            return entry
+        entry = CachedResponse(build(), expires)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._purge(now or datetime.now())
+        return entry
+
+    def _purge(self, now):
+        for key in [k for k, e in self._entries.items() if now >= e.expires]:
+            del self._entries[key]
+            self.expired += 1
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits,
+                    "misses": self.misses, "expired": self.expired}
+
+
+def get_response_cache():
+    return ResponseCache.get_instance()
+
+
+if __name__ == "__main__":
+    import json
+    import time
+    from datetime import timedelta
+
+    cache = ResponseCache(maxsize=3)
+    t0 = datetime(2024, 5, 17, 9, 0)
+    calls = []
+
+    def build(n):
+        calls.append(n)
+        return json.dumps({"slot": n}).encode()
+
+    a = cache.get_or_build(("calc", t0), t0 + timedelta(hours=2), lambda: build(1), now=t0)
+    b = cache.get_or_build(("calc", t0), t0 + timedelta(hours=2), lambda: build(2), now=t0 + timedelta(minutes=119))
+    assert a is b and calls == [1] and a.max_age(t0 + timedelta(minutes=119)) == 60
+    assert cache.get(("calc", t0), now=t0 + timedelta(hours=2)) is None   # hết khung
+    c = cache.get_or_build(("calc", t0), t0 + timedelta(hours=4), lambda: build(1), now=t0 + timedelta(hours=2))
+    assert c.etag == a.etag and c is not a   # cùng body -> cùng ETag
+    for i in range(5):
+        cache.get_or_build(("x", i), t0 + timedelta(hours=2), lambda: build(i), now=t0)
+    assert len(cache._entries) == 3
+
+    n = 100000
+    start = time.perf_counter()
+    for _ in range(n):
+        cache.get(("x", 4), now=t0)
+    print(f"✅ {cache.stats()}, tra cứu {(time.perf_counter() - start) / n * 1e6:.2f} µs/lần")
@@ -0,0 +1,287 @@
+"""
+SNAPSHOT TRI THỨC (Knowledge Snapshot)
+
+Lưu dữ liệu đã trộn (KY_MON_DATA sau custom + Excel + nâng cao) thành một file nhị phân
+để lần import sau chỉ cần đọc lại thay vì parse lại các file JSON nguồn.
+
+Định dạng file:
+    MAGIC (8 byte) | độ dài header (uint32 LE) | header (marshal) | các section (marshal)
+    header = {"version", "python", "sources", "sections": {tên: (offset, độ dài)}}
+
+Snapshot chỉ được dùng khi mọi file nguồn còn khớp: cùng kích thước + mtime, hoặc
+cùng SHA-1 nếu chỉ mtime đổi (vd. PyInstaller giải nén lại). marshal phụ thuộc phiên
+bản Python nên phiên bản Python cũng nằm trong header.
+
+load_snapshot_lazy() trả về LazySections: section chỉ được giải mã khi truy cập lần đầu,
+section_stats() cho biết kích thước trên đĩa và bộ nhớ đã dùng của từng section.
+
+Dòng lệnh:
+    python qmdg_snapshot.py --build     # Dựng lại snapshot từ nguồn
+    python qmdg_snapshot.py             # Thông tin snapshot hiện tại
+"""
+import marshal
+import os
+import sys
+import tempfile
+import threading
+from collections.abc import MutableMapping
+
+SNAPSHOT_MAGIC = b"QMDGSNAP"
+SNAPSHOT_VERSION = 1
+_PYTHON_TAG = "%d.%d" % sys.version_info[:2]
+
+
+def _sha1(path):
+    import hashlib  # chỉ cần khi dựng snapshot hoặc mtime đã đổi
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def source_signature(paths):
+    """{đường dẫn: (size, mtime_ns, sha1)} - None cho file không tồn tại."""
+    signature = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+            signature[path] = (st.st_size, st.st_mtime_ns, _sha1(path))
+        except OSError:
+            signature[path] = None
+    return signature
+
+
+def _source_matches(path, recorded):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return recorded is None
+    if recorded is None:
+        return False
+    size, mtime_ns, sha1 = recorded
+    if st.st_size != size:
+        return False
+    if st.st_mtime_ns == mtime_ns:
+        return True
+    try:
+        return _sha1(path) == sha1
+    except OSError:
+        return False
+
+
+def save_snapshot(path, sections, sources):
+    """
+    Ghi snapshot. sections: {tên: dữ liệu marshal được}, sources: danh sách file nguồn.
+    Returns:
+        bool: False nếu không ghi được (thư mục chỉ đọc, dữ liệu không marshal được...).
+    """
+    try:
+        blobs = [(name, marshal.dumps(value)) for name, value in sections.items()]
+    except ValueError:
+        return False
+    index, offset = {}, 0
+    for name, blob in blobs:
+        index[name] = (offset, len(blob))
+        offset += len(blob)
+    header = marshal.dumps({
+        "version": SNAPSHOT_VERSION,
+        "python": _PYTHON_TAG,
+        "sources": source_signature(sources),
+        "sections": index,
+    })
+    tmp_path = None
+    try:
+        # File tạm riêng cho mỗi lần ghi: hai tiến trình dựng cùng lúc không ghi chung một file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                        prefix=os.path.basename(path) + ".", suffix=".tmp")
+        os.chmod(tmp_path, 0o644)  # mkstemp tạo file 0600
+        with os.fdopen(fd, 'wb') as f:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(len(header).to_bytes(4, 'little'))
+            f.write(header)
+            for _, blob in blobs:
+                f.write(blob)
+        os.replace(tmp_path, path)
+    except OSError:
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        return False
+    return True
+
+
+def read_header(path):
+    """(header, vị trí bắt đầu section, bytes của file) hoặc None nếu file không hợp lệ."""
+    try:
+        with open(path, 'rb') as f:
+            raw = f.read()
+    except OSError:
+        return None
+    if raw[:8] != SNAPSHOT_MAGIC or len(raw) < 12:
+        return None
+    header_len = int.from_bytes(raw[8:12], 'little')
+    try:
+        header = marshal.loads(raw[12:12 + header_len])
+    except (EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(header, dict) or header.get("version") != SNAPSHOT_VERSION \
+            or header.get("python") != _PYTHON_TAG:
+        return None
+    return header, 12 + header_len, raw
+
+
+def _open_snapshot(path, sources):
+    """(header, base, raw) nếu snapshot còn khớp với các file nguồn, ngược lại None."""
+    parsed = read_header(path)
+    if parsed is None:
+        return None
+    header, base, raw = parsed
+    recorded = header.get("sources", {})
+    if set(recorded) != set(sources) or not all(_source_matches(p, recorded[p]) for p in sources):
+        return None
+    return parsed
+
+
+def load_snapshot(path, sources):
+    """
+    Nạp snapshot nếu còn khớp với các file nguồn.
+    Returns:
+        dict: {tên section: dữ liệu} hoặc None (không có / hỏng / đã cũ).
+    """
+    parsed = _open_snapshot(path, sources)
+    if parsed is None:
+        return None
+    header, base, raw = parsed
+    try:
+        return {name: marshal.loads(raw[base + offset:base + offset + length])
+                for name, (offset, length) in header["sections"].items()}
+    except (EOFError, ValueError, TypeError):
+        return None
+
+
+def load_snapshot_lazy(path, sources):
+    """Như load_snapshot nhưng trả về LazySections (giải mã từng section khi cần)."""
+    parsed = _open_snapshot(path, sources)
+    if parsed is None:
+        return None
+    header, base, raw = parsed
+    return LazySections(raw, {name: (base + offset, length)
+                              for name, (offset, length) in header["sections"].items()})
+
+
+def deep_sizeof(obj):
+    """Ước lượng bộ nhớ (byte) của một cấu trúc dict/list/str lồng nhau."""
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return total
+
+
+_UNLOADED = object()
+
+
+class LazySections(MutableMapping):
+    """
+    Mapping các section của snapshot: giá trị được giải mã (marshal) ở lần truy cập đầu tiên.
+    Ghi / xóa hoạt động như dict; section đã nạp là đối tượng thường (sửa tại chỗ được).
+    """
+
+    def __init__(self, raw=b"", index=None, loaded=None):
+        self._raw = raw
+        self._index = dict(index or {})
+        self._data = {name: _UNLOADED for name in self._index}
+        self._data.update(loaded or {})
+        self._lock = threading.Lock()
+
+    def _load(self, key):
+        with self._lock:
+            value = self._data[key]
+            if value is _UNLOADED:
+                offset, length = self._index[key]
+                value = marshal.loads(self._raw[offset:offset + length])
+                self._data[key] = value
+                if _UNLOADED not in self._data.values():
+                    self._raw = b""  # mọi section đã nạp: bỏ bộ đệm
+            return value
+
+    def __getitem__(self, key):
+        value = self._data[key]
+        if value is _UNLOADED:
+            value = self._load(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._data[key] = value
+
+    def __delitem__(self, key):
+        del self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def is_loaded(self, key):
+        return self._data.get(key, _UNLOADED) is not _UNLOADED
+
+    def section_stats(self):
+        """{tên: {"loaded", "snapshot_bytes", "memory_bytes"}} - memory_bytes = 0 khi chưa nạp."""
+        stats = {}
+        for name, value in self._data.items():
+            loaded = value is not _UNLOADED
+            stats[name] = {
+                "loaded": loaded,
+                "snapshot_bytes": self._index.get(name, (0, 0))[1],
+                "memory_bytes": deep_sizeof(value) if loaded else 0,
+            }
+        return stats
+
+    def __repr__(self):
+        loaded = sum(1 for v in self._data.values() if v is not _UNLOADED)
+        return f"<LazySections {loaded}/{len(self._data)} section đã nạp>"
+
+
+if __name__ == "__main__":
+    import time
+
+    if "--build" in sys.argv:
+        os.environ["QMDG_REBUILD_SNAPSHOT"] = "1"
+    start = time.perf_counter()
+    import qmdg_data
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    parsed = read_header(qmdg_data.KNOWLEDGE_SNAPSHOT_FILE)
+    if parsed is None:
+        print(f"❌ Không có snapshot hợp lệ tại {qmdg_data.KNOWLEDGE_SNAPSHOT_FILE}")
+        sys.exit(1)
+    header, _, raw = parsed
+    print(f"✅ {qmdg_data.KNOWLEDGE_SNAPSHOT_FILE}: {len(raw) / 1024:.0f} KiB, "
+          f"{len(header['sections'])} section, import qmdg_data {elapsed_ms:.1f} ms")
+    for source, sig in header["sources"].items():
+        print(f"   {'✓' if sig else '-'} {source}")
+
+    data = qmdg_data.KY_MON_DATA
+    if hasattr(data, "section_stats"):
+        for name in list(data):
+            data[name]
+        print(f"{'section':<30}{'snapshot KiB':>14}{'bộ nhớ KiB':>14}")
+        for name, st in data.section_stats().items():
+            print(f"{name:<30}{st['snapshot_bytes'] / 1024:>14.1f}{st['memory_bytes'] / 1024:>14.1f}")
@@ -0,0 +1,253 @@
+# qmdg_solar_terms.py - Solar terms (Tiết Khí) from the apparent solar longitude
+"""
+24 Tiết Khí tính từ kinh độ biểu kiến của Mặt Trời (VSOP87 rút gọn theo Meeus,
+kèm chương động, quang sai và ΔT), quy về giờ Việt Nam (UTC+7).
+
+Mỗi năm được tính một lần (24 mốc, chính xác tới phút) và giữ trong bảng LRU.
+Mốc được lưu dưới dạng "minute key" = date.toordinal() * 1440 + phút trong ngày,
+nên tra cứu "tiết hiện tại" chỉ là một lần bisect trên 24 số nguyên.
+
+Phạm vi hỗ trợ: 1900 - 2100.
+"""
+import math
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+TIET_KHI_LIST = [
+    "Đông Chí", "Tiểu Hàn", "Đại Hàn", "Lập Xuân", "Vũ Thủy", "Kinh Trập",
+    "Xuân Phân", "Thanh Minh", "Cốc Vũ", "Lập Hạ", "Tiểu Mãn", "Mang Chủng",
+    "Hạ Chí", "Tiểu Thử", "Đại Thử", "Lập Thu", "Xử Thử", "Bạch Lộ",
+    "Thu Phân", "Hàn Lộ", "Sương Giáng", "Lập Đông", "Tiểu Tuyết", "Đại Tuyết"
+]
+
+MIN_YEAR, MAX_YEAR = 1900, 2100
+TZ_OFFSET_HOURS = 7  # Giờ Việt Nam
+YEAR_CACHE_SIZE = 256  # Đủ cho toàn bộ 1900-2100, vẫn có giới hạn
+
+MINUTES_PER_DAY = 1440
+# Julian Day of 0001-01-01 00:00 (proleptic Gregorian ordinal 1)
+_JD_ORDINAL_1 = 1721425.5
+_J2000 = 2451545.0
+_TROPICAL_YEAR = 365.242189
+
+# VSOP87 Earth heliocentric longitude, abridged (Meeus, Astronomical Algorithms, App. III)
+# (A, B, C): A * cos(B + C * tau), units 1e-8 rad
+_L0 = (
+    (175347046, 0, 0), (3341656, 4.6692568, 6283.07585), (34894, 4.6261, 12566.1517),
+    (3497, 2.7441, 5753.3849), (3418, 2.8289, 3.5231), (3136, 3.6277, 77713.7715),
+    (2676, 4.4181, 7860.4194), (2343, 6.1352, 3930.2097), (1324, 0.7425, 11506.7698),
+    (1273, 2.0371, 529.691), (1199, 1.1096, 1577.3435), (990, 5.233, 5884.927),
+    (902, 2.045, 26.298), (857, 3.508, 398.149), (780, 1.179, 5223.694),
+    (753, 2.533, 5507.553), (505, 4.583, 18849.228), (492, 4.205, 775.523),
+    (357, 2.92, 0.067), (317, 5.849, 11790.629), (284, 1.899, 796.298),
+    (271, 0.315, 10977.079), (243, 0.345, 5486.778), (206, 4.806, 2544.314),
+    (205, 1.869, 5573.143), (202, 2.458, 6069.777), (156, 0.833, 213.299),
+    (132, 3.411, 2942.463), (126, 1.083, 20.775), (115, 0.645, 0.98),
+    (103, 0.636, 4694.003), (102, 0.976, 15720.839), (102, 4.267, 7.114),
+    (99, 6.21, 2146.17), (98, 0.68, 155.42), (86, 5.98, 161000.69),
+    (85, 1.3, 6275.96), (85, 3.67, 71430.7), (80, 1.81, 17260.15),
+    (79, 3.04, 12036.46), (75, 1.76, 5088.63), (74, 3.5, 3154.69),
+    (74, 4.68, 801.82), (70, 0.83, 9437.76), (62, 3.98, 8827.39),
+    (61, 1.82, 7084.9), (57, 2.78, 6286.6), (56, 4.39, 14143.5),
+    (56, 3.47, 6279.55), (52, 0.19, 12139.55), (52, 1.33, 1748.02),
+    (51, 0.28, 5856.48), (49, 0.49, 1194.45), (41, 5.37, 8429.24),
+    (41, 2.4, 19651.05), (39, 6.17, 10447.39), (37, 6.04, 10213.29),
+    (37, 2.57, 1059.38), (36, 1.71, 2352.87), (36, 1.78, 6812.77),
+    (33, 0.59, 17789.85), (30, 0.44, 83996.85), (30, 2.74, 1349.87),
+    (25, 3.16, 4690.48),
+)
+_L1 = (
+    (628331966747, 0, 0), (206059, 2.678235, 6283.07585), (4303, 2.6351, 12566.1517),
+    (425, 1.59, 3.523), (119, 5.796, 26.298), (109, 2.966, 1577.344),
+    (93, 2.59, 18849.23), (72, 1.14, 529.69), (68, 1.87, 398.15),
+    (67, 4.41, 5507.55), (59, 2.89, 5223.69), (56, 2.17, 155.42),
+    (45, 0.4, 796.3), (36, 0.47, 775.52), (29, 2.65, 7.11),
+    (21, 5.34, 0.98), (19, 1.85, 5486.78), (19, 4.97, 213.3),
+    (17, 2.99, 6275.96), (16, 0.03, 2544.31), (16, 1.43, 2146.17),
+    (15, 1.21, 10977.08), (12, 2.83, 1748.02), (12, 3.26, 5088.63),
+    (12, 5.27, 1194.45), (12, 2.08, 4694.0), (11, 0.77, 553.57),
+    (10, 1.3, 6286.6), (10, 4.24, 1349.87), (9, 2.7, 242.73),
+    (9, 5.64, 951.72), (8, 5.3, 2352.87), (6, 2.65, 9437.76),
+    (6, 4.67, 4690.48),
+)
+_L2 = (
+    (52919, 0, 0), (8720, 1.0721, 6283.0758), (309, 0.867, 12566.152),
+    (27, 0.05, 3.52), (16, 5.19, 26.3), (16, 3.68, 155.42),
+    (10, 0.76, 18849.23), (9, 2.06, 77713.77), (7, 0.83, 775.52),
+    (5, 4.66, 1577.34), (4, 1.03, 7.11), (4, 3.44, 5573.14),
+    (3, 5.14, 796.3), (3, 6.05, 5507.55), (3, 1.19, 242.73),
+    (3, 6.12, 529.69), (3, 0.31, 398.15), (3, 2.28, 553.57),
+    (2, 4.38, 5223.69), (2, 3.75, 0.98),
+)
+_L3 = (
+    (289, 5.844, 6283.076), (35, 0, 0), (17, 5.49, 12566.15),
+    (3, 5.2, 155.42), (1, 4.72, 3.52), (1, 5.3, 18849.23),
+    (1, 5.97, 242.73),
+)
+_L4 = ((114, 3.142, 0), (8, 4.13, 6283.08), (1, 3.84, 12566.15))
+_L5 = ((1, 3.14, 0),)
+_L_SERIES = (_L0, _L1, _L2, _L3, _L4, _L5)
+
+# Earth radius vector (AU), main terms only - used for the aberration term
+_R0 = (
+    (100013989, 0, 0), (1670700, 3.0984635, 6283.07585), (13956, 3.05525, 12566.1517),
+    (3084, 5.1985, 77713.7715), (1628, 1.1739, 5753.3849), (1576, 2.8469, 7860.4194),
+)
+_R1 = ((103019, 1.10749, 6283.07585), (1721, 1.0644, 12566.1517))
+_R2 = ((4359, 5.7846, 6283.0758),)
+_R_SERIES = (_R0, _R1, _R2)
+
+
+def _vsop(series, tau):
+    total = 0.0
+    power = 1.0
+    for terms in series:
+        total += power * sum(a * math.cos(b + c * tau) for a, b, c in terms)
+        power *= tau
+    return total * 1e-8
+
+
+def delta_t(year):
+    """ΔT = TT - UT (seconds), Espenak & Meeus polynomials for 1900-2150."""
+    y = year
+    if y < 1920:
+        t = y - 1900
+        return -2.79 + 1.494119 * t - 0.0598939 * t ** 2 + 0.0061966 * t ** 3 - 0.000197 * t ** 4
+    if y < 1941:
+        t = y - 1920
+        return 21.20 + 0.84493 * t - 0.076100 * t ** 2 + 0.0020936 * t ** 3
+    if y < 1961:
+        t = y - 1950
+        return 29.07 + 0.407 * t - t ** 2 / 233 + t ** 3 / 2547
+    if y < 1986:
+        t = y - 1975
+        return 45.45 + 1.067 * t - t ** 2 / 260 - t ** 3 / 718
+    if y < 2005:
+        t = y - 2000
+        return (63.86 + 0.3345 * t - 0.060374 * t ** 2 + 0.0017275 * t ** 3
+                + 0.000651814 * t ** 4 + 0.00002373599 * t ** 5)
+    if y < 2050:
+        t = y - 2000
+        return 62.92 + 0.32217 * t + 0.005589 * t ** 2
+    return -20 + 32 * ((y - 1820) / 100) ** 2 - 0.5628 * (2150 - y)
+
+
+def solar_longitude(jde):
+    """Apparent geocentric longitude of the Sun (degrees, 0-360) at Julian Ephemeris Day jde."""
+    tau = (jde - _J2000) / 365250.0
+    t = tau * 10.0
+    earth_l = _vsop(_L_SERIES, tau)
+    radius = _vsop(_R_SERIES, tau)
+
+    theta = math.degrees(earth_l) + 180.0
+    # FK5 correction
+    theta += -0.09033 / 3600.0
+    # Nutation in longitude
+    omega = math.radians(125.04452 - 1934.136261 * t)
+    l_sun = math.radians(280.4665 + 36000.7698 * t)
+    l_moon = math.radians(218.3165 + 481267.8813 * t)
+    nutation = (-17.20 * math.sin(omega) - 1.32 * math.sin(2 * l_sun)
+                - 0.23 * math.sin(2 * l_moon) + 0.21 * math.sin(2 * omega))
+    # Aberration
+    aberration = -20.4898 / radius
+    return (theta + (nutation + aberration) / 3600.0) % 360.0
+
+
+def term_longitude(term_idx):
+    """Solar longitude (degrees) at which a term of TIET_KHI_LIST begins (Đông Chí = 270°)."""
+    return (270 + 15 * term_idx) % 360
+
+
+def _check_year(year):
+    if not MIN_YEAR <= year <= MAX_YEAR:
+        raise ValueError(f"Năm {year} nằm ngoài phạm vi Tiết Khí hỗ trợ ({MIN_YEAR}-{MAX_YEAR})")
+
+
+def solar_term_jd(year, term_idx):
+    """Local (UTC+7) Julian Day of a term's start within a civil year."""
+    target = term_longitude(term_idx)
+    # Days from the March equinox (Tiểu Hàn..Kinh Trập fall before it in the civil year)
+    offset = target if target < 285 else target - 360
+    jd_march = _JD_ORDINAL_1 - 1 + datetime(year, 3, 20, 12).toordinal() + 0.5
+    dt_days = delta_t(year) / 86400.0
+    jde = jd_march + offset / 360.0 * _TROPICAL_YEAR + dt_days
+    for _ in range(10):
+        diff = (target - solar_longitude(jde) + 180.0) % 360.0 - 180.0
+        jde += diff / 360.0 * _TROPICAL_YEAR
+        if abs(diff) < 1e-7:
+            break
+    return jde - dt_days + TZ_OFFSET_HOURS / 24.0
+
+
+def _jd_to_minute_key(jd_local):
+    """Round a local Julian Day up to the next whole minute key."""
+    return math.ceil((jd_local - _JD_ORDINAL_1 + 1) * MINUTES_PER_DAY - 1e-6)
+
+
+@lru_cache(maxsize=YEAR_CACHE_SIZE)
+def year_term_table(year):
+    """
+    24 mốc Tiết Khí của năm dương lịch, theo thứ tự thời gian (Tiểu Hàn -> Đông Chí).
+    Returns:
+        tuple: (minute_keys, term_indices) - hai tuple 24 phần tử.
+    """
+    _check_year(year)
+    order = list(range(1, 24)) + [0]
+    keys = tuple(_jd_to_minute_key(solar_term_jd(year, i)) for i in order)
+    return keys, tuple(order)
+
+
+def minute_key(dt):
+    """Minute key of a datetime (wall clock; seconds are ignored)."""
+    return dt.toordinal() * MINUTES_PER_DAY + dt.hour * 60 + dt.minute
+
+
+def minute_key_to_datetime(key):
+    """Inverse of minute_key()."""
+    day_ord, minute = divmod(key, MINUTES_PER_DAY)
+    return datetime.fromordinal(day_ord) + timedelta(minutes=minute)
+
+
+def term_index(key, year):
+    """Index into TIET_KHI_LIST of the term in force at a minute key within a civil year."""
+    keys, indices = year_term_table(year)
+    pos = bisect_right(keys, key) - 1
+    return indices[pos] if pos >= 0 else 0  # Trước Tiểu Hàn: vẫn là Đông Chí năm trước
+
+
+def current_term(dt):
+    """
+    Tiết Khí đang hiệu lực tại một thời điểm (giờ Việt Nam).
+    Returns:
+        tuple: (tên tiết khí, index trong TIET_KHI_LIST)
+    """
+    idx = term_index(minute_key(dt), dt.year)
+    return TIET_KHI_LIST[idx], idx
+
+
+def next_term_boundary(key, year):
+    """
+    Minute key of the next term start strictly after key (may be in the following year).
+    After the last term of MAX_YEAR this is the end of the supported range.
+    """
+    keys, _ = year_term_table(year)
+    pos = bisect_right(keys, key)
+    if pos < len(keys):
+        return keys[pos]
+    if year >= MAX_YEAR:
+        return datetime(MAX_YEAR + 1, 1, 1).toordinal() * MINUTES_PER_DAY
+    return year_term_table(year + 1)[0][0]
+
+
+def get_term_boundaries(year):
+    """Danh sách (datetime bắt đầu, tên tiết khí) của một năm, theo thứ tự thời gian."""
+    keys, indices = year_term_table(year)
+    return [(minute_key_to_datetime(k), TIET_KHI_LIST[i]) for k, i in zip(keys, indices)]
+
+
+if __name__ == "__main__":
+    import sys
+    year = int(sys.argv[1]) if len(sys.argv) > 1 else datetime.now().year
+    for start, name in get_term_boundaries(year):
+        print(f"{start:%Y-%m-%d %H:%M}  {name}")
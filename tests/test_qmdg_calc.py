@@ -0,0 +1,16 @@
+"""Kernel calculate_qmdg_params phải khớp bản tham chiếu (cách tính cũ) trên 50.000 khung giờ."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from qmdg_calc import _calculate_qmdg_params_reference, calculate_qmdg_params
+
+SAMPLE = [datetime(2024, 1, 1) + timedelta(minutes=37 * i) for i in range(50000)]
+CHUNK = 5000
+
+
+@pytest.mark.parametrize("start", range(0, len(SAMPLE), CHUNK))
+def test_kernel_matches_reference(start):
+    bad = [dt for dt in SAMPLE[start:start + CHUNK]
+           if calculate_qmdg_params(dt) != _calculate_qmdg_params_reference(dt)]
+    assert not bad, f"{len(bad)} khung sai khác, ví dụ: {bad[:5]}"
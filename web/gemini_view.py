@@ -0,0 +1,101 @@
+"""
+View Hỏi AI (Gemini / Free AI). Tách khỏi app.py; helper AI đã được khởi tạo ở sidebar
+(st.session_state.gemini_helper).
+"""
+import streamlit as st
+
+
+def render_gemini_view(gemini_available, free_ai_available):
+    ai_name = st.session_state.get('ai_type', 'AI Assistant')
+    st.markdown(f"## 🤖 HỎI {ai_name.upper()} VỀ KỲ MÔN ĐỘN GIÁP")
+    
+    if not gemini_available and not free_ai_available:
+        st.error("❌ Không có module AI nào khả dụng.")
+        st.stop()
+    
+    # Check if API key is configured
+    if 'gemini_helper' not in st.session_state:
+        st.error("❌ Không thể kết nối với máy chủ AI. Vui lòng thử lại sau.")
+        st.stop()
+    
+    st.success(f"✅ {ai_name} đã sẵn sàng! Hãy đặt câu hỏi bên dưới.")
+    
+    # Topic selection for context
+    st.markdown("### 🎯 Chọn Chủ Đề (Tùy chọn)")
+    st.caption("Chọn chủ đề để AI có ngữ cảnh tốt hơn, hoặc để trống để hỏi chung")
+    
+    col_topic1, col_topic2 = st.columns([3, 1])
+    
+    with col_topic1:
+        selected_topic_ai = st.selectbox(
+            "Chủ đề:",
+            ["Không chọn (Hỏi chung)"] + st.session_state.all_topics_full,
+            key="ai_topic_select"
+        )
+    
+    with col_topic2:
+        st.markdown("<br>", unsafe_allow_html=True)
+        if st.button("🔮 Lập Bàn Nhanh", use_container_width=True):
+            # Quick chart calculation for context
+            try:
+                from datetime import datetime
+                now = datetime.now()
+                from qmdg_calculator import tinh_ky_mon_don_gian
+                st.session_state.ai_chart_data = tinh_ky_mon_don_gian(now.year, now.month, now.day, now.hour)
+                st.success("✅ Đã lập bàn!")
+            except Exception as e:
+                st.error(f"Lỗi: {e}")
+    
+    st.markdown("---")
+    
+    # Question input area
+    st.markdown("### ✍️ Câu Hỏi Của Bạn")
+    user_question = st.text_area(
+        "Nhập câu hỏi:",
+        placeholder="Ví dụ: Tôi muốn biết về ý nghĩa của Thiên Tâm Tinh trong Kỳ Môn Độn Giáp?",
+        height=150,
+        key="ai_free_question"
+    )
+    
+    if st.button(f"🤖 Hỏi {ai_name}", type="primary", use_container_width=True, key="ask_gemini_btn"):
+        if user_question:
+            with st.spinner(f"🤖 {ai_name} đang suy nghĩ..."):
+                try:
+                    # Sử dụng phương thức answer_question thống nhất cho cả 2 helper
+                    response_text = st.session_state.gemini_helper.answer_question(
+                        user_question, 
+                        topic=selected_topic_ai if selected_topic_ai != 'Không chọn (Hỏi chung)' else 'Chung'
+                    )
+                    
+                    # Display response in a nice panel
+                    st.markdown("---")
+                    st.markdown(f"### 🤖 Trả Lời Từ {ai_name}")
+                    st.markdown(f"""
+                    <div style="
+                        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+                        padding: 20px;
+                        border-radius: 15px;
+                        color: white;
+                        margin: 10px 0;
+                    ">
+                        <h4 style="color: white; margin-top: 0;">💡 Câu Hỏi</h4>
+                        <p style="font-size: 16px;">{user_question}</p>
+                    </div>
+                    """, unsafe_allow_html=True)
+                    
+                    st.markdown(f"""
+                    <div style="
+                        background: #f8f9fa;
+                        padding: 20px;
+                        border-radius: 15px;
+                        border-left: 5px solid #667eea;
+                        margin: 10px 0;
+                    ">
+                        {response_text.replace(chr(10), '<br>')}
+                    </div>
+                    """, unsafe_allow_html=True)
+                    
+                except Exception as e:
+                    st.error(f"❌ Lỗi: {str(e)}")
+        else:
+            st.warning("⚠️ Vui lòng nhập câu hỏi")
@@ -0,0 +1,705 @@
+"""
+View Kỳ Môn Độn Giáp (9 cung, phân tích chủ đề, so sánh Chủ/Khách).
+Tách khỏi app.py: các module phân tích chỉ được import khi view được chọn lần đầu.
+Lưới 9 cung, các phần so sánh, báo cáo kỹ thuật và hỏi đáp AI là các st.fragment chạy lại độc lập.
+"""
+import streamlit as st
+
+from qmdg_data import (
+    CUNG_NGU_HANH,
+    QUAI_TUONG,
+    TOPIC_INTERPRETATIONS,
+    tinh_ngu_hanh_sinh_khac,
+)
+from qmdg_analysis import analyze_chart
+
+try:
+    from qmdg_detailed_analysis import phan_tich_chi_tiet_cung, so_sanh_chi_tiet_chu_khach
+    USE_DETAILED_ANALYSIS = True
+except ImportError:
+    USE_DETAILED_ANALYSIS = False
+
+try:
+    from dung_than_200_chu_de_day_du import (
+        DUNG_THAN_200_CHU_DE,
+        hien_thi_dung_than_200,
+        lay_dung_than_200
+    )
+    USE_200_TOPICS = True
+except ImportError:
+    USE_200_TOPICS = False
+
+# Dụng Thần, Vượng/Tướng theo mùa, Cát/Hung, Lục Thân... của 9 cung: qmdg_analysis
+
+
+def _analyze(chart, selected_topic):
+    """AnalyzedChart của bàn đang xem theo chủ đề + Lục Thân chọn ở sidebar (cache dùng chung)."""
+    return analyze_chart(
+        chart, selected_topic,
+        rel_type=st.session_state.get('selected_doi_tuong', "🧑 Bản thân"),
+        custom_stem=st.session_state.get('target_stem_name_custom', "Giáp"),
+    )
+
+
+# Mỗi panel dưới đây là một st.fragment: bấm nút / đổi ô chọn trong panel chỉ chạy lại
+# panel đó (bàn lấy từ session_state, AnalyzedChart từ cache) thay vì dựng lại cả trang.
+
+@st.fragment
+def _palace_grid(chart, selected_topic):
+    """Lưới 9 cung + chi tiết từng cung (nút AI trong cung chỉ chạy lại lưới)."""
+    st.markdown("### 📊 Chín Cung Kỳ Môn")
+
+    analyzed = _analyze(chart, selected_topic)
+
+    # Palace layout: 4-9-2 / 3-5-7 / 8-1-6
+    palace_layout = [
+        [4, 9, 2],
+        [3, 5, 7],
+        [8, 1, 6]
+    ]
+
+    # Ảnh nền Ngũ Hành: một khối CSS (WebP đã nén, dựng một lần) cho cả 9 cung
+    from web.palace_assets import palace_bg_class, palace_css
+    st.markdown(palace_css(), unsafe_allow_html=True)
+
+    # Create 3x3 grid
+    for row in palace_layout:
+        cols = st.columns(3)
+        for col_idx, palace_num in enumerate(row):
+            with cols[col_idx]:
+                # Mọi thuộc tính suy ra của cung: tính một lần trong AnalyzedChart
+                palace = analyzed.palace(palace_num)
+                sao, cua, than = palace.star, palace.door, palace.deity
+                can_thien, can_dia = palace.can_thien_display, palace.can_dia
+                hanh = palace.hanh
+                has_dung_than = palace.has_dung_than
+                strength, strength_color = palace.strength, palace.strength_color
+                door_data, cat_hung = palace.door_info, palace.cat_hung
+
+                # Background: class CSS của palace_css() (không nhúng ảnh vào từng thẻ)
+                bg_class = palace_bg_class(hanh)
+
+                border_width = "4px" if has_dung_than else "1px"
+                colors = palace.colors
+
+                # Status Badge
+                status_badge = f'<span class="status-badge" style="background: {strength_color}; color: white;">{strength}</span>'
+
+                p_full_name = palace.title
+
+                # --- RENDER PALACE CARD (PRECISION LABELS & BALANCED ALIGNMENT) ---
+                palace_html = f"""<div class="palace-3d animated-panel">
+<div class="palace-inner {bg_class} {'dung-than-active' if has_dung_than else ''}" style="border: {border_width} solid {palace.border_color}; min-height: 280px; position: relative;">
+<div class="glass-overlay"></div>
+<div class="palace-header-row"><span class="palace-title">{p_full_name}</span>{status_badge}</div>
+<div class="palace-grid-container" style="position: relative; height: 180px; padding: 0;">
+<!-- Top Row: Thần & Thiên Can -->
+<div class="grid-cell top-left" style="position: absolute; top: 2px; left: 6px; color: {colors['deity']};"><span class="qmdg-label">Thần</span>{than}</div>
+<div class="grid-cell top-right" style="position: absolute; top: 2px; right: 6px; color: {colors['can_thien']};">{can_thien}</div>
+
+<!-- Mid Row: Tinh (Sao) -->
+<div class="grid-cell mid-left" style="position: absolute; top: 45%; left: 6px; transform: translateY(-50%); color: {colors['star']};"><span class="qmdg-label">Tinh</span>{sao.replace('Thiên ', '')}</div>
+
+<!-- Bot Row: Môn & Địa Can -->
+<div class="grid-cell bot-center" style="position: absolute; bottom: -8px; left: 50%; transform: translateX(-50%); color: {colors['door']};"><span class="qmdg-label">Môn</span>{cua.replace(' Môn', '')}</div>
+<div class="grid-cell bot-right" style="position: absolute; bottom: -8px; right: 6px; color: {colors['can_dia']};">{can_dia}</div>
+</div>
+<div class="palace-footer-markers" style="font-size: 3rem; margin-top: 15px; line-height: 1;">
+{f'<span style="color:#64748b;">⚪</span>' if palace.khong_vong else ''}
+{f'<span style="color:#f59e0b;">🐎</span>' if palace.dich_ma else ''}
+</div></div></div>"""
+                st.markdown(palace_html, unsafe_allow_html=True)
+
+
+                # Expander for detailed analysis
+                with st.expander(f"📖 Chi tiết Cung {palace_num}"):
+                    # Basic info
+                    col_info1, col_info2 = st.columns(2)
+                    with col_info1:
+                        st.markdown(f"**Quái tượng:** {QUAI_TUONG.get(palace_num, 'N/A')}")
+                        st.markdown(f"**Ngũ hành:** {hanh}")
+                    with col_info2:
+                        st.markdown(f"**Cát/Hung:** {cat_hung}")
+                        st.markdown(f"**Trạng thái:** {strength}")
+
+                    st.markdown("---")
+
+                    topic_data = TOPIC_INTERPRETATIONS.get(selected_topic, {})
+                    dung_than_list = analyzed.dung_than
+                    rel_label = analyzed.relation_label
+
+                    # --- PART 1: RELATIONSHIP ANALYSIS (SUBJECT VS OBJECT) ---
+                    st.subheader("🎯 Phân tích Tương tác Dụng Thần")
+
+                    # Cung Bản thân (Can Ngày trên Địa Bàn) -> cung đang xem
+                    subject_palace = analyzed.subject_palace
+                    object_palace = palace_num
+                    s_hanh = CUNG_NGU_HANH.get(subject_palace, "Thổ")
+                    o_hanh = CUNG_NGU_HANH.get(object_palace, "Thổ")
+                    interaction = palace.interaction
+
+                    # Visual Interaction Report
+                    col_rel1, col_rel2, col_rel3 = st.columns([2, 1, 2])
+                    with col_rel1:
+                        st.info(f"👤 **Bản thân**\n\nCung {subject_palace} ({s_hanh})")
+                    with col_rel2:
+                        st.markdown(f"<div style='text-align:center; font-size:1.5rem; padding-top:10px;'>{'➡️' if 'Sinh' in interaction else '⚔️' if 'Khắc' in interaction else '🤝'}</div>", unsafe_allow_html=True)
+                        st.caption(f"<div style='text-align:center;'>{interaction}</div>", unsafe_allow_html=True)
+                    with col_rel3:
+                        st.success(f"🎯 **Đối tượng**\n\nCung {object_palace} ({o_hanh})")
+
+                    st.write(f"**Kết luận nhanh:** {rel_label} và Đối tượng có mối quan hệ **{interaction}**. " + 
+                             ("Đây là dấu hiệu thuận lợi, năng lượng lưu thông." if "Sinh" in interaction or "Bình" in interaction 
+                              else "Cần thận trọng vì có sự xung đột hoặc cản trở về mặt năng lượng."))
+
+                    st.markdown("---")
+
+                    # --- PART 2: TECHNICAL ELEMENT LOOKUPS ---
+                    st.subheader("🔍 Chi tiết Tác động của Thần - Tinh - Môn")
+
+                    # Create a clean table for lookups
+                    tech_data = {
+                        "Yếu tố": ["Thần (Deity)", "Tinh (Star)", "Môn (Door)", "Thiên Can", "Địa Can"],
+                        "Tên": [than, sao, cua, can_thien, can_dia],
+                        "Ý nghĩa & Tác động": list(palace.meanings)
+                    }
+                    st.table(tech_data)
+
+                    # --- PART 3: TOPIC-SPECIFIC ANALYSIS ---
+                    st.subheader(f"💡 Phân tích theo chủ đề: {selected_topic}")
+                    topic_detail = topic_data.get("Diễn_Giải", "Đang cập nhật...")
+                    st.write(topic_detail)
+
+                    # Combinatorial Analysis (Cách Cục)
+                    combo_info = palace.cach_cuc
+                    if combo_info:
+                        st.warning(f"🎭 **Cách cục: {combo_info['Tên_Cách_Cục']} ({combo_info['Cát_Hung']})**")
+                        st.write(combo_info['Luận_Giải'])
+
+                    # Final Advice
+                    st.markdown("---")
+                    st.info("**Lời khuyên từ chuyên gia:** Dựa trên sự tương tác giữa Bản thân và Dụng Thần, bạn nên chủ động nắm bắt cơ hội nếu có sự tương sinh, hoặc lùi lại quan sát nếu gặp sự hình khắc mạnh.")
+
+                    # Dụng Thần + Lục Thân có mặt trong cung
+                    found_dt = palace.dung_than_found
+
+                    dt_html = f"""
+                            <div class="dung-than-box">
+                                <div style="font-weight: 800; color: #92400e; margin-bottom: 5px;">📍 PHÂN TÍCH DỤNG THẦN</div>
+                                <div style="font-size: 14px;"><strong>Chủ đề:</strong> {selected_topic}</div>
+                                <div style="font-size: 14px;"><strong>Dụng thần cần tìm:</strong> {', '.join(dung_than_list)}</div>
+                                <div style="margin-top: 10px; font-weight: 700; color: {'#15803d' if found_dt else '#b91c1c'};">
+                                    {f'✅ Tìm thấy: {", ".join(found_dt)}' if found_dt else '⚠️ Cung này không chứa Dụng Thần chính'}
+                                </div>
+                            </div>
+                            """
+                    st.markdown(dt_html, unsafe_allow_html=True)
+
+                    # UNIFIED AI EXPERT BUTTON
+                    if 'gemini_helper' in st.session_state:
+                        st.markdown("---")
+                        if st.button(f"🧙 AI Chuyên Gia Tư Vấn Cung {palace_num}", key=f"ai_palace_expert_btn_{palace_num}", use_container_width=True, type="primary"):
+                            with st.spinner(f"Chuyên gia AI đang phân tích Cung {palace_num} theo chủ đề {selected_topic}..."):
+                                analysis = st.session_state.gemini_helper.analyze_palace(
+                                    {**palace.palace_data(), "can_thien": can_thien},
+                                    selected_topic
+                                )
+                                st.markdown(f"""
+                                        <div class="interpret-box">
+                                            <div class="interpret-title">🔮 Phân Tích Chuyên Sâu Cung {palace_num}</div>
+                                            <div style="font-size: 15px; line-height: 1.6; color: #1e293b;">{analysis}</div>
+                                        </div>
+                                        """, unsafe_allow_html=True)
+
+                    # Static descriptions (Keep it brief)
+                    st.markdown("---")
+                    star_data = palace.star_info
+                    if star_data:
+                        st.markdown(f"**⭐ Sao {sao}:** {star_data.get('Tính_Chất', 'N/A')}")
+
+                    if door_data:
+                        st.markdown(f"**🚪 Cửa {cua}:** {door_data.get('Tính_Chất', 'N/A')}")
+
+                    deity_data = palace.deity_info
+                    if deity_data:
+                        st.markdown(f"**🛡️ Thần {than}:** {deity_data.get('Tính_Chất', 'N/A')}")
+
+                    # Stem combination
+                    combination_data = palace.cach_cuc or {}
+                    if combination_data:
+                        col_can_1, col_can_2 = st.columns([3, 1])
+                        with col_can_1:
+                            st.markdown(f"**🔗 {can_thien}/{can_dia}:** {combination_data.get('Luận_Giải', 'Chưa có nội dung')}")
+                            st.caption(f"Cát/Hung: {combination_data.get('Cát_Hung', 'Bình')}")
+                        with col_can_2:
+                            show_can_exp = False
+                            if 'gemini_helper' in st.session_state:
+                                if st.button(f"🔮 Giải Thích", key=f"ai_can_{palace_num}_{can_thien}_{can_dia}", use_container_width=True):
+                                    show_can_exp = True
+
+                        # Move explanation out of columns for full width
+                        if show_can_exp:
+                            with st.spinner(f"AI đang phân giải tổ hợp {can_thien}/{can_dia}..."):
+                                explanation = st.session_state.gemini_helper.explain_element('stem', f"{can_thien}/{can_dia}")
+                                st.markdown(f"""
+                                        <div class="interpret-box">
+                                            <div class="interpret-title">📖 Luận Giải Cặp Can: {can_thien}/{can_dia}</div>
+                                            <div style="font-size: 15px; line-height: 1.6; color: #1e293b;">{explanation}</div>
+                                        </div>
+                                        """, unsafe_allow_html=True)
+
+                    st.markdown("---")
+                    # End of Palace Details
+
+
+@st.fragment
+def _ai_summary_panel(selected_topic):
+    """Báo cáo tổng hợp AI từ 9 cung."""
+    if st.session_state.chart_data and 'gemini_helper' in st.session_state:
+        st.markdown("---")
+        st.markdown("### 🏆 BÁO CÁO TỔNG HỢP CHUYÊN SÂU (AI)")
+
+        with st.container():
+            st.markdown(f"""
+                <div class="ai-response-panel animated-panel">
+                    <div style="font-size: 1.2rem; font-weight: 800; color: #1e3a8a; margin-bottom: 15px;">
+                        🤖 KẾT LUẬN CUỐI CÙNG TỪ AI
+                    </div>
+                </div>
+                """, unsafe_allow_html=True)
+
+            if st.button("🔮 Bắt đầu Phân Tích Tổng Hợp", type="primary", use_container_width=True):
+                with st.spinner("AI đang tổng hợp dữ liệu từ 9 cung và tính toán kết quả..."):
+                    # Prepare data for AI
+                    chart = st.session_state.chart_data
+                    topic = selected_topic
+
+                    # Just send all palaces as they are rich data
+                    key_palaces_info = _analyze(chart, topic).summary_lines()
+
+                    rel_type = st.session_state.get('selected_doi_tuong', "🧑 Bản thân")
+                    custom_stem = st.session_state.get('target_stem_name_custom', "N/A")
+
+                    prompt = f"""
+                        Bạn là một đại sư Kỳ Môn Độn Giáp. Hãy phân tích TỔNG HỢP cho chủ đề: {topic}.
+                        
+                        **Ngữ cảnh Đối tượng (Lục Thân):** {rel_type} (Can mục tiêu: {custom_stem if 'người lạ' in rel_type.lower() else 'Theo Lục Thân'})
+                        
+                        **Dữ liệu 9 Cung:**
+                        {chr(10).join(key_palaces_info)}
+                        
+                        **Trạng thái Can:** Giờ: {chart['can_gio']}, Ngày: {chart['can_ngay']}, Tháng: {chart.get('can_thang')}, Năm: {chart.get('can_nam')}
+                        
+                        **YÊU CẦU PHÂN TÍCH CHUYÊN SÂU:**
+                        1. Xác định Cung Bản Thân (người hỏi) và Cung Sự Việc (Kết quả) hoặc Cung Đối tác/Người mua (Can Giờ).
+                        2. Phân tích sự tương tác Sinh-Khắc-Hợp-Xung giữa các Cung này.
+                        3. Đánh giá sức mạnh của các Sao và Cửa tại các cung trọng yếu.
+                        4. **KẾT LUẬN DỨT KHOÁT:** Có đạt được mục đích không? (Bán được không? Giá tốt không? Kết hôn được không?...).
+                        5. **LỜI KHUYÊN HÀNH ĐỘNG:** Cần làm gì ngay bây giờ? 
+                        
+                        Viết theo phong cách chuyên nghiệp, thực tế, không dùng thuật ngữ quá khó hiểu nếu không giải thích kèm theo.
+                        """
+
+                    try:
+                        # Use comprehensive_analysis if suitable, or answer_question for flexibility
+                        final_report = st.session_state.gemini_helper.answer_question(prompt)
+                        st.markdown(f"""
+                            <div class="interpret-box" style="background: white; border-top: 5px solid #1e3a8a;">
+                                {final_report}
+                            </div>
+                            """, unsafe_allow_html=True)
+                    except Exception as e:
+                        st.error(f"Lỗi phân tích: {e}")
+
+
+# khach_cung_select / show_comparison được đọc ở nhiều fragment (so sánh, so sánh nhanh,
+# báo cáo kỹ thuật): đổi chúng thì chạy lại cả trang thay vì chỉ fragment chứa widget.
+# st.rerun() không dùng được trong callback nên callback chỉ đặt cờ, fragment gọi rerun.
+def _request_full_rerun():
+    st.session_state._km_full_rerun = True
+
+
+def _show_comparison():
+    if not st.session_state.get('show_comparison'):
+        st.session_state.show_comparison = True
+        _request_full_rerun()
+
+
+def _full_rerun_if_requested():
+    if st.session_state.pop('_km_full_rerun', False):
+        st.rerun(scope="app")
+
+
+@st.fragment
+def _comparison_panel(selected_topic):
+    """So sánh Chủ - Khách theo cung chọn."""
+    _full_rerun_if_requested()
+    if st.session_state.chart_data:
+        st.markdown("---")
+        st.markdown("### ⚖️ SO SÁNH CHỦ - KHÁCH")
+
+        col1, col2, col3 = st.columns([2, 2, 1])
+
+        with col1:
+            chu_cung = st.selectbox(
+                "Chọn Cung Chủ (Bản thân):",
+                options=[1, 2, 3, 4, 5, 6, 7, 8, 9],
+                format_func=lambda x: f"Cung {x} - {QUAI_TUONG.get(x, '')}",
+                key="chu_cung_select"
+            )
+
+        with col2:
+            khach_cung = st.selectbox(
+                "Chọn Cung Khách (Đối phương):",
+                options=[1, 2, 3, 4, 5, 6, 7, 8, 9],
+                index=1,
+                format_func=lambda x: f"Cung {x} - {QUAI_TUONG.get(x, '')}",
+                key="khach_cung_select",
+                on_change=_request_full_rerun
+            )
+
+        with col3:
+            st.markdown("<br>", unsafe_allow_html=True)
+            st.button("🔍 So Sánh", type="primary", use_container_width=True, on_click=_show_comparison)
+
+        # Display comparison results
+        if st.session_state.get('show_comparison', False):
+            try:
+                chart = st.session_state.chart_data
+
+                analyzed = _analyze(chart, selected_topic)
+                get_palace_info = analyzed.palace_info
+
+                chu = get_palace_info(chu_cung)
+                khach = get_palace_info(khach_cung)
+
+                # Use detailed comparison if available
+                try:
+                    if USE_DETAILED_ANALYSIS:
+                        comparison_result = so_sanh_chi_tiet_chu_khach(selected_topic, chu, khach)
+
+                        st.markdown("#### 📊 KẾT QUẢ SO SÁNH CHI TIẾT")
+
+                        # Display palace info side by side
+                        col_chu, col_khach = st.columns(2)
+
+                        with col_chu:
+                            st.markdown(f"**🏠 CUNG CHỦ - Cung {chu['so']} ({chu['ten']})**")
+                            st.write(f"- Ngũ Hành: {chu['hanh']}")
+                            st.write(f"- ⭐ Tinh: {chu['sao']}")
+                            st.write(f"- 🚪 Môn: {chu['cua']}")
+
+                        with col_khach:
+                            st.markdown(f"**👥 CUNG KHÁCH - Cung {khach['so']} ({khach['ten']})**")
+                            st.write(f"- Ngũ Hành: {khach['hanh']}")
+                            st.write(f"- ⭐ Tinh: {khach['sao']}")
+                            st.write(f"- 🚪 Môn: {khach['cua']}")
+
+                        # Element interaction
+                        st.markdown("---")
+                        interaction = comparison_result.get('ngu_hanh_sinh_khac', 'N/A')
+                        st.info(f"**Phân tích Ngũ Hành:** {interaction}")
+
+                        # AI Comparison Analysis
+                        if 'gemini_helper' in st.session_state:
+                            if st.button("🤖 AI Phân Tích So Sánh", key="ai_compare_btn", type="primary"):
+                                with st.spinner("🤖 AI đang phân tích..."):
+                                    prompt = f"So sánh Cung {chu['so']} ({chu['hanh']}) và Cung {khach['so']} ({khach['hanh']}) cho chủ đề {selected_topic}."
+                                    analysis = st.session_state.gemini_helper.answer_question(prompt)
+                                    st.markdown(analysis)
+                    else:
+                        raise ImportError
+                except (ImportError, NameError, Exception):
+                    # Fallback to simple comparison
+                    st.markdown("#### 📊 KẾT QUẢ SO SÁNH CƠ BẢN")
+
+                    col_chu, col_khach = st.columns(2)
+
+                    with col_chu:
+                        st.markdown(f"**🏠 Cung Chủ {chu['so']}**")
+                        st.write(f"Ngũ Hành: {chu['hanh']}")
+                        st.write(f"Sao: {chu['sao']}")
+                        st.write(f"Môn: {chu['cua']}")
+
+                    with col_khach:
+                        st.markdown(f"**👥 Cung Khách {khach['so']}**")
+                        st.write(f"Ngũ Hành: {khach['hanh']}")
+                        st.write(f"Sao: {khach['sao']}")
+                        st.write(f"Môn: {khach['cua']}")
+
+                    # Simple element interaction
+                    interaction = tinh_ngu_hanh_sinh_khac(chu['hanh'], khach['hanh'])
+                    st.info(f"**Ngũ hành:** {interaction}")
+
+            except Exception as e:
+                st.error(f"Lỗi so sánh: {e}")
+
+
+@st.fragment
+def _expert_report_panel(selected_topic):
+    """Kết luận tổng hợp từ AI theo Dụng Thần + Lục Thân."""
+    if 'gemini_helper' in st.session_state:
+        with st.container():
+            st.markdown("### 🎯 KẾT LUẬN TỔNG HỢP TỪ AI (Dụng Thần)")
+            if st.button("🔴 ⭐ BẮT ĐẦU LUẬN GIẢI CHUYÊN SÂU (ƯU TIÊN ĐỌC TRƯỚC) ⭐ 🔴", type="primary", key="ai_final_report_btn", use_container_width=True):
+                with st.spinner("🤖 AI đang thực hiện luận giải trọng tâm..."):
+                    try:
+                        # Get Dụng Thần info from the best available source
+                        dung_than_list = []
+                        if 'USE_200_TOPICS' in globals() and USE_200_TOPICS:
+                            dung_than_list = lay_dung_than_200(selected_topic)
+
+                        if not dung_than_list:
+                            topic_data = TOPIC_INTERPRETATIONS.get(selected_topic, {})
+                            dung_than_list = topic_data.get("Dụng_Thần", [])
+
+                        # Get interpretation hints
+                        topic_hints = TOPIC_INTERPRETATIONS.get(selected_topic, {}).get("Luận_Giải_Gợi_Ý", "")
+
+                        # Resolve Dynamic Actors (Chủ - Khách)
+                        # The Subject (Chủ thể/Người thực hiện) is the person we are asking ABOUT.
+                        rel_type = st.session_state.get('selected_doi_tuong', "🧑 Bản thân")
+                        subj_stem = st.session_state.chart_data.get('can_ngay') # Default to Self
+                        obj_stem = st.session_state.chart_data.get('can_gio') # Default to General Matter/Other Party
+
+                        role_label = "Bản thân bạn"
+                        if "Anh chị em" in rel_type:
+                            subj_stem = st.session_state.chart_data.get('can_thang')
+                            role_label = "Anh chị bạn"
+                        elif "Bố mẹ" in rel_type:
+                            subj_stem = st.session_state.chart_data.get('can_nam')
+                            role_label = "Bố mẹ bạn"
+                        elif "Con cái" in rel_type:
+                            subj_stem = st.session_state.chart_data.get('can_gio')
+                            role_label = "Con cái bạn"
+                        elif "Người lạ" in rel_type:
+                            custom_val = st.session_state.get('target_stem_name_custom', "Giáp")
+                            if "Không rõ" not in custom_val:
+                                subj_stem = custom_val
+                            role_label = "Đối phương (Người ngoài)"
+
+                        # Process Dụng Thần labels for better context
+                        enriched_dung_than = []
+                        for dt in dung_than_list:
+                            if dt == "Sinh Môn": enriched_dung_than.append("Sinh Môn (Lợi nhuận/Ngôi nhà)")
+                            elif dt == "Khai Môn": enriched_dung_than.append("Khai Môn (Công việc/Sự khởi đầu)")
+                            else: enriched_dung_than.append(dt)
+
+                        analysis = st.session_state.gemini_helper.comprehensive_analysis(
+                            st.session_state.chart_data,
+                            selected_topic,
+                            enriched_dung_than,
+                            topic_hints,
+                            subj_stem=subj_stem,
+                            obj_stem=obj_stem,
+                            subj_label=role_label
+                        )
+
+                        # 2. GENERATE QUICK ACTIONS (High-impact tips)
+                        quick_actions = st.session_state.gemini_helper.generate_quick_actions(analysis, selected_topic)
+
+                        # Display Quick Actions First
+                        st.markdown(f"""
+                                <div class="action-card">
+                                    <div class="action-title">🚀 HÀNH ĐỘNG NHANH CẦN LÀM NGAY</div>
+                                    {chr(10).join([f'<div class="action-item">{line.strip("- ").strip()}</div>' for line in quick_actions.strip().split(chr(10)) if line.strip()])}
+                                </div>
+                                """, unsafe_allow_html=True)
+
+                        # Display Detailed Analysis
+                        st.markdown(f'<div class="expert-box">{analysis}</div>', unsafe_allow_html=True)
+                    except Exception as e:
+                        st.error(f"❌ Lỗi AI: {str(e)}")
+
+
+@st.fragment
+def _quick_comparison_panel(selected_topic):
+    """So sánh nhanh Bản thân (Can Thiên Bàn = Can Ngày) với cung Khách."""
+    _full_rerun_if_requested()
+    st.markdown("---")
+    st.markdown("### ⚖️ SO SÁNH CHỦ - KHÁCH")
+    col_comp1, col_comp2 = st.columns([3, 1])
+    with col_comp1:
+        st.caption("Phân tích tương quan giữa Bản thân (Chủ) và Đối tượng/Sự việc (Khách)")
+    with col_comp2:
+        st.button("📊 Chạy So Sánh", key="run_comp_btn", use_container_width=True, on_click=_show_comparison)
+
+    if st.session_state.get('show_comparison'):
+        # Extract comparison logic (Previously at line 1200 area)
+        try:
+            chart = st.session_state.chart_data
+            analyzed = _analyze(chart, selected_topic)
+            chu_idx = analyzed.chu_palace
+            khach_idx = st.session_state.get('khach_cung_select', 1)
+            get_mini_info = analyzed.palace_info
+
+            c_chu = get_mini_info(chu_idx)
+            c_khach = get_mini_info(khach_idx)
+
+            c1, c2 = st.columns(2)
+            with c1: st.info(f"**Bản Thân (Cung {chu_idx}):** {c_chu['sao']} - {c_chu['cua']}")
+            with c2: st.warning(f"**Đối Tượng (Cung {khach_idx}):** {c_khach['sao']} - {c_khach['cua']}")
+
+            res_mqh = tinh_ngu_hanh_sinh_khac(c_chu['hanh'], c_khach['hanh'])
+            st.success(f"**Tương tác Ngũ Hành:** {res_mqh}")
+
+            if st.button("🤖 AI Phân Tích So Sánh", key="ai_compare_details"):
+                with st.spinner("AI đang so sánh..."):
+                    p = f"So sánh chi tiết Cung {chu_idx} và Cung {khach_idx} cho {selected_topic}."
+                    ans = st.session_state.gemini_helper.answer_question(p)
+                    st.info(ans)
+        except Exception as e:
+            st.error(f"Lỗi: {e}")
+
+
+def _render_report_section(section):
+    if section.level == 1:
+        st.markdown(f"### {section.title}")
+        return
+    with st.expander(section.title, expanded=section.key in ("chu", "khach", "mqh", "tong_ket", "lien_mach")):
+        for label, value in section.fields:
+            st.write(f"**{label}:** {value}")
+        if section.text:
+            st.write(section.text)
+
+
+@st.fragment
+def _technical_report_panel(selected_topic):
+    """Báo cáo kỹ thuật: dựng nền trong qmdg_report, hiển thị từng phần khi xong."""
+    from qmdg_report import FORMATS, USE_SUPER_DETAILED, get_report_pipeline
+
+    st.markdown("---")
+    with st.expander("🔍 Xem Phân Tích Kỹ Thuật (Kỳ Môn + Mai Hoa + Lục Hào)"):
+        chart = st.session_state.chart_data
+        analyzed = _analyze(chart, selected_topic)
+        key = (analyzed.chu_palace, st.session_state.get('khach_cung_select', 1))
+        pipeline = get_report_pipeline()
+        if st.button("🚀 Tạo Báo Cáo Kỹ Thuật", key="tech_report_btn"):
+            job = pipeline.submit(chart, selected_topic, *key)
+        else:
+            # Báo cáo đã có (phiên này hoặc phiên khác) cho cùng bàn / chủ đề / Chủ / Khách
+            job = pipeline.get(chart, selected_topic, *key)
+        if job is None:
+            return
+        if not job.available():
+            # Job đã bị loại khỏi cache (file đã xóa): dựng lại
+            job = pipeline.submit(chart, selected_topic, *key)
+        if not USE_SUPER_DETAILED:
+            st.caption("Chưa có super_detailed_analysis: báo cáo chỉ gồm Cung Chủ / Khách và quan hệ Ngũ Hành.")
+
+        st.markdown("#### 📊 BÁO CÁO KỸ THUẬT")
+        try:
+            _render_report_job(job, FORMATS)
+        except FileNotFoundError:
+            # Job bị loại khỏi cache đúng lúc đang hiển thị: dựng lại, lần chạy sau sẽ thấy job mới
+            pipeline.submit(chart, selected_topic, *key)
+            st.info("Báo cáo vừa được làm mới khỏi bộ nhớ đệm - đang tạo lại, bấm lại sau giây lát.")
+
+
+def _render_report_job(job, formats):
+    """Các phần của job (chờ từng phần nếu đang chạy) rồi nút tải file."""
+    for section in job.iter_sections():
+        _render_report_section(section)
+    if job.error is not None:
+        st.error(f"Lỗi tạo báo cáo: {job.error}")
+        return
+    files = {fmt: job.read(fmt) for fmt in formats}
+    if job.truncated:
+        st.caption(f"Đang hiển thị {len(job.sections)}/{job.count} phần - xem đầy đủ trong file tải về.")
+
+    st.success(f"✅ Đã tạo báo cáo tổng hợp! ({job.count} phần, {job.elapsed * 1000:.0f} ms)")
+    for col, (fmt, (ext, mime)) in zip(st.columns(len(formats)), formats.items()):
+        with col:
+            st.download_button(
+                label=f"📥 Tải Báo Cáo ({fmt.upper()})",
+                data=files[fmt],
+                file_name=job.file_name(fmt),
+                mime=mime,
+                key=f"tech_report_dl_{fmt}"
+            )
+
+
+@st.fragment
+def _ai_qa_panel(selected_topic):
+    """Hỏi đáp AI về bàn đang xem."""
+    st.markdown("---")
+    st.markdown("### ❓ HỎI AI VỀ BÀN NÀY")
+    user_question = st.text_area("Đặt câu hỏi cho Chuyên gia AI:", placeholder="Hỏi thêm về thời điểm, cách hóa giải...", key="ai_q_input")
+    if st.button("🤖 Gửi Câu Hỏi", key="ai_ask_final"):
+        if user_question:
+            with st.spinner("Đang trả lời..."):
+                a = st.session_state.gemini_helper.answer_question(user_question, st.session_state.chart_data, selected_topic)
+                st.info(a)
+
+
+def render_ky_mon_view(params, selected_datetime, selected_topic):
+    st.markdown("## 🔮 BẢNG KỲ MÔN ĐỘN GIÁP")
+    
+    if params:
+        # Calculate full chart
+        try:
+            # Calculate boards (Chart 64 byte, chart_data là dict view chỉ đọc, lấy từ cache theo khung giờ)
+            from qmdg_chart_cache import get_slot_chart
+            
+            # Store in session state
+            if 'chart_data' not in st.session_state:
+                st.session_state.chart_data = {}
+            
+            st.session_state.chart_data = get_slot_chart(selected_datetime).get_chart()
+            
+        except Exception as e:
+            st.error(f"Lỗi tính toán bàn: {e}")
+            st.session_state.chart_data = None
+        
+        # Display 9 palaces grid with full information
+        if st.session_state.chart_data:
+            _palace_grid(st.session_state.chart_data, selected_topic)
+        
+        # Display Dụng Thần info
+        st.markdown("---")
+        st.markdown("### 🎯 THÔNG TIN DỤNG THẦN")
+        
+        topic_data = TOPIC_INTERPRETATIONS.get(selected_topic, {})
+        dung_than_list = topic_data.get("Dụng_Thần", [])
+        luan_giai = topic_data.get("Luận_Giải_Gợi_Ý", "")
+        
+        if dung_than_list:
+            st.success(f"**Dụng Thần cần xem:** {', '.join(dung_than_list)}")
+        
+        if luan_giai:
+            st.info(f"**Gợi ý luận giải:** {luan_giai}")
+        
+        # Display detailed Dụng Thần from 200+ database
+        if USE_200_TOPICS:
+            dt_data = lay_dung_than_200(selected_topic)
+            if dt_data and 'ky_mon' in dt_data:
+                km = dt_data['ky_mon']
+                st.markdown("#### 🔮 Dụng Thần Kỳ Môn Chi Tiết")
+                st.write(f"**Dụng Thần:** {km.get('dung_than', 'N/A')}")
+                st.write(f"**Giải thích:** {km.get('giai_thich', 'N/A')}")
+                st.write(f"**Cách xem:** {km.get('cach_xem', 'N/A')}")
+                if 'vi_du' in km:
+                    st.write(f"**Ví dụ:** {km['vi_du']}")
+        
+        # ===== COMPREHENSIVE AI REPORT SECTION =====
+        _ai_summary_panel(selected_topic)
+
+        # ===== PALACE COMPARISON SECTION =====
+        _comparison_panel(selected_topic)
+        
+        # ===== UNIFIED EXPERT ANALYSIS SYSTEM =====
+        if st.session_state.chart_data:
+            st.markdown("---")
+            st.markdown("## 🏆 HỆ THỐNG LUẬN GIẢI TỔNG HỢP CHUYÊN SÂU")
+            
+            # 1. PRIMARY AI EXPERT REPORT (Dụng Thần focus)
+            _expert_report_panel(selected_topic)
+
+            # 2. COMPARISON SECTION (Chủ - Khách Interaction)
+            _quick_comparison_panel(selected_topic)
+
+            # 3. DETAILED TECHNICAL REPORT (Existing multi-layer analysis)
+            _technical_report_panel(selected_topic)
+
+            # 4. AI Q&A SECTION
+            _ai_qa_panel(selected_topic)
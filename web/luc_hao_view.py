@@ -0,0 +1,150 @@
+"""
+View Lục Hào Kinh Dịch. Tách khỏi app.py: luc_hao_kinh_dich chỉ được import khi view
+được chọn lần đầu.
+"""
+import streamlit as st
+
+try:
+    import luc_hao_kinh_dich
+    from luc_hao_kinh_dich import lap_qua_luc_hao
+    USE_LUC_HAO = True
+except ImportError:
+    USE_LUC_HAO = False
+
+
+def render_luc_hao_view(params, selected_datetime, selected_topic):
+    st.markdown("## ☯️ LỤC HÀO KINH DỊCH - CHUYÊN SÂU")
+    
+    if not USE_LUC_HAO:
+        st.error("❌ Module Lục Hào Kinh Dịch không khả dụng.")
+        st.stop()
+    
+    st.markdown(f"### 🎯 Chủ đề: **{selected_topic}**")
+    
+    show_debug_ih = st.checkbox("🐞 Chế độ Kiểm tra Dữ liệu", key="debug_iching_mode")
+    
+    if st.button("🎲 LẬP QUẺ LỤC HÀO PRO", type="primary", use_container_width=True):
+        try:
+            # Use the global selected_datetime
+            dt = selected_datetime
+            can_ngay = params.get('can_ngay', 'Giáp') if params else "Giáp"
+            chi_ngay = params.get('chi_ngay', 'Tý') if params else "Tý"
+            
+            st.session_state.luc_hao_result = lap_qua_luc_hao(
+                dt.year, dt.month, dt.day, dt.hour, 
+                topic=selected_topic, 
+                can_ngay=can_ngay, 
+                chi_ngay=chi_ngay
+            )
+        except Exception as e:
+            st.error(f"Lỗi lập quẻ: {e}")
+
+    if 'luc_hao_result' in st.session_state:
+        res = st.session_state.luc_hao_result
+        st.markdown('<div class="iching-container">', unsafe_allow_html=True)
+        
+        st.markdown(f"""
+        <div class="hex-header-row">
+            <div>
+                <div class="hex-title-pro">{res['ban']['name']}</div>
+                <div class="hex-subtitle">Họ {res['ban']['palace']}</div>
+            </div>
+            <div>
+                <div class="hex-title-pro">{res['bien']['name']}</div>
+                <div class="hex-subtitle">Quẻ Biến</div>
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown(f'<div style="text-align:center; font-weight:800; color:#b91c1c;">QUẺ CHỦ ({res["ban"]["palace"]})</div>', unsafe_allow_html=True)
+            st.markdown('<div class="hex-visual-stack">', unsafe_allow_html=True)
+            moving_hao = res.get('dong_hao', [])
+            detail_map_ban = {d['hao']: d for d in res['ban']['details']}
+            for i, line in enumerate(reversed(res['ban']['lines'])):
+                h_idx = 6 - i
+                is_dong = h_idx in moving_hao
+                cls = "yang-line-pro" if line == 1 else "yin-line-pro"
+                dong_cls = "hao-moving-red" if is_dong else ""
+                d = detail_map_ban.get(h_idx, {})
+                
+                st.markdown('<div class="hao-row-pro">', unsafe_allow_html=True)
+                st.markdown(f'<div class="hao-label-pro">Hào {h_idx}</div>', unsafe_allow_html=True)
+                if line == 1:
+                    st.markdown(f'<div class="hao-line-pro {cls} {dong_cls}"></div>', unsafe_allow_html=True)
+                else:
+                    st.markdown(f'<div class="{cls}"><div class="yin-half-pro {dong_cls}"></div><div class="yin-half-pro {dong_cls}"></div></div>', unsafe_allow_html=True)
+                
+                # Enhanced Label with Debugging
+                s = d.get("strength")
+                val_s = s if s else "N/A"
+                if s:
+                    s_label = f"<span style='color: #15803d;'>{s}</span>" if s in ["Vượng", "Tướng"] else f"<span style='color: #b91c1c;'>{s} (Suy)</span>" if s in ["Hưu", "Tù", "Tử"] else s
+                else:
+                    s_label = "⚠️ Thiếu"
+                
+                lt = d.get("luc_thu", "N/A")
+                m = d.get("marker", "")
+                
+                st.markdown(f'<div class="hao-info-pro">{d.get("luc_than","N/A")} | {d.get("can_chi","N/A")} | {lt} | {s_label} {m}</div>', unsafe_allow_html=True)
+                st.markdown('</div>', unsafe_allow_html=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+            
+            if show_debug_ih:
+                st.write("DEBUG (Hào 1):", res['ban']['details'][0])
+                st.write(f"📁 Module Path: `{luc_hao_kinh_dich.__file__}`")
+                st.write(f"🏷️ Version: `{getattr(luc_hao_kinh_dich, 'VERSION_LH', 'Unknown')}`")
+
+            st.markdown('<table class="hao-table-pro"><tr><th>HÀO</th><th>LỤC THÂN</th><th>CAN CHI</th><th>ĐỊNH VỊ</th></tr>', unsafe_allow_html=True)
+            for d in reversed(res['ban']['details']):
+                h_cls = "highlight-red" if d['is_moving'] else ""
+                marker = d.get('marker', '')
+                
+                st.markdown(f'<tr class="{h_cls}"><td>Hào {d["hao"]} {marker}</td><td>{d["luc_than"]}</td><td>{d["can_chi"]}</td><td>{d.get("loc_ma", "-")}</td></tr>', unsafe_allow_html=True)
+            st.markdown('</table>', unsafe_allow_html=True)
+
+        with col2:
+            st.markdown(f'<div style="text-align:center; font-weight:800; color:#b91c1c;">QUẺ BIẾN</div>', unsafe_allow_html=True)
+            st.markdown('<div class="hex-visual-stack">', unsafe_allow_html=True)
+            detail_map_bien = {d['hao']: d for d in res['bien'].get('details', [])}
+            for i, line in enumerate(reversed(res['bien']['lines'])):
+                h_idx = 6 - i
+                cls = "yang-line-pro" if line == 1 else "yin-line-pro"
+                d = detail_map_bien.get(h_idx, {})
+                
+                st.markdown('<div class="hao-row-pro">', unsafe_allow_html=True)
+                st.markdown(f'<div class="hao-label-pro">Hào {h_idx}</div>', unsafe_allow_html=True)
+                if line == 1:
+                    st.markdown(f'<div class="hao-line-pro {cls}"></div>', unsafe_allow_html=True)
+                else:
+                    st.markdown(f'<div class="{cls}"><div class="yin-half-pro"></div><div class="yin-half-pro"></div></div>', unsafe_allow_html=True)
+                
+                # Enhanced Label (Converted Hexagram usually doesn't show strength/marker in some schools but user asked for it)
+                sb = d.get("strength","")
+                sb_label = f"<span style='color: #15803d;'>{sb}</span>" if sb in ["Vượng", "Tướng"] else f"<span style='color: #b91c1c;'>{sb} (Suy)</span>" if sb in ["Hưu", "Tù", "Tử"] else sb
+                st.markdown(f'<div class="hao-info-pro">{d.get("luc_than","")} | {d.get("can_chi","")} | {d.get("luc_thu","")} | {sb_label} {d.get("marker","")}</div>', unsafe_allow_html=True)
+                st.markdown('</div>', unsafe_allow_html=True)
+            st.markdown('</div>', unsafe_allow_html=True)
+
+            st.markdown('<table class="hao-table-pro"><tr><th>HÀO</th><th>LỤC THÂN</th><th>CAN CHI</th><th>LỤC THÚ</th></tr>', unsafe_allow_html=True)
+            for d in reversed(res['bien']['details']):
+                st.markdown(f'<tr><td>Hào {d["hao"]}</td><td>{d["luc_than"]}</td><td>{d["can_chi"]}</td><td>{d["luc_thu"]}</td></tr>', unsafe_allow_html=True)
+            st.markdown('</table>', unsafe_allow_html=True)
+
+
+        # Expert Footer
+        st.markdown(f"""
+        <div class="status-footer-pro">
+            <span>🔹 {res['the_ung']}</span>
+            <span>📍 Dụng Thần: {res['ban']['details'][2]['luc_than']}</span>
+            <span>📌 {res['conclusion'].split('.')[1]}</span>
+        </div>
+        """, unsafe_allow_html=True)
+        st.markdown('<div class="footer-stamp">Copyright © 2026 KY MON DON GIAP PRO</div>', unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+        
+        if st.button("🤖 AI Luận Quẻ", key="ai_iching_btn"):
+            with st.spinner("AI đang giải mã..."):
+                ans = st.session_state.gemini_helper.analyze_luc_hao(res, selected_topic)
+                st.info(ans)
@@ -0,0 +1,128 @@
+"""
+View Mai Hoa Dịch Số. Tách khỏi app.py: mai_hoa_dich_so chỉ được import khi view
+được chọn lần đầu.
+"""
+import streamlit as st
+
+try:
+    from mai_hoa_dich_so import tinh_qua_theo_thoi_gian, tinh_qua_ngau_nhien, giai_qua
+    USE_MAI_HOA = True
+except ImportError:
+    USE_MAI_HOA = False
+
+
+def render_mai_hoa_view(selected_datetime, selected_topic):
+    st.markdown("## 🌸 MAI HOA DỊCH SỐ - TAM TÀI HỢP NHẤT")
+    
+    if not USE_MAI_HOA:
+        st.error("❌ Module Mai Hoa Dịch Số không khả dụng.")
+        st.stop()
+    
+    st.markdown(f"### 🎯 Chủ đề: **{selected_topic}**")
+    
+    method = st.radio("Phương pháp:", ["Thời gian", "Ngẫu hứng"], horizontal=True, key="mh_method")
+    
+    if st.button("🌸 LẬP QUẺ MAI HOA PRO", type="primary", use_container_width=True):
+        dt = selected_datetime
+        if method == "Thời gian":
+            res = tinh_qua_theo_thoi_gian(dt.year, dt.month, dt.day, dt.hour)
+        else:
+            res = tinh_qua_ngau_nhien()
+        
+        # Add interpretation
+        res['interpretation'] = giai_qua(res, selected_topic)
+        st.session_state.mai_hoa_result = res
+
+    if 'mai_hoa_result' in st.session_state:
+        res = st.session_state.mai_hoa_result
+        st.markdown('<div class="iching-container">', unsafe_allow_html=True)
+        st.markdown(f"""
+        <div class="hex-header-row">
+            <div>
+                <div class="hex-title-pro">{res.get('ten', 'Quẻ Chính')}</div>
+                <div class="hex-subtitle">{res.get('upper_symbol')} / {res.get('lower_symbol')}</div>
+            </div>
+            <div>
+                <div class="hex-title-pro">{res.get('ten_qua_bien', 'BIẾN CÁT TƯỜNG')}</div>
+                <div class="hex-subtitle">Động hào {res.get('dong_hao', '?')}</div>
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        # Display Imagery (Tượng Quẻ)
+        st.markdown(f"""
+        <div class="tuong-que-box">
+            <strong>🖼️ Tượng Quẻ:</strong> {res.get('tuong', 'Đang cập nhật...')} <br>
+            <strong>📖 Ý nghĩa:</strong> {res.get('nghĩa', 'Đang phân tích...')}
+        </div>
+        """, unsafe_allow_html=True)
+
+        # Add visual lines for Mai Hoa
+        col_mh_v1, col_mh_v_ho, col_mh_v2 = st.columns(3)
+        with col_mh_v1:
+            if 'lines' in res:
+                st.markdown(f'<div style="text-align:center; font-weight:800; color:#b91c1c;">QUẺ CHỦ ({res["upper_element"]}/{res["lower_element"]})</div>', unsafe_allow_html=True)
+                st.markdown('<div class="hex-visual-stack">', unsafe_allow_html=True)
+                for i, line in enumerate(reversed(res['lines'])):
+                    h_idx = 6 - i
+                    is_dong = (h_idx == res['dong_hao'])
+                    cls = "yang-line-pro" if line == 1 else "yin-line-pro"
+                    # Apply red color if moving
+                    dong_cls = "hao-moving-red" if is_dong else ""
+                    
+                    st.markdown('<div style="display:flex; align-items:center;">', unsafe_allow_html=True)
+                    st.markdown(f'<div class="hao-label-pro">Hào {h_idx}</div>', unsafe_allow_html=True)
+                    if line == 1:
+                        st.markdown(f'<div class="hao-line-pro {cls} {dong_cls}"></div>', unsafe_allow_html=True)
+                    else:
+                        st.markdown(f'<div class="{cls}"><div class="yin-half-pro {dong_cls}"></div><div class="yin-half-pro {dong_cls}"></div></div>', unsafe_allow_html=True)
+                    st.markdown('</div>', unsafe_allow_html=True)
+                st.markdown('</div>', unsafe_allow_html=True)
+        
+        with col_mh_v_ho:
+            if 'lines_ho' in res:
+                st.markdown(f'<div style="text-align:center; font-weight:800; color:#b91c1c;">HỖ QUẺ</div>', unsafe_allow_html=True)
+                st.markdown(f'<div style="text-align:center; font-size:0.9rem; font-weight:700;">{res.get("ten_ho", "") or "Quẻ Hỗ"}</div>', unsafe_allow_html=True)
+                st.markdown('<div class="hex-visual-stack">', unsafe_allow_html=True)
+                for i, line in enumerate(reversed(res['lines_ho'])):
+                    h_idx = 6 - i
+                    cls = "yang-line-pro" if line == 1 else "yin-line-pro"
+                    st.markdown('<div style="display:flex; align-items:center;">', unsafe_allow_html=True)
+                    st.markdown(f'<div class="hao-label-pro">Hào {h_idx}</div>', unsafe_allow_html=True)
+                    if line == 1:
+                        st.markdown(f'<div class="hao-line-pro {cls}"></div>', unsafe_allow_html=True)
+                    else:
+                        st.markdown(f'<div class="{cls}"><div class="yin-half-pro"></div><div class="yin-half-pro"></div></div>', unsafe_allow_html=True)
+                    st.markdown('</div>', unsafe_allow_html=True)
+                st.markdown('</div>', unsafe_allow_html=True)
+
+        with col_mh_v2:
+            if 'lines_bien' in res:
+                st.markdown(f'<div style="text-align:center; font-weight:800; color:#b91c1c;">QUẺ BIẾN</div>', unsafe_allow_html=True)
+                st.markdown(f'<div style="text-align:center; font-size:0.9rem; font-weight:700;">{res.get("ten_qua_bien", "") or "Quẻ Biến"}</div>', unsafe_allow_html=True)
+                st.markdown('<div class="hex-visual-stack">', unsafe_allow_html=True)
+                for i, line in enumerate(reversed(res['lines_bien'])):
+                    h_idx = 6 - i
+                    cls = "yang-line-pro" if line == 1 else "yin-line-pro"
+                    st.markdown('<div style="display:flex; align-items:center;">', unsafe_allow_html=True)
+                    st.markdown(f'<div class="hao-label-pro">Hào {h_idx}</div>', unsafe_allow_html=True)
+                    if line == 1:
+                        st.markdown(f'<div class="hao-line-pro {cls}"></div>', unsafe_allow_html=True)
+                    else:
+                        st.markdown(f'<div class="{cls}"><div class="yin-half-pro"></div><div class="yin-half-pro"></div></div>', unsafe_allow_html=True)
+                    st.markdown('</div>', unsafe_allow_html=True)
+                st.markdown('</div>', unsafe_allow_html=True)
+        
+        st.info(f"💡 **Luận giải chi tiết:** {res.get('interpretation', 'Đang phân tích...')}")
+
+        if st.button("🤖 AI Luận Quẻ Mai Hoa", key="ai_mai_hoa_btn"):
+            with st.spinner("AI đang giải mã Mai Hoa..."):
+                ans = st.session_state.gemini_helper.analyze_mai_hoa(res, selected_topic)
+                st.markdown(f"""
+                <div class="interpret-box" style="background: white; border-top: 5px solid #b91c1c;">
+                    {ans}
+                </div>
+                """, unsafe_allow_html=True)
+
+        st.markdown('<div class="footer-stamp">Copyright © 2026 MAI HOA DICH SO PRO</div>', unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
@@ -0,0 +1,100 @@
+"""
+Ảnh nền Ngũ Hành cho 9 thẻ cung.
+
+Mỗi ảnh trong web/static/img/elements được đọc, thu nhỏ và nén WebP đúng một lần cho
+mỗi tiến trình (lru_cache), rồi gửi tới trình duyệt qua một khối CSS duy nhất:
+thẻ cung chỉ cần class palace_bg_class(hành) thay vì nhúng cả ảnh base64 vào từng thẻ.
+Không có Pillow (hoặc Pillow không hỗ trợ WebP) thì dùng nguyên file gốc.
+"""
+import base64
+import io
+import os
+from functools import lru_cache
+
+try:
+    from PIL import Image
+    from PIL import features as _pil_features
+    HAS_WEBP = bool(_pil_features.check('webp'))
+except ImportError:
+    HAS_WEBP = False
+
+ELEMENTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "img", "elements")
+MAX_SIDE = 480          # thẻ cung hiển thị ~300px, chừa cho màn hình HiDPI
+WEBP_QUALITY = 70
+
+# Hành -> (class CSS, file ảnh)
+ELEMENT_ASSETS = {
+    "Mộc": ("palace-bg-moc", "moc.png"),
+    "Hỏa": ("palace-bg-hoa", "hoa.png"),
+    "Thổ": ("palace-bg-tho", "tho.png"),
+    "Kim": ("palace-bg-kim", "kim.png"),
+    "Thủy": ("palace-bg-thuy", "thuy.png"),
+}
+DEFAULT_ELEMENT = "Thổ"
+FALLBACK_BACKGROUND = "linear-gradient(135deg, #f1f5f9 0%, #e2e8f0 100%)"
+
+
+@lru_cache(maxsize=None)
+def load_asset(filename, max_side=MAX_SIDE, quality=WEBP_QUALITY):
+    """
+    (mime, bytes) của ảnh đã thu nhỏ + nén WebP, hoặc ảnh gốc nếu không nén được.
+    Returns None nếu không đọc được file.
+    """
+    path = os.path.join(ELEMENTS_DIR, filename)
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+    except OSError:
+        return None
+    if not HAS_WEBP:
+        return "image/png", raw
+    try:
+        with Image.open(io.BytesIO(raw)) as img:
+            img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+            img.thumbnail((max_side, max_side))
+            out = io.BytesIO()
+            img.save(out, format="WEBP", quality=quality, method=6)
+        return "image/webp", out.getvalue()
+    except (OSError, ValueError):
+        return "image/png", raw
+
+
+@lru_cache(maxsize=None)
+def asset_data_uri(filename):
+    asset = load_asset(filename)
+    if asset is None:
+        return None
+    mime, data = asset
+    return f"data:{mime};base64,{base64.b64encode(data).decode()}"
+
+
+def palace_bg_class(hanh):
+    """Class CSS nền của thẻ cung theo Ngũ Hành."""
+    return ELEMENT_ASSETS.get(hanh, ELEMENT_ASSETS[DEFAULT_ELEMENT])[0]
+
+
+@lru_cache(maxsize=1)
+def palace_css():
+    """Khối <style> định nghĩa nền cho mọi class palace_bg_class (dựng một lần)."""
+    rules = []
+    for css_class, filename in ELEMENT_ASSETS.values():
+        uri = asset_data_uri(filename)
+        background = f"url('{uri}') center/cover no-repeat" if uri else FALLBACK_BACKGROUND
+        rules.append(f".{css_class} {{ background: {background}; }}")
+    return "<style>\n" + "\n".join(rules) + "\n</style>"
+
+
+if __name__ == "__main__":
+    import time
+
+    start = time.perf_counter()
+    css = palace_css()
+    build_ms = (time.perf_counter() - start) * 1000
+    original = sum(os.path.getsize(os.path.join(ELEMENTS_DIR, f)) for _, f in ELEMENT_ASSETS.values())
+    print(f"WebP: {HAS_WEBP}, dựng CSS {build_ms:.0f} ms")
+    for hanh, (css_class, filename) in ELEMENT_ASSETS.items():
+        asset = load_asset(filename)
+        print(f"   {hanh:<5} .{css_class:<16} {asset[0] if asset else '-':<11} "
+              f"{len(asset[1]) / 1024 if asset else 0:>8.1f} KiB")
+    # Trước: 9 thẻ x ảnh PNG base64 mỗi lần rerun
+    print(f"HTML mỗi lần rerun: ~{9 * original / len(ELEMENT_ASSETS) * 4 / 3 / 1024:,.0f} KiB -> {len(css) / 1024:,.0f} KiB")
@@ -5,7 +5,7 @@ Tích hợp tất cả tính năng từ code hiện có
 
 from flask import Flask, render_template, request, jsonify, send_from_directory
 from flask_cors import CORS
-from datetime import datetime
+from datetime import datetime, timedelta
 import sys
 import os
 
@@ -21,6 +21,8 @@ try:
     from qmdg_data import *
     from qmdg_data import KY_MON_DATA, TOPIC_INTERPRETATIONS
     import qmdg_calc
+    from qmdg_chart_cache import get_slot_chart
+    from qmdg_response_cache import get_response_cache
     from qmdg_detailed_analysis import phan_tich_chi_tiet_cung, so_sanh_chi_tiet_chu_khach
     from super_detailed_analysis import phan_tich_sieu_chi_tiet_chu_de, tao_phan_tich_lien_mach
     from integrated_knowledge_base import (
@@ -90,6 +92,21 @@ CORS(app)
 # Password
 PASSWORD = "1987"
 
+
+def _slot_json(key, build):
+    """Response JSON chỉ phụ thuộc khung giờ: cache tới hết khung, ETag mạnh, 304 khi If-None-Match khớp.
+
+    build(slot) -> dict, chỉ được gọi một lần mỗi khung (lỗi không được cache).
+    """
+    now = datetime.now()
+    slot = get_slot_chart(now)
+    entry = get_response_cache().get_or_build((*key, slot.start), slot.end,
+                                              lambda: jsonify(build(slot)).get_data(), now)
+    headers = {'ETag': f'"{entry.etag}"', 'Cache-Control': f'public, max-age={entry.max_age(now)}'}
+    if request.if_none_match.contains(entry.etag):
+        return '', 304, headers
+    return app.response_class(entry.body, mimetype='application/json', headers=headers)
+
 # ==================== API ENDPOINTS ====================
 
 @app.route('/')
@@ -117,14 +134,19 @@ def get_topics():
 @app.route('/api/search-topics', methods=['GET'])
 def search_topics():
     """Search topics"""
-    query = request.args.get('q', '').lower()
-    all_topics = sorted(list(TOPIC_INTERPRETATIONS.keys()))
-    
-    if not query:
-        return jsonify(all_topics)
-    
-    filtered = [t for t in all_topics if query in t.lower()]
-    return jsonify(filtered)
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', type=int)
+    try:
+        # Chủ đề gốc + Data Hub, tìm không dấu qua chỉ mục trigram dùng chung
+        try:
+            from ai_modules.topic_registry import get_topic_registry
+        except ImportError:
+            from topic_registry import get_topic_registry
+        return jsonify(get_topic_registry(TOPIC_INTERPRETATIONS.keys()).search(query, limit))
+    except Exception:
+        all_topics = sorted(TOPIC_INTERPRETATIONS.keys())
+        filtered = [t for t in all_topics if query.lower() in t.lower()] if query else all_topics
+        return jsonify(filtered[:limit] if limit else filtered)
 
 @app.route('/api/current-time', methods=['GET'])
 def get_current_time():
@@ -137,13 +159,10 @@ def get_current_time():
 
 @app.route('/api/initial-data', methods=['GET'])
 def get_initial_data():
-    """Get initial QMDG data"""
-    now = datetime.now()
-    
-    try:
-        params = qmdg_calc.calculate_qmdg_params(now)
-        
-        return jsonify({
+    """Get initial QMDG data (cached per time slot, ETag/304)"""
+    def build(slot):
+        params = slot.params
+        return {
             'ju': params.get('cuc', '1 Cục'),
             'zhifu': params.get('truc_phu', 'Thiên Tâm'),
             'zhishi': params.get('truc_su', 'Sinh'),
@@ -158,19 +177,18 @@ def get_initial_data():
             'chiNgay': params.get('chi_ngay', 'Mão'),
             'chiThang': params.get('chi_thang', 'Thìn'),
             'chiNam': params.get('chi_nam', 'Tỵ')
-        })
+        }
+    
+    try:
+        return _slot_json(('initial-data',), build)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/calculate', methods=['POST'])
 def calculate():
-    """Calculate QMDG chart with full details"""
-    data = request.json
-    
-    try:
-        # Get current time params
-        now = datetime.now()
-        params = qmdg_calc.calculate_qmdg_params(now)
+    """Calculate QMDG chart with full details (cached per time slot + topic, ETag/304)"""
+    def build(slot):
+        params = slot.params
         
         # Get Can Gio for calculations
         CAN_10 = ["Giáp", "Ất", "Bính", "Đinh", "Mậu", "Kỷ", "Canh", "Tân", "Nhâm", "Quý"]
@@ -183,68 +201,31 @@ def calculate():
         can_gio_idx = (idx_start * 2 + idx_chi) % 10
         can_gio = CAN_10[can_gio_idx]
         
-        # Calculate boards
-        from qmdg_data import an_bai_luc_nghi, lap_ban_qmdg, tinh_khong_vong, tinh_dich_ma
+        # Calculate boards + derived palace fields (shared analysis stage, cached per chart/topic)
+        from qmdg_chart import Chart
+        from qmdg_analysis import analyze_chart
         
-        dia_can = an_bai_luc_nghi(params['cuc'], params['is_duong_don'])
-        thien_ban, can_thien_ban, nhan_ban, than_ban, truc_phu_cung = lap_ban_qmdg(
-            params['cuc'], params['truc_phu'], params['truc_su'], 
-            can_gio, params['chi_gio'], params['is_duong_don']
-        )
-        
-        # Calculate special palaces
-        khong_vong = tinh_khong_vong(can_gio, params['chi_gio'])
-        dich_ma = tinh_dich_ma(params['chi_gio'])
+        chart = Chart.from_params({**params, 'can_gio': can_gio})
+        analyzed = analyze_chart(chart, topic)
         
         # Format palaces with full information
-        palaces = []
-        for i in range(1, 10):
-            sao = thien_ban.get(i, '')
-            cua = nhan_ban.get(i, '')
-            than = than_ban.get(i, '')
-            can_thien = can_thien_ban.get(i, '')
-            can_dia = dia_can.get(i, '')
-            
-            # Calculate auspiciousness score (1-10)
-            auspiciousness = 5  # Default neutral
-            
-            # Check door auspiciousness
-            door_data = KY_MON_DATA["DU_LIEU_DUNG_THAN_PHU_TRO"]["BAT_MON"].get(cua + " Môn", {})
-            cat_hung = door_data.get("Cát_Hung", "Bình")
-            
-            if cat_hung == "Đại Cát":
-                auspiciousness = 9
-            elif cat_hung == "Cát":
-                auspiciousness = 7
-            elif cat_hung == "Hung":
-                auspiciousness = 3
-            elif cat_hung == "Đại Hung":
-                auspiciousness = 1
-            
-            # Check star quality
-            star_data = KY_MON_DATA['DU_LIEU_DUNG_THAN_PHU_TRO']['CUU_TINH'].get(sao, {})
-            star_cat_hung = star_data.get('Cát_Hung', 'Bình')
-            if star_cat_hung == "Cát":
-                auspiciousness = min(10, auspiciousness + 1)
-            elif star_cat_hung == "Hung":
-                auspiciousness = max(1, auspiciousness - 1)
-            
-            palaces.append({
-                'number': i,
-                'name': QUAI_TUONG.get(i, ''),
-                'element': CUNG_NGU_HANH.get(i, ''),
-                'star': sao,
-                'door': cua,
-                'deity': than,
-                'stemHeaven': can_thien,
-                'stemEarth': can_dia,
-                'isKongWang': i in khong_vong,
-                'isDiMa': i == dich_ma,
-                'auspiciousness': auspiciousness,
-                'catHung': cat_hung
-            })
-        
-        return jsonify({
+        palaces = [{
+            'number': p.num,
+            'name': QUAI_TUONG.get(p.num, ''),
+            'element': CUNG_NGU_HANH.get(p.num, ''),
+            'star': chart.star(p.num) or '',
+            'door': chart.door(p.num) or '',
+            'deity': chart.deity(p.num) or '',
+            'stemHeaven': chart.can_thien(p.num) or '',
+            'stemEarth': chart.can_dia(p.num) or '',
+            'isKongWang': p.khong_vong,
+            'isDiMa': p.dich_ma,
+            'auspiciousness': p.auspiciousness,
+            'catHung': p.cat_hung,
+            'hasDungThan': p.has_dung_than,
+        } for p in analyzed]
+        
+        return {
             'ju': f"{params.get('cuc', 1)} Cục",
             'solarTerm': params.get('tiet_khi', 'Lập Xuân'),
             'isYang': params.get('is_duong_don', True),
@@ -254,7 +235,14 @@ def calculate():
             'zhifu': params.get('truc_phu', 'Thiên Tâm'),
             'zhishi': params.get('truc_su', 'Sinh'),
             'hourBranch': params.get('chi_gio', 'Dần')
-        })
+        }
+    
+    try:
+        data = request.get_json(silent=True)
+        topic = data.get('topic') if isinstance(data, dict) else None
+        if topic is not None and not isinstance(topic, str):
+            return jsonify({'error': 'topic must be a string'}), 400
+        return _slot_json(('calculate', topic), build)
         
     except Exception as e:
         import traceback
@@ -262,6 +250,62 @@ def calculate():
         print(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/auspicious-times', methods=['POST'])
+def auspicious_times():
+    """Top-K auspicious time slots for a topic in a date range"""
+    try:
+        from qmdg_auspicious import find_auspicious_times
+
+        data = request.get_json(silent=True)
+        if data is None:
+            data = {}
+        if not isinstance(data, dict):
+            return jsonify({'error': 'request body must be a JSON object'}), 400
+        topic = data.get('topic', 'Kinh Doanh Tổng Quát')
+        subject = data.get('subject', 'Can Ngày')
+        if not isinstance(topic, str) or not isinstance(subject, str):
+            return jsonify({'error': 'topic and subject must be strings'}), 400
+
+        try:
+            start = datetime.fromisoformat(data['start']) if data.get('start') else datetime.now().replace(second=0, microsecond=0)
+            if data.get('end'):
+                end = datetime.fromisoformat(data['end'])
+            else:
+                end = start + timedelta(days=int(data.get('days', 30)))
+            k = int(data.get('k', 10))
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': f'invalid parameter: {e}'}), 400
+        if k < 1:
+            return jsonify({'error': 'k must be >= 1'}), 400
+        k = min(k, 100)
+
+        if topic not in TOPIC_INTERPRETATIONS:
+            return jsonify({'error': f'Chủ đề không tồn tại: {topic}'}), 404
+
+        results = find_auspicious_times(topic, start, end, subject=subject, k=k)
+        return jsonify({
+            'topic': topic,
+            'subject': subject,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'slots': [{
+                'start': r['start'].isoformat(),
+                'end': r['end'].isoformat(),
+                'score': r['score'],
+                'ju': f"{r['cuc']} Cục",
+                'isYang': r['is_duong_don'],
+                'hourStem': r['can_gio'],
+                'hourBranch': r['chi_gio']
+            } for r in results]
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        import traceback
+        print(f"Error in auspicious_times: {e}")
+        print(traceback.format_exc())
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/palace-detail/<int:palace_num>', methods=['GET'])
 def get_palace_detail(palace_num):
     """Get palace detail"""